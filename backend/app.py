@@ -1,41 +1,189 @@
-from fastapi import FastAPI, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Depends, Query, Request, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from datetime import datetime, timezone
-from database import sessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from datetime import datetime, timezone, timedelta
+import database
+from database import sessionLocal, engine
 from models import queueData, AlertStatus, ContactMessage
-from fastapi.responses import JSONResponse #to return json response
-from typing import Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse #to return json response
+from typing import Optional, List
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import asyncio
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from contextlib import asynccontextmanager
+from frame_channel import FrameChannelReader, DEMAND_TTL, channel_name
+from broadcast import ConnectionManager, UpdateFeed
+from streaming import FrameStreamer, MJPEG_BOUNDARY, encode_jpeg
+import rollups
+import history
+import metrics
+from cache import ResponseCache, etag_matches
+from profiler import SamplingProfiler
+
+
+# WebSocket fan-out to the dashboards (see broadcast.py)
+manager = ConnectionManager()
+# Sequenced count/average/new-row updates pushed after every queuedata write
+update_feed = UpdateFeed(manager)
+
+
+# Latest frame/stats from detection.py, shared through memory (see frame_channel.py).
+# Frames are stored raw; a JPEG is encoded only when someone asks for one,
+# and at most once per frame however many clients ask.
+class LatestFrame:
+    def __init__(self, reader: FrameChannelReader, quality: int = 80, wake_timeout: float = 0.5):
+        self.reader = reader
+        self.quality = quality
+        self.wake_timeout = wake_timeout
+        self._lock = threading.Lock()
+        self._seq = -1
+        self._jpeg = None
+
+    def jpeg(self) -> Optional[bytes]:
+        # While nobody has asked for a while the detector stops handing frames
+        # over; wake it and give it a moment to draw a current one.
+        if time.time() - self.reader.request_frames() > DEMAND_TTL:
+            self.reader.wait_for_frame(self.reader.latest_seq(), self.wake_timeout)
+        with self._lock:
+            if self.reader.latest_seq() - 1 == self._seq:
+                return self._jpeg
+            read = self.reader.read_frame(lambda view: encode_jpeg(view, self.quality, 1.0))
+            if read is not None:
+                self._seq, self._jpeg = read
+            return self._jpeg
+
+# Short-TTL, single-flight cache for the polled read endpoints (see cache.py),
+# invalidated by every write to queuedata.
+response_cache = ResponseCache()
+
+async def cached_response(request: Request, key: str, compute) -> Response:
+    """Serve `await compute()` through the cache, answering 304 when the client's ETag still matches."""
+    body, etag = await response_cache.get(key, compute)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+metrics.callback("response_cache_lookups_total", "Read endpoint cache lookups", kind="counter", labels=("result",),
+                 fn=lambda: {("hit",): response_cache.hits, ("miss",): response_cache.misses,
+                             ("not_modified",): response_cache.not_modified})
+
+# One channel per camera: detection.py writes the default one, multicam.py one
+# per camera id (channel_name). The frame/stream/state endpoints take
+# ?camera=<id> and read (and stamp demand on) that camera's channel.
+class CameraFeed:
+    def __init__(self, camera: Optional[str]):
+        self.reader = FrameChannelReader(channel_name(camera))
+        self.latest_frame = LatestFrame(self.reader)
+        self.streamer = FrameStreamer(self.reader)
+
+feeds = {None: CameraFeed(None)}
+
+def camera_feed(camera: Optional[str]) -> CameraFeed:
+    feed = feeds.get(camera)
+    if feed is None:
+        feed = CameraFeed(camera)
+        # Only keep channels a detector has created, so unknown ids do not pile up
+        if feed.reader.heartbeat() > 0.0:
+            feeds[camera] = feed
+    return feed
+
+metrics.callback("stream_viewers", "Live video viewers (MJPEG and /ws/video)",
+                 lambda: sum(feed.streamer.viewers for feed in list(feeds.values())))
+
+# Optional in-process detection worker (see worker.py). DETECTION_WORKER=1 starts
+# it with the app on DETECTION_SOURCE; it can also be driven through the
+# /detection/worker/* endpoints. Imported lazily so the API alone stays light.
+detection_worker = None
+
+def get_worker():
+    global detection_worker
+    if detection_worker is None:
+        from worker import DetectionWorker
+        detection_worker = DetectionWorker(asyncio.get_running_loop(), manager.publish)
+    return detection_worker
+
+metrics.callback("db_pool_ready", "1 once the database pool has warmed up", lambda: int(database.pool_ready))
+metrics.callback("detection_worker_running", "1 while the in-process detection worker runs",
+                 lambda: int(detection_worker is not None and detection_worker.running))
+
+# Sampling profiler behind /debug/profiler/*, only with PROFILER_ENABLED=1
+# (stacks reveal code paths, and sampling costs some CPU while it runs).
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED") == "1"
+profiler = SamplingProfiler()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connections are opened in the background; requests are served meanwhile
+    pool_warm_up = asyncio.create_task(database.warm_pool())
+    if os.getenv("DETECTION_WORKER") == "1":
+        get_worker().start(source=os.getenv("DETECTION_SOURCE", "0"))
+    yield
+    pool_warm_up.cancel()
+    if detection_worker is not None:
+        await asyncio.to_thread(detection_worker.stop)
+    await engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
+
+
+# Prometheus metrics (see metrics.py), served at /metrics.
+HTTP_SECONDS = metrics.histogram("http_request_seconds",
+                                 "Time to the start of the response, by route", ("route", "method", "status"))
+DB_QUERY_SECONDS = metrics.histogram("db_query_seconds", "Time per SQL statement, by the route that ran it", ("route",))
+# ASGI scope of the request being served, so SQL timings can be put on its route
+request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+
+def route_of(scope: Optional[dict]) -> str:
+    # The route's path template, not the raw path (bounded label values)
+    route = scope.get("route") if scope else None
+    return getattr(route, "path", "unmatched" if scope else "background")
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    request_scope.set(request.scope)
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_SECONDS.observe(time.perf_counter() - t0, route=route_of(request.scope),
+                             method=request.method, status=status)
 
 
-# Simple in-memory connection manager for WebSocket clients
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: set[WebSocket] = set()
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.add(websocket)
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context: a failed statement never reaches
+    # after_cursor_execute, and its start time goes away with the context.
+    context._query_start = time.perf_counter()
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.discard(websocket)
 
-    async def broadcast(self, message: dict):
-        # send to all connected clients, remove dead connections
-        to_remove = []
-        for ws in list(self.active_connections):
-            try:
-                await ws.send_json(message)
-            except Exception:
-                to_remove.append(ws)
-        for ws in to_remove:
-            self.disconnect(ws)
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start
+    DB_QUERY_SECONDS.observe(elapsed, route=route_of(request_scope.get()))
 
-manager = ConnectionManager()
 
-app = FastAPI()
+metrics.callback("ws_clients", "Connected /ws/detections clients", lambda: len(manager.clients))
+metrics.callback("ws_queued_messages", "Messages waiting in /ws/detections client queues",
+                 lambda: sum(len(c.queue) for c in manager.clients.values()))
+metrics.callback("ws_messages_total", "/ws/detections messages by outcome", kind="counter", labels=("outcome",),
+                 fn=lambda: {("published",): manager.published, ("sent",): manager.sent,
+                             ("coalesced",): manager.coalesced, ("evicted",): manager.evicted})
 
 app.add_middleware(
     CORSMiddleware,
@@ -51,6 +199,16 @@ class DetectionData(BaseModel):
     exitTime: Optional[datetime] = None
     waitTime: float
     alert: Optional[int] = 0  # 0 = no alert, 1 = alert popped
+    camera_id: str = "default"
+    session_id: str = ""  # detector run; tracker ids restart with every session
+
+
+class WorkerConfig(BaseModel):
+    source: str = "0"          # camera index, video file or stream URL
+    backend: str = "torch"     # "torch", "onnx" or "openvino"
+    int8: bool = False
+    roi: bool = False
+    adaptive: bool = False
 
 
 class ContactMessageRequest(BaseModel):
@@ -59,24 +217,53 @@ class ContactMessageRequest(BaseModel):
     message: str
 
 
-def get_db():
-    db = sessionLocal()  # Create new session
-    try:
+async def get_db():
+    async with sessionLocal() as db:  # Create new session (connection taken from the pool on first use)
         yield db
-    finally:
-        db.close()
 
 
 
 
+async def db_snapshot() -> dict:
+    """Everything the dashboard shows from the database, for a (re)connecting client."""
+    async with sessionLocal() as db:
+        return {
+            **await query_total_count(db),
+            **await query_avg_waittime(db),
+            "recent_entries": await query_recent_entries(db),
+        }
+
+
+async def sync_client(websocket: WebSocket, epoch: Optional[str], since: Optional[int]):
+    """Replay the updates a client missed, or send it a snapshot if that is not possible."""
+    missed = update_feed.since(epoch, since)
+    if missed is not None and len(missed) <= manager.queue_size // 2:
+        for message in missed:
+            manager.send_to(websocket, message)
+        return
+    seq = update_feed.seq  # updates after this one still reach the client through the feed
+    snapshot = await db_snapshot()
+    manager.send_to(websocket, jsonable_encoder(
+        {"type": "snapshot", "epoch": update_feed.epoch, "seq": seq, **snapshot}))
+
+
 @app.websocket("/ws/detections")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for streaming detection stats to connected dashboards."""
+    """WebSocket endpoint for streaming detection stats and database updates to dashboards.
+
+    Clients send {"type": "hello", "epoch": ..., "since": <last seq>} after connecting
+    (and {"type": "resync", ...} when they see a gap in the update seq numbers).
+    """
     await manager.connect(websocket)
+    request_scope.set(websocket.scope)
     try:
         while True:
-            # keep the connection alive; client may send pings but we don't expect messages
-            await websocket.receive_text()
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("type") in ("hello", "resync"):
+                await sync_client(websocket, message.get("epoch"), message.get("since"))
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception:
@@ -84,7 +271,7 @@ async def websocket_endpoint(websocket: WebSocket):
 
 
 @app.post("/contact/")
-def save_contact_message(data: ContactMessageRequest, db: Session = Depends(get_db)):
+async def save_contact_message(data: ContactMessageRequest, db: AsyncSession = Depends(get_db)):
     """
     This route receives contact form data (name, email, message) and saves it to the database.
     """
@@ -96,8 +283,8 @@ def save_contact_message(data: ContactMessageRequest, db: Session = Depends(get_
         )
         
         db.add(contact_entry)
-        db.commit()
-        db.refresh(contact_entry)
+        await db.commit()
+        await db.refresh(contact_entry)
         
         return {
             "message": "Message saved successfully",
@@ -107,7 +294,7 @@ def save_contact_message(data: ContactMessageRequest, db: Session = Depends(get_
             "created_at": contact_entry.created_at.isoformat() if contact_entry.created_at else None
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return JSONResponse({"detail": f"Error saving message: {str(e)}"}, status_code=500)
 
 
@@ -122,17 +309,127 @@ async def publish(request: Request):
     except Exception:
         return JSONResponse({"detail": "Invalid JSON"}, status_code=400)
 
-    # Broadcast asynchronously (don't block the HTTP response on client slowdowns)
-    asyncio.create_task(manager.broadcast(payload))
+    # Only queues the message per client; delivery happens on each client's sender task.
+    manager.publish(payload)
 
     return {"message": "published"}
 
+
+@app.get("/ws/detections/metrics")
+def websocket_metrics():
+    """Connection count, queue depth and send lag of the /ws/detections broadcaster."""
+    return manager.metrics()
+
 @app.get("/")
 def root():
     return {"message":"backend is running"}
 
+@app.get("/ready")
+def ready():
+    """503 until the database pool has warmed up (for load balancers and the start-up benchmark)."""
+    if not database.pool_ready:
+        return JSONResponse({"ready": False}, status_code=503)
+    return {"ready": True}
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape endpoint (request/query latency, WebSocket, cache and stream counters)."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.post("/debug/profiler/start")
+def start_profiler(interval_ms: float = Query(5.0, gt=0, le=1000)):
+    if not PROFILER_ENABLED:
+        return JSONResponse({"detail": "Not Found"}, status_code=404)
+    if profiler.running:
+        return JSONResponse({"detail": "Profiler is already running"}, status_code=409)
+    profiler.interval = interval_ms / 1000
+    profiler.start()
+    return {"message": "profiler started", "interval_ms": interval_ms}
+
+
+@app.post("/debug/profiler/stop")
+def stop_profiler():
+    """Stop sampling and return the collapsed stacks (flamegraph.pl / speedscope input)."""
+    if not PROFILER_ENABLED:
+        return JSONResponse({"detail": "Not Found"}, status_code=404)
+    if not profiler.running:
+        return JSONResponse({"detail": "Profiler is not running"}, status_code=409)
+    stacks = profiler.stop()
+    return Response(content=stacks, media_type="text/plain",
+                    headers={"X-Profile-Samples": str(profiler.samples)})
+
+
+@app.get("/detection/frame.jpg")
+def detection_frame(camera: Optional[str] = None):
+    """Latest annotated frame from detection.py as a JPEG (encoded on demand)."""
+    data = camera_feed(camera).latest_frame.jpeg()
+    if data is None:
+        return JSONResponse({"detail": "No frame available, is detection.py running?"}, status_code=503)
+    return Response(content=data, media_type="image/jpeg", headers={"Cache-Control": "no-store"})
+
+
+@app.get("/stream.mjpeg")
+async def stream_mjpeg(camera: Optional[str] = None):
+    """Live annotated video as multipart MJPEG (usable directly as an <img> src)."""
+    return StreamingResponse(
+        camera_feed(camera).streamer.mjpeg(),
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+@app.websocket("/ws/video")
+async def video_socket(websocket: WebSocket, camera: Optional[str] = None):
+    """Live annotated video, one binary JPEG message per frame."""
+    await websocket.accept()
+    frames = camera_feed(camera).streamer.frames()
+    try:
+        async for jpeg in frames:
+            await websocket.send_bytes(jpeg)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        await frames.aclose()  # release the viewer slot now, not at GC time
+
+
+@app.post("/detection/worker/start")
+async def start_worker(config: Optional[WorkerConfig] = None):
+    """Start the in-process detection worker (stats are pushed on every entry/exit)."""
+    config = config or WorkerConfig()
+    worker = get_worker()
+    if not worker.start(**config.model_dump()):
+        return JSONResponse({"detail": "Detection worker is already running", **worker.status()}, status_code=409)
+    return worker.status()
+
+
+@app.post("/detection/worker/stop")
+async def stop_worker():
+    worker = get_worker()
+    stopped = await asyncio.to_thread(worker.stop)
+    if not stopped:
+        return JSONResponse({"detail": "Detection worker did not stop in time", **worker.status()}, status_code=504)
+    return worker.status()
+
+
+@app.get("/detection/worker/status")
+def worker_status():
+    if detection_worker is None:
+        return {"state": "stopped", "config": {}, "error": None}
+    return detection_worker.status()
+
+
+@app.get("/detection/state")
+def detection_state(camera: Optional[str] = None):
+    """Latest stats record written by detection.py (same fields as /publish/)."""
+    stats = camera_feed(camera).reader.read_stats()
+    if stats is None:
+        return JSONResponse({"detail": "No state available, is detection.py running?"}, status_code=503)
+    return stats
+
 @app.post("/updateData/")
-def update_detection(data: DetectionData, db: Session = Depends(get_db)):
+async def update_detection(data: DetectionData, db: AsyncSession = Depends(get_db)):
     """
     This route receives the detected person's ID and waitTime from YOLO script
     and saves them into the PostgreSQL database with a timestamp.
@@ -145,12 +442,20 @@ def update_detection(data: DetectionData, db: Session = Depends(get_db)):
         entryTime=data.entryTime,                # Entry timestamp
         exitTime=data.exitTime,                  # Exit timestamp (can be None)
         waitTime=data.waitTime,                  # Save the person's waiting time
-        alert=alert_status                       # Alert status (0 or 1)
+        alert=alert_status,                      # Alert status (0 or 1)
+        camera_id=data.camera_id,                # Camera the visit was seen on
+        session_id=data.session_id               # Detector session the tracker ID belongs to
     )
     
     db.add(entry)
-    db.commit()
-    db.refresh(entry)  # Refresh to get any auto-generated fields
+    await db.flush()
+    await rollups.record(db, [{"entryTime": entry.entryTime, "exitTime": entry.exitTime,
+                               "waitTime": entry.waitTime, "alert": entry.alert}])
+    await db.commit()
+    response_cache.invalidate()
+    await db.refresh(entry)  # Refresh to get any auto-generated fields
+    await publish_db_update(db, [{"id": entry.id, "entryTime": entry.entryTime, "exitTime": entry.exitTime,
+                            "waitTime": entry.waitTime, "alert": entry.alert}])
 
     return {
         "message": "Data saved successfully",
@@ -161,54 +466,181 @@ def update_detection(data: DetectionData, db: Session = Depends(get_db)):
         "alert": entry.alert.value if entry.alert else 0
     }
 
-#to get total count of rows in database
-@app.get("/total-count")
-def total_count():
-    db = sessionLocal()
+async def publish_db_update(db: AsyncSession, rows: list):
+    """Push new totals and the newly inserted rows (mappings) to /ws/detections clients."""
+    t = await rollups.totals(db)
+    entries = [
+        {"id": r["id"], "entryTime": r["entryTime"], "exitTime": r["exitTime"],
+         "waitTime": r["waitTime"], "alert": r["alert"]}
+        for r in rows
+    ]
+    entries.sort(key=lambda e: e["exitTime"] or datetime.min, reverse=True)
+    update_feed.push(jsonable_encoder({
+        "added": len(entries),
+        "total_count": t["count"],
+        "average_wait_time": average_wait(t),
+        "entries": entries,
+    }))
+
+@app.post("/updateData/batch")
+async def update_detection_batch(data: List[DetectionData], db: AsyncSession = Depends(get_db)):
+    """
+    Bulk version of /updateData/ used by the detection script's exit event shipper.
+    All rows are inserted in one transaction. Rows that already exist (same camera,
+    session, id and entryTime, e.g. a batch retried after a lost response) are skipped, so retries are safe.
+    Only the rows actually inserted are added to the rollups.
+    """
+    if not data:
+        return {"message": "Data saved successfully", "count": 0}
+
+    rows = [
+        {
+            "id": d.id,
+            "entryTime": d.entryTime,
+            "exitTime": d.exitTime,
+            "waitTime": d.waitTime,
+            "alert": AlertStatus.ALERT_POPPED if d.alert == 1 else AlertStatus.NO_ALERT,
+            "camera_id": d.camera_id,
+            "session_id": d.session_id,
+        }
+        for d in data
+    ]
+    q = queueData.__table__
     try:
-        count = db.query(queueData).count()
-        return {"total_count": count}
-    finally:
-        db.close()
+        inserted = (await db.execute(
+            pg_insert(q).values(rows).on_conflict_do_nothing()
+            .returning(q.c.id, q.c.entryTime, q.c.exitTime, q.c.waitTime, q.c.alert)
+        )).mappings().all()
+        await rollups.record(db, inserted)
+        await db.commit()
+        if inserted:
+            response_cache.invalidate()
+    except Exception as e:
+        await db.rollback()
+        return JSONResponse({"detail": f"Error saving batch: {str(e)}"}, status_code=500)
+
+    if inserted:
+        await publish_db_update(db, inserted)
+
+    return {"message": "Data saved successfully", "count": len(inserted)}
+
+#to get total count of rows in database (summed from the daily rollups)
+@app.get("/total-count")
+async def total_count(request: Request, db: AsyncSession = Depends(get_db)):
+    return await cached_response(request, "total-count", lambda: query_total_count(db))
+
+async def query_total_count(db: AsyncSession):
+    return {"total_count": (await rollups.totals(db))["count"]}
 
-#to get average wait time from all records
+#to get average wait time from all records (summed from the daily rollups)
 @app.get("/avg-waittime")
-def avg_waittime():
-    db = sessionLocal()
-    try:
-        rows = db.query(queueData).filter(queueData.waitTime != None).all()
-        if not rows:
-            return {"average_wait_time": 0}
-        # Only calculate average from non-null waitTime values
-        total_wait = sum(r.waitTime for r in rows if r.waitTime is not None)
-        avg_wait = total_wait / len(rows) if rows else 0
-        return {"average_wait_time": float(avg_wait)}
-    finally:
-        db.close()
+async def avg_waittime(request: Request, db: AsyncSession = Depends(get_db)):
+    return await cached_response(request, "avg-waittime", lambda: query_avg_waittime(db))
+
+async def query_avg_waittime(db: AsyncSession):
+    return {"average_wait_time": average_wait(await rollups.totals(db))}
+
+def average_wait(totals: dict) -> float:
+    # Only rows with a waitTime count towards the average
+    return totals["wait_sum"] / totals["wait_count"] if totals["wait_count"] else 0
+
+# default window per bucket size when `from` is omitted, and the most buckets one request may span
+STATS_DEFAULT_SPAN = {"minute": timedelta(hours=1), "hour": timedelta(days=1), "day": timedelta(days=30)}
+STATS_MAX_BUCKETS = 10000
+
+#to get counts, alerts and wait statistics over a time window, read from the rollups only
+@app.get("/stats")
+async def window_stats(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: str = "hour",
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Counts, alert counts and wait-time avg/min/max/p50/p95 per bucket
+    (minute, hour or day) for buckets starting in [from, to), plus a summary of
+    the whole window. Percentiles are approximate (histogram bins).
+    """
+    if bucket not in rollups.BUCKETS:
+        return JSONResponse({"detail": f"bucket must be one of {', '.join(rollups.BUCKETS)}"}, status_code=400)
+    end = end or datetime.now()
+    start = start or end - STATS_DEFAULT_SPAN[bucket]
+    if start >= end:
+        return JSONResponse({"detail": "from must be before to"}, status_code=400)
+    if (end - start) / rollups.BUCKETS[bucket] > STATS_MAX_BUCKETS:
+        return JSONResponse({"detail": f"window spans more than {STATS_MAX_BUCKETS} {bucket} buckets"}, status_code=400)
+
+    return await rollups.window(db, rollups.truncate(start, bucket), end, bucket)
 
 #to get last 10 entries from database
 @app.get("/recent-entries")
-def recent_entries():
-    db = sessionLocal()
-    try:
-        rows = (
-            db.query(queueData)
-            .order_by(queueData.exitTime.desc())
-            .limit(10)
-            .all()
-        )
+async def recent_entries(request: Request, db: AsyncSession = Depends(get_db)):
+    return await cached_response(request, "recent-entries", lambda: query_recent_entries(db))
+
+# Walks ix_queuedata_exit from the top, so it stays cheap however large queuedata gets
+RECENT_ENTRIES = (
+    select(queueData)
+    .order_by(queueData.exitTime.desc().nulls_last(), queueData.row_id.desc())
+    .limit(10)
+)
 
-        return [
-            {
-                "id": r.id,
-                "entryTime": r.entryTime,
-                "exitTime": r.exitTime,
-                "waitTime": r.waitTime,
-                "alert": r.alert
-            }
-            for r in rows
-        ]
-    finally:
-        db.close()
+async def query_recent_entries(db: AsyncSession):
+    rows = (await db.execute(RECENT_ENTRIES)).scalars().all()
+
+    return [
+        {
+            "id": r.id,
+            "entryTime": r.entryTime,
+            "exitTime": r.exitTime,
+            "waitTime": r.waitTime,
+            "alert": r.alert
+        }
+        for r in rows
+    ]
+
+
+#to page through history, newest exit first
+@app.get("/entries")
+async def entries(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    alert: Optional[int] = Query(None, ge=0, le=1),
+    camera: Optional[str] = None,
+    limit: int = Query(history.PAGE_SIZE, ge=1, le=history.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Visits that exited in [from, to), optionally only alert=0/1 or one camera,
+    newest first. Pass `next_cursor` from the response as `cursor` to get the
+    next page; it is null on the last page.
+    """
+    try:
+        return await history.page(db, limit, cursor, start=start, end=end, alert=alert, camera=camera)
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=400)
+
+#to download history as NDJSON or CSV, streamed from a server-side cursor
+@app.get("/entries/export")
+async def export_entries(
+    format: str = "ndjson",
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    alert: Optional[int] = Query(None, ge=0, le=1),
+    camera: Optional[str] = None,
+):
+    """Same filters as /entries, oldest exit first, all matching rows."""
+    if format not in history.FORMATS:
+        return JSONResponse({"detail": f"format must be one of {', '.join(history.FORMATS)}"}, status_code=400)
+    filename = f"queuedata-{datetime.now():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        history.export(sessionLocal, format, start=start, end=end, alert=alert, camera=camera),
+        media_type=history.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
+#hit/miss counters of the read endpoint cache
+@app.get("/cache/metrics")
+def cache_metrics():
+    return response_cache.metrics()
@@ -0,0 +1,68 @@
+# bench_api.py
+# Load test for the dashboard's read endpoints against a running backend.
+# N concurrent clients request each endpoint back to back for a fixed time;
+# reports requests per second, latency percentiles and errors per endpoint.
+# Start the server with READ_CACHE_TTL=0 to measure the database path rather
+# than the response cache.
+#
+#   READ_CACHE_TTL=0 uvicorn app:app --workers 1
+#   python bench_api.py --url http://127.0.0.1:8000 --concurrency 64 --seconds 10
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+ENDPOINTS = ("/total-count", "/avg-waittime", "/recent-entries")
+
+
+async def hammer(client: httpx.AsyncClient, path: str, deadline: float, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            resp = await client.get(path)
+            ok = resp.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - t0)
+        else:
+            errors.append(1)
+
+
+async def run_endpoint(url: str, path: str, concurrency: int, seconds: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        await client.get(path)  # warm-up
+        latencies, errors = [], []
+        started = time.perf_counter()
+        deadline = started + seconds
+        await asyncio.gather(*(hammer(client, path, deadline, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    ms = np.asarray(latencies) * 1000.0 if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"path": path, "rps": len(latencies) / elapsed, "p50": p50, "p95": p95, "p99": p99,
+            "errors": len(errors)}
+
+
+async def run(url: str, paths: list, concurrency: int, seconds: float):
+    print(f"{url}  concurrency={concurrency}  {seconds:g}s per endpoint")
+    print(f"{'endpoint':<18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for path in paths:
+        r = await run_endpoint(url, path, concurrency, seconds)
+        print(f"{r['path']:<18} {r['rps']:>8.0f} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} {r['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read endpoint load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS))
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.endpoints, args.concurrency, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
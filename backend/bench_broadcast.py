@@ -0,0 +1,80 @@
+# bench_broadcast.py
+# Fan-out of stats messages to many dashboard clients, in process.
+# Fake sockets stand in for real ones: most take a few milliseconds per send,
+# a few are slow and some never finish a send. Reports how long publish()
+# holds the event loop, the send lag of healthy clients and who got evicted.
+#
+#   python bench_broadcast.py --clients 500 --rate 10 --seconds 5
+import argparse
+import asyncio
+import random
+import time
+
+from broadcast import ConnectionManager
+
+
+class FakeSocket:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def make_sockets(n: int, slow: int, stuck: int) -> list:
+    sockets = [FakeSocket(random.uniform(0.001, 0.01)) for _ in range(n - slow - stuck)]
+    sockets += [FakeSocket(0.5) for _ in range(slow)]   # slower than the rate: coalesced
+    sockets += [FakeSocket(3600) for _ in range(stuck)]  # never finishes: evicted
+    return sockets
+
+
+async def run(clients: int, rate: float, seconds: float, slow: int, stuck: int):
+    manager = ConnectionManager()
+    sockets = make_sockets(clients, slow, stuck)
+    for ws in sockets:
+        await manager.connect(ws)
+
+    payload = {"entered": 0, "exited": 0, "inside": 3, "waiting_times": [1.5] * 20, "alert": 0}
+    publish_s = []
+    interval = 1.0 / rate
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        payload["entered"] += 1
+        t0 = time.perf_counter()
+        manager.publish(dict(payload))
+        publish_s.append(time.perf_counter() - t0)
+        await asyncio.sleep(interval)
+    await asyncio.sleep(manager.send_timeout + 0.5)
+
+    healthy = sockets[:clients - slow - stuck]
+    publish_s.sort()
+    m = manager.metrics()
+    print(f"{clients} clients ({slow} slow, {stuck} stuck), {rate:g} msg/s for {seconds:g}s")
+    print(f"  publish(): p50 {publish_s[len(publish_s) // 2] * 1000:.2f} ms  max {publish_s[-1] * 1000:.2f} ms")
+    print(f"  healthy clients got {min(ws.received for ws in healthy)}-{max(ws.received for ws in healthy)}"
+          f" of {m['published']} messages")
+    print(f"  send lag p50 {m['send_lag_ms']['p50']} ms  p95 {m['send_lag_ms']['p95']} ms  max {m['send_lag_ms']['max']} ms")
+    print(f"  coalesced {m['coalesced']}  evicted {m['evicted']}  still connected {m['connections']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket broadcaster fan-out benchmark")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=10.0, help="messages per second")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--slow", type=int, default=10)
+    parser.add_argument("--stuck", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.rate, args.seconds, args.slow, args.stuck))
+
+
+if __name__ == "__main__":
+    main()
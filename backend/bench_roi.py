@@ -0,0 +1,72 @@
+# bench_roi.py
+# Full-frame vs ROI inference on a recorded clip.
+# Reports detector throughput and the entered/exited counts of each mode, and
+# the count error against the true numbers when they are given.
+#
+#   python bench_roi.py clip.mp4 --expected-entered 12 --expected-exited 11
+import argparse
+import time
+
+import cv2
+
+from detection import (
+    FRAME_W, FRAME_H, INFERENCE_BACKEND, MODEL_PATH,
+    PeopleCounter, detect_people, make_roi_detector,
+)
+from inference import BACKENDS, load_backend
+import logs
+
+
+def load_frames(path: str, limit: int) -> list:
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while limit <= 0 or len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (FRAME_W, FRAME_H)))
+    cap.release()
+    return frames
+
+
+def run_mode(model, frames: list, detect) -> tuple:
+    counter = PeopleCounter(post_exits=False)
+    detect(model, frames[0])  # warm-up, not timed
+    infer_s = 0.0
+    for frame in frames:
+        t0 = time.perf_counter()
+        detections = detect(model, frame)
+        infer_s += time.perf_counter() - t0
+        counter.update(detections)
+    return len(frames) / infer_s, counter.entered, counter.exited
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-frame and ROI inference")
+    parser.add_argument("video")
+    parser.add_argument("--frames", type=int, default=0, help="only use the first N frames")
+    parser.add_argument("--backend", choices=BACKENDS, default=INFERENCE_BACKEND)
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--expected-entered", type=int)
+    parser.add_argument("--expected-exited", type=int)
+    args = parser.parse_args()
+    logs.set_level("WARNING")  # no per-event lines between the results
+
+    frames = load_frames(args.video, args.frames)
+    if not frames:
+        print(f"No frames read from {args.video}")
+        return
+    model = load_backend(args.backend, MODEL_PATH, args.int8)
+
+    print(f"{len(frames)} frames from {args.video}")
+    print(f"{'mode':>6} {'infer fps':>10} {'entered':>8} {'exited':>7} {'count err':>10}")
+    for name, detect in (("full", detect_people), ("roi", make_roi_detector())):
+        fps, entered, exited = run_mode(model, frames, detect)
+        err = "-"
+        if args.expected_entered is not None and args.expected_exited is not None:
+            err = str(abs(entered - args.expected_entered) + abs(exited - args.expected_exited))
+        print(f"{name:>6} {fps:>10.1f} {entered:>8} {exited:>7} {err:>10}")
+
+
+if __name__ == "__main__":
+    main()
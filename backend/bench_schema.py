@@ -0,0 +1,194 @@
+# bench_schema.py
+# Seeds a scratch copy of queuedata (schema bench_queuedata, same DDL as
+# migrate.py) with N synthetic visits spread over --days, then times the
+# queries the dashboard runs against it: the newest exits overall and for one
+# camera, exit-time windows of an hour and a day, a keyset page deep in the
+# history and an entry-time range (BRIN). Window positions are random per
+# repetition, so the numbers are not one cached page read over and over.
+# With --export it also streams the whole table through history.export() and
+# reports rows/s, peak RSS growth and the longest event-loop stall meanwhile.
+#
+#   python bench_schema.py --rows 10000000 [--partition] [--days 365] [--explain] [--export] [--keep]
+import argparse
+import asyncio
+import random
+import resource
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import history
+import migrate
+from database import engine
+from models import queueData
+
+SCHEMA = "bench_queuedata"
+CHUNK = 1_000_000  # rows per INSERT ... SELECT (one transaction each)
+CAMERAS = 4
+PAGE_SIZE = 50
+
+q = queueData
+
+
+def seed_sql(start: datetime, step: float, lo: int, hi: int) -> str:
+    """Rows lo..hi: one visit every `step` seconds from `start`, round-robin over the cameras."""
+    return f"""
+        INSERT INTO queuedata ("entryTime", camera_id, session_id, id, "exitTime", "waitTime", alert)
+        SELECT t, 'cam' || (g % {CAMERAS}), to_char(t, 'YYYYMMDD'), (g / {CAMERAS}) % 100000,
+               t + w * interval '1 second', w, (random() < 0.1)::int
+        FROM (SELECT g, timestamp '{start:%Y-%m-%d %H:%M:%S}' + g * {step} * interval '1 second' AS t,
+                     5 + random() * 600 AS w
+              FROM generate_series({lo}, {hi}) g) s
+    """
+
+
+def queries(start: datetime, end: datetime) -> dict:
+    """name -> function returning a fresh statement (random position in [start, end))."""
+    span = (end - start).total_seconds()
+
+    def at(margin: timedelta = timedelta(0)) -> datetime:
+        return start + timedelta(seconds=random.uniform(0, span - margin.total_seconds()))
+
+    newest = (q.exitTime.desc().nulls_last(), q.row_id.desc())
+
+    def window(length: timedelta):
+        t0 = at(length)
+        return (select(func.count(), func.avg(q.waitTime))
+                .where(q.exitTime >= t0, q.exitTime < t0 + length))
+
+    def deep_page():
+        t0, row_id = at(), 2 ** 62
+        return (select(q).where(tuple_(q.exitTime, q.row_id) < tuple_(t0, row_id))
+                .order_by(*newest).limit(PAGE_SIZE))
+
+    def entry_range():
+        t0 = at(timedelta(hours=1))
+        return select(func.count()).where(q.entryTime >= t0, q.entryTime < t0 + timedelta(hours=1))
+
+    return {
+        "recent-entries": lambda: select(q).order_by(*newest).limit(10),
+        "recent, one camera": lambda: (select(q).where(q.camera_id == f"cam{random.randrange(CAMERAS)}")
+                                       .order_by(*newest).limit(10)),
+        "exit window 1h": lambda: window(timedelta(hours=1)),
+        "exit window 1d": lambda: window(timedelta(days=1)),
+        f"keyset page ({PAGE_SIZE})": deep_page,
+        "entry range 1h": entry_range,
+    }
+
+
+async def seed(conn, rows: int, days: float, partition: bool) -> tuple:
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    step = days * 86400 / rows
+
+    await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    await conn.execute(text(f"SET search_path TO {SCHEMA}"))
+    await conn.run_sync(migrate.create_table, partition)
+    if partition:
+        await conn.run_sync(migrate.ensure_partitions, start, end + timedelta(days=1))
+    await conn.commit()
+
+    t0 = time.perf_counter()
+    for lo in range(0, rows, CHUNK):
+        hi = min(lo + CHUNK, rows) - 1
+        await conn.execute(text(seed_sql(start, step, lo, hi)))
+        await conn.commit()
+        done = hi + 1
+        print(f"  seeded {done:>11,} rows  {done / (time.perf_counter() - t0):>9,.0f} rows/s", flush=True)
+    seed_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    await conn.run_sync(migrate.create_indexes)
+    await conn.execute(text("ANALYZE queuedata"))
+    await conn.commit()
+    index_s = time.perf_counter() - t0
+    return start, end, seed_s, index_s
+
+
+async def time_export(conn, fmt: str) -> dict:
+    """Stream every row through history.export() while a ticker measures event-loop stalls."""
+    stalls = []
+
+    async def ticker():
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stalls.append(time.perf_counter() - t0 - 0.01)
+
+    tick = asyncio.create_task(ticker())
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    size = lines = 0
+    async for chunk in history.export(async_sessionmaker(bind=conn), fmt):
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+    elapsed = time.perf_counter() - t0
+    tick.cancel()
+    return {"rows": lines - (fmt == "csv"), "seconds": elapsed, "mib": size / 2**20,
+            "rss_growth_mib": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss0) / 1024,
+            "max_stall_ms": max(stalls, default=0.0) * 1000}
+
+
+async def run(args):
+    async with engine.connect() as conn:
+        # Seeding and index builds are far longer than any request
+        await conn.execute(text("SET statement_timeout = 0"))
+        print(f"Seeding {args.rows:,} rows over {args.days:g} days"
+              f"{' (monthly partitions)' if args.partition else ''} into {SCHEMA}.queuedata")
+        start, end, seed_s, index_s = await seed(conn, args.rows, args.days, args.partition)
+        size = (await conn.execute(text(
+            "SELECT coalesce((SELECT sum(pg_total_relation_size(relid)) FROM pg_partition_tree('queuedata')),"
+            " pg_total_relation_size('queuedata'))"
+        ))).scalar()
+        print(f"seed {seed_s:.1f}s, indexes + analyze {index_s:.1f}s, table + indexes {size / 2**20:,.0f} MiB\n")
+
+        print(f"{'query':<22} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        for name, build in queries(start, end).items():
+            await conn.execute(build())  # warm-up
+            times = []
+            for _ in range(args.repeat):
+                stmt = build()
+                t0 = time.perf_counter()
+                (await conn.execute(stmt)).all()
+                times.append((time.perf_counter() - t0) * 1000)
+            p50, p95 = np.percentile(times, [50, 95])
+            print(f"{name:<22} {p50:>8.2f} {p95:>8.2f} {max(times):>8.2f}")
+            if args.explain:
+                compiled = build().compile(conn.sync_connection, compile_kwargs={"literal_binds": True})
+                for (line,) in (await conn.execute(text(f"EXPLAIN (ANALYZE, COSTS OFF) {compiled}"))).all():
+                    print(f"    {line}")
+
+        if args.export:
+            print()
+            for fmt in history.FORMATS:
+                r = await time_export(conn, fmt)
+                print(f"export {fmt:<6} {r['rows']:,} rows in {r['seconds']:.1f}s "
+                      f"({r['rows'] / r['seconds']:,.0f} rows/s, {r['mib']:,.0f} MiB), "
+                      f"peak RSS +{r['rss_growth_mib']:.0f} MiB, longest loop stall {r['max_stall_ms']:.1f} ms")
+            await conn.rollback()  # ends the read transaction holding the export cursors
+
+        if not args.keep:
+            await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            await conn.commit()
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="queuedata seeding and query benchmark")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=float, default=365.0, help="time span the rows are spread over")
+    parser.add_argument("--partition", action="store_true", help="monthly partitions, as migrate.py --partition")
+    parser.add_argument("--repeat", type=int, default=50, help="timed runs per query")
+    parser.add_argument("--explain", action="store_true", help="print EXPLAIN ANALYZE for each query")
+    parser.add_argument("--export", action="store_true", help="also time a full NDJSON and CSV export")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
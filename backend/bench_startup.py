@@ -0,0 +1,117 @@
+# bench_startup.py
+# Start-up time of the detector and the backend, measured from process launch.
+#   detector - time to first frame: runs `detection.py --headless` on a source
+#              and waits for its "startup" log line, which also reports when
+#              each phase (imports, model, warmup, source, first_frame)
+#              finished inside the process.
+#   backend  - time to first response: starts uvicorn, polls `/` until it
+#              answers, then `/ready` until the database pool is warm.
+# Run from the directory that holds the model (as for detection.py).
+#
+#   python bench_startup.py detector --source clip.mp4 --backend onnx --runs 5
+#   python bench_startup.py backend --runs 5
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+POLL_INTERVAL = 0.005  # seconds between HTTP polls
+TIMEOUT = 120.0  # give up on a run after this many seconds
+
+
+def stop(proc: subprocess.Popen):
+    proc.send_signal(signal.SIGINT)  # both processes shut down cleanly on Ctrl+C
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def detector_run(args) -> dict:
+    cmd = [sys.executable, os.path.join(BACKEND_DIR, "detection.py"), "--headless", "--metrics-port", "0",
+           "--source", args.source, "--backend", args.backend]
+    if args.int8:
+        cmd.append("--int8")
+    env = dict(os.environ, LOG_FORMAT="json", LOG_LEVEL="INFO")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env)
+    try:
+        for line in proc.stdout:
+            if not line.startswith("{"):
+                continue
+            record = json.loads(line)
+            if record.get("event") == "startup":
+                wall = (time.perf_counter() - t0) * 1000
+                phases = {k: v for k, v in record.items() if k not in ("ts", "level", "logger", "event")}
+                return dict(phases, first_frame_wall=round(wall, 1))
+        raise RuntimeError(f"detection.py exited with {proc.wait()} before its first frame")
+    finally:
+        stop(proc)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, deadline: float) -> float:
+    """Poll `url` until it answers 200; returns the time it did (perf_counter)."""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(POLL_INTERVAL)
+    raise RuntimeError(f"{url} did not answer within {TIMEOUT:.0f}s")
+
+
+def backend_run(args) -> dict:
+    port = free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning"]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = t0 + TIMEOUT
+        first = wait_for(f"http://127.0.0.1:{port}/", deadline)
+        ready = wait_for(f"http://127.0.0.1:{port}/ready", deadline)
+        return {"first_response": round((first - t0) * 1000, 1), "pool_ready": round((ready - t0) * 1000, 1)}
+    finally:
+        stop(proc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first frame / first response")
+    parser.add_argument("target", choices=("detector", "backend"))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--source", default="0", help="detector: camera index, video file or stream URL")
+    parser.add_argument("--backend", default="torch", help="detector: torch, onnx or openvino")
+    parser.add_argument("--int8", action="store_true")
+    args = parser.parse_args()
+
+    run = detector_run if args.target == "detector" else backend_run
+    results = []
+    for i in range(args.runs):
+        result = run(args)
+        results.append(result)
+        print(f"run {i + 1}: " + "  ".join(f"{k}={v:.0f}ms" for k, v in result.items()))
+
+    print(f"\nmedian of {args.runs} runs (ms after launch)")
+    for key in results[0]:
+        print(f"  {key:<18} {statistics.median(r[key] for r in results):8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench_tracker.py
+# Micro-benchmark for track-to-detection assignment.
+# Compares the old greedy double loop with tracker.match() at 10, 100 and 500
+# simultaneous tracks. Run: python bench_tracker.py
+import math
+import time
+import numpy as np
+
+import tracker
+
+MAX_DIST = 120
+IOU_WEIGHT = 0.5
+FRAME_W, FRAME_H = 960, 540
+BOX_W, BOX_H = 60, 140
+
+
+def make_scene(n: int, rng: np.random.Generator) -> tuple:
+    """n tracks and n detections that moved a few pixels since the last frame.
+
+    The scene is scaled with n so people keep roughly the same spacing.
+    """
+    scale = max(1.0, math.sqrt(n / 10))
+    w, h = FRAME_W * scale, FRAME_H * scale
+    cx = rng.uniform(BOX_W, w - BOX_W, n)
+    cy = rng.uniform(BOX_H, h - BOX_H, n)
+    tracks = np.stack([cx - BOX_W / 2, cy - BOX_H / 2, cx + BOX_W / 2, cy + BOX_H / 2], axis=1)
+    dets = tracks + rng.normal(0, 8, tracks.shape)
+    return tracks.astype(int).tolist(), rng.permutation(dets.astype(int)).tolist()
+
+
+def greedy_match(track_boxes: list, det_boxes: list) -> list:
+    """The original step 2 loop from detection.py, kept for comparison."""
+    centroid = lambda b: (int((b[0] + b[2]) / 2), int((b[1] + b[3]) / 2))
+    tr_centroids = [centroid(b) for b in track_boxes]
+    matches = []
+    for i, b in enumerate(det_boxes):
+        c = centroid(b)
+        best_j, best_d = None, MAX_DIST + 1
+        for j, tc in enumerate(tr_centroids):
+            d = math.hypot(c[0] - tc[0], c[1] - tc[1])
+            if d < best_d and d <= MAX_DIST:
+                best_j, best_d = j, d
+        if best_j is not None:
+            matches.append((best_j, i))
+    return matches
+
+
+def time_per_frame(fn, scenes: list) -> float:
+    start = time.perf_counter()
+    for tracks, dets in scenes:
+        fn(tracks, dets)
+    return (time.perf_counter() - start) / len(scenes) * 1000.0
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'tracks':>7} {'greedy ms':>10} {'match ms':>10} {'greedy dup':>11}")
+    for n in (10, 100, 500):
+        frames = 200 if n < 500 else 20
+        scenes = [make_scene(n, rng) for _ in range(frames)]
+
+        greedy_ms = time_per_frame(greedy_match, scenes)
+        match_ms = time_per_frame(
+            lambda t, d: tracker.match(t, d, MAX_DIST, IOU_WEIGHT), scenes)
+
+        # How often the greedy loop hands the same track to two detections.
+        dups = 0
+        for tracks, dets in scenes:
+            claimed = [j for j, _ in greedy_match(tracks, dets)]
+            dups += len(claimed) - len(set(claimed))
+
+        print(f"{n:>7} {greedy_ms:>10.2f} {match_ms:>10.2f} {dups / frames:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
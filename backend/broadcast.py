@@ -0,0 +1,177 @@
+# broadcast.py
+# WebSocket fan-out for the dashboard.
+# A message is serialized once and dropped into a small send queue per client;
+# each client has its own sender task, so one slow socket never delays the
+# others and publishing never waits on the network. Queued messages that share
+# a coalescing key replace each other (the newest stats win), and a client whose
+# send does not finish before the deadline, or whose queue overflows, is evicted.
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Optional
+
+from fastapi import WebSocket
+
+SEND_TIMEOUT = 2.0      # seconds one send may take before the client is evicted
+CLIENT_QUEUE_SIZE = 16  # queued messages per client before it counts as stuck
+LAG_SAMPLES = 1024      # recent send-lag samples kept for the percentiles
+
+
+class _Client:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue = deque()  # [key, text, enqueued_at]
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class ConnectionManager:
+    def __init__(self, send_timeout: float = SEND_TIMEOUT, queue_size: int = CLIENT_QUEUE_SIZE):
+        self.send_timeout = send_timeout
+        self.queue_size = queue_size
+        self.clients: dict = {}  # WebSocket -> _Client
+        self.published = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.evicted = 0
+        self._lag = deque(maxlen=LAG_SAMPLES)
+
+    @property
+    def active_connections(self) -> set:
+        return set(self.clients)
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        self.attach(websocket)
+
+    def attach(self, websocket: WebSocket) -> _Client:
+        """Start delivering to an already accepted socket."""
+        client = _Client(websocket)
+        client.task = asyncio.create_task(self._sender(client))
+        self.clients[websocket] = client
+        return client
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is not None and client.task is not None and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    def publish(self, message: dict, key: Optional[str] = "stats"):
+        """Queue `message` for every client without waiting on any of them.
+
+        Messages with the same `key` coalesce: a queued one that has not been
+        sent yet is replaced by the newer one. `key=None` always appends.
+        """
+        if not self.clients:
+            return
+        text = json.dumps(message, default=str)
+        now = time.monotonic()
+        self.published += 1
+        for client in list(self.clients.values()):
+            self._enqueue(client, key, text, now)
+
+    def send_to(self, websocket: WebSocket, message: dict, key: Optional[str] = None):
+        """Queue a message for one client (e.g. a snapshot on connect)."""
+        client = self.clients.get(websocket)
+        if client is not None:
+            self._enqueue(client, key, json.dumps(message, default=str), time.monotonic())
+
+    async def broadcast(self, message: dict):
+        self.publish(message)
+
+    def _enqueue(self, client: _Client, key, text: str, now: float):
+        if key is not None:
+            for item in client.queue:
+                if item[0] == key:
+                    # Keep the original enqueue time so the lag stays honest.
+                    item[1] = text
+                    self.coalesced += 1
+                    return
+        if len(client.queue) >= self.queue_size:
+            self._evict(client)
+            return
+        client.queue.append([key, text, now])
+        client.ready.set()
+
+    def _evict(self, client: _Client):
+        self.evicted += 1
+        self.disconnect(client.websocket)
+        asyncio.create_task(self._close(client.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
+
+    async def _sender(self, client: _Client):
+        websocket = client.websocket
+        while True:
+            await client.ready.wait()
+            if not client.queue:
+                client.ready.clear()
+                continue
+            _, text, enqueued = client.queue.popleft()
+            try:
+                await asyncio.wait_for(websocket.send_text(text), self.send_timeout)
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                self._evict(client)
+                return
+            except Exception:
+                self.disconnect(websocket)
+                return
+            self.sent += 1
+            self._lag.append(time.monotonic() - enqueued)
+
+    def metrics(self) -> dict:
+        lag = sorted(self._lag)
+
+        def pct(p: float) -> float:
+            return round(lag[min(len(lag) - 1, int(p * len(lag)))] * 1000, 2) if lag else 0.0
+
+        return {
+            "connections": len(self.clients),
+            "queued": sum(len(c.queue) for c in self.clients.values()),
+            "published": self.published,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "evicted": self.evicted,
+            "send_lag_ms": {"p50": pct(0.50), "p95": pct(0.95), "max": pct(1.0)},
+        }
+
+
+class UpdateFeed:
+    """Sequence-numbered database changes for the dashboards.
+
+    Every update gets the next `seq` and is kept in a short history, so a
+    client that reconnects (or notices a gap) can be replayed what it missed;
+    when that is no longer in the history it gets a fresh snapshot instead.
+    Updates are never coalesced, since each one carries new rows.
+    """
+
+    def __init__(self, manager: ConnectionManager, history: int = 256):
+        self.manager = manager
+        self.seq = 0
+        self.history = deque(maxlen=history)
+        # Identifies this process's sequence; seq numbers from before a restart mean nothing.
+        self.epoch = f"{time.time():.6f}"
+
+    def push(self, update: dict):
+        """Publish one update (call on the event loop)."""
+        self.seq += 1
+        message = {"type": "db_update", "epoch": self.epoch, "seq": self.seq, **update}
+        self.history.append(message)
+        self.manager.publish(message, key=None)
+
+    def since(self, epoch: Optional[str], seq: Optional[int]) -> Optional[list]:
+        """Updates after `seq`, or None if some of them are no longer kept."""
+        if epoch != self.epoch or seq is None:
+            return None
+        if seq == self.seq:
+            return []
+        if seq > self.seq or not self.history or self.history[0]["seq"] > seq + 1:
+            return None
+        return [m for m in self.history if m["seq"] > seq]
@@ -0,0 +1,88 @@
+# cache.py
+# Small in-process cache for the dashboard's read endpoints.
+# Each entry holds the already serialized JSON body and its ETag for a short
+# TTL. Concurrent misses on the same key are single-flight: one caller runs
+# the query, the others wait for its result. Writes call `invalidate()`, which
+# bumps a generation number so even a query already in flight when the write
+# landed is not served afterwards.
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+# seconds; writes through this process invalidate immediately anyway (0 disables caching)
+CACHE_TTL = float(os.getenv("READ_CACHE_TTL", "2.0"))
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """True if an If-None-Match header lists `etag` (weak comparison, as for GET) or is `*`."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    def __init__(self, ttl: float = CACHE_TTL):
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = {}  # key -> (body, etag, generation, expires_at)
+        self._locks = {}    # key -> asyncio.Lock held while one caller computes it
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def _fresh(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] == self.generation and entry[3] > time.monotonic():
+            return entry
+        return None
+
+    async def get(self, key: str, compute) -> tuple:
+        """(body, etag) for `key`, awaiting `compute()` for the data only on a miss."""
+        if self.ttl <= 0:
+            self.misses += 1
+            return self._encode(await compute())
+        entry = self._fresh(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0], entry[1]
+
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            # Someone else may have filled it while we waited.
+            entry = self._fresh(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+            generation = self.generation
+            body, etag = self._encode(await compute())
+            self._entries[key] = (body, etag, generation, time.monotonic() + self.ttl)
+            return body, etag
+
+    @staticmethod
+    def _encode(data) -> tuple:
+        body = json.dumps(jsonable_encoder(data), separators=(",", ":")).encode()
+        return body, '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+    def invalidate(self):
+        self.generation += 1
+        self._entries.clear()
+        self.invalidations += 1
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "ttl_s": self.ttl,
+        }
@@ -0,0 +1,122 @@
+# cadence.py
+# Adaptive inference cadence (--adaptive).
+# YOLO runs on every Kth frame; in between, tracks are carried forward by their
+# constant-velocity prediction. K is tuned on the fly to hold a target FPS, and
+# inference is skipped altogether while a cheap frame-difference score says
+# nothing in the scene has moved.
+import cv2
+import time
+import numpy as np
+
+
+class MotionGate:
+    """Mean absolute grey-level difference against the last inferred frame.
+
+    Comparing with the last frame that went through YOLO (rather than the
+    previous camera frame) means slow movement still adds up and eventually
+    opens the gate.
+    """
+
+    def __init__(self, threshold: float, size: tuple = (160, 90)):
+        self.threshold = threshold
+        self.size = size
+        self._reference = None
+        self._pending = None
+        self.last_score = 0.0
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def has_motion(self, frame: np.ndarray) -> bool:
+        current = self._prepare(frame)
+        self._pending = current
+        if self._reference is None:
+            self.last_score = float("inf")
+            return True
+        self.last_score = float(cv2.absdiff(current, self._reference).mean())
+        return self.last_score >= self.threshold
+
+    def mark_inferred(self):
+        """The frame last passed to has_motion() was run through the model."""
+        self._reference = self._pending
+
+
+class CadenceController:
+    """Chooses K (infer every Kth frame) to keep the loop at `target_fps`.
+
+    Frame times are measured over one full cadence cycle; K goes up when the
+    cycle runs below target and back down when there is comfortable headroom.
+    """
+
+    def __init__(self, target_fps: float, max_k: int):
+        self.target_fps = target_fps
+        self.max_k = max_k
+        self.k = 1
+        self.frames_since_inference = 0
+        self._cycle_start = time.perf_counter()
+        self._cycle_frames = 0
+
+    def due(self) -> bool:
+        return self.frames_since_inference + 1 >= self.k
+
+    def frame_done(self, inferred: bool):
+        self._cycle_frames += 1
+        if inferred:
+            self.frames_since_inference = 0
+        else:
+            self.frames_since_inference += 1
+
+        if self._cycle_frames < max(self.k, 2):
+            return
+        now = time.perf_counter()
+        fps = self._cycle_frames / max(now - self._cycle_start, 1e-6)
+        if fps < self.target_fps * 0.9 and self.k < self.max_k:
+            self.k += 1
+        elif fps > self.target_fps * 1.25 and self.k > 1:
+            self.k -= 1
+        self._cycle_start = now
+        self._cycle_frames = 0
+
+
+class AdaptiveInference:
+    """Decides per frame whether to run the detector, and drives the counter either way."""
+
+    def __init__(self, detect, target_fps: float, max_k: int, motion_threshold: float, max_skip: int):
+        self.detect = detect
+        self.gate = MotionGate(motion_threshold)
+        self.cadence = CadenceController(target_fps, max_k)
+        self.max_skip = max_skip
+        self.skipped_static = 0
+        self.skipped_cadence = 0
+        self.inferred = 0
+
+    def process(self, model, frame: np.ndarray, counter) -> bool:
+        """Update `counter` for this frame. Returns True if the model ran."""
+        forced = self.cadence.frames_since_inference + 1 >= self.max_skip
+        if not forced:
+            if not self.cadence.due():
+                counter.advance()
+                self.skipped_cadence += 1
+                self.cadence.frame_done(False)
+                return False
+            if not self.gate.has_motion(frame):
+                # Static scene: nothing to predict either, so tracks stay put.
+                self.skipped_static += 1
+                self.cadence.frame_done(False)
+                return False
+        else:
+            self.gate.has_motion(frame)
+
+        counter.update(self.detect(model, frame))
+        self.gate.mark_inferred()
+        self.inferred += 1
+        self.cadence.frame_done(True)
+        return True
+
+    def summary(self) -> str:
+        total = self.inferred + self.skipped_cadence + self.skipped_static
+        return (f"[ADAPTIVE] frames={total} inferred={self.inferred} "
+                f"skipped(cadence)={self.skipped_cadence} skipped(static)={self.skipped_static} "
+                f"final K={self.cadence.k}")
@@ -0,0 +1,240 @@
+# counterstate.py
+# Running counter state for detection.py that survives restarts.
+# `WaitStats` keeps wait-time aggregates in O(1) per exit: count, sum, min and
+# max, plus a log-bucketed quantile sketch (every estimate within
+# SKETCH_ACCURACY of the true value) for p50/p95, instead of a list that grows
+# with every visitor.
+# `CounterStore` persists entered/exited, the wait statistics and the track ID
+# sequence for one camera. Every entry/exit is appended to a write-ahead log
+# (JSON lines) before the counters move on; every CHECKPOINT_INTERVAL seconds
+# the whole state is written to a small checkpoint and the log is truncated.
+# Loading is the checkpoint plus a replay of the log records after it, so a
+# restart resumes the counts in milliseconds. Track IDs are reserved in blocks
+# of ID_BLOCK (one log record per block), so after a crash the sequence
+# continues past anything already handed out and never repeats an ID.
+# The store also keeps the open visits (entered, not exited yet) so a restart
+# knows who was inside; detection.py then hands them to the people it sees
+# again or writes them off as lost (see PeopleCounter.reconcile).
+# Log records are flushed to the OS on every append, which is enough to
+# survive the process crashing; the fsync that makes them survive a power cut
+# runs on a background thread every WAL_SYNC_INTERVAL (group commit), so the
+# detection loop never waits for the disk.
+import json
+import math
+import os
+import threading
+import time
+
+SKETCH_ACCURACY = 0.01  # relative error of the quantile estimates
+SKETCH_MIN_WAIT = 0.01  # seconds; shorter waits share the lowest bucket
+CHECKPOINT_INTERVAL = 30.0  # seconds between checkpoints
+ID_BLOCK = 1000  # track IDs reserved per log record
+WAL_SYNC_INTERVAL = 0.2  # seconds between fsyncs of the log; at most this much is lost on power failure
+
+
+class WaitStats:
+    """Count/sum/min/max/mean of wait times plus approximate quantiles."""
+
+    def __init__(self, accuracy: float = SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self._log_gamma = math.log((1 + accuracy) / (1 - accuracy))
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = {}  # bucket index -> count
+        self._quantiles = {}  # cached until the next add()
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, wait: float):
+        self.count += 1
+        self.total += wait
+        self.min = wait if self.min is None else min(self.min, wait)
+        self.max = wait if self.max is None else max(self.max, wait)
+        i = math.ceil(math.log(max(wait, SKETCH_MIN_WAIT)) / self._log_gamma)
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+        self._quantiles.clear()
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        cached = self._quantiles.get(q)
+        if cached is not None:
+            return cached
+        rank = q * (self.count - 1)
+        seen = 0
+        value = self.max
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                value = 2 * math.exp(i * self._log_gamma) / (1 + math.exp(self._log_gamma))
+                break
+        value = min(max(value, self.min), self.max)
+        self._quantiles[q] = value
+        return value
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "total": self.total, "min": self.min, "max": self.max,
+                "accuracy": self.accuracy, "buckets": self.buckets}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "WaitStats":
+        stats = cls(d.get("accuracy", SKETCH_ACCURACY))
+        stats.count, stats.total = d["count"], d["total"]
+        stats.min, stats.max = d["min"], d["max"]
+        stats.buckets = {int(i): n for i, n in d["buckets"].items()}
+        return stats
+
+
+class CounterStore:
+    """Checkpoint + write-ahead log of one camera's counters under `directory`."""
+
+    def __init__(self, directory: str, camera_id: str, checkpoint_interval: float = CHECKPOINT_INTERVAL,
+                 id_block: int = ID_BLOCK, fsync: bool = True, sync_interval: float = WAL_SYNC_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.checkpoint_path = os.path.join(directory, f"counter_{camera_id}.json")
+        self.wal_path = os.path.join(directory, f"counter_{camera_id}.wal")
+        self.checkpoint_interval = checkpoint_interval
+        self.id_block = id_block
+        self.fsync = fsync
+        self.sync_interval = sync_interval
+        self.lsn = 0  # sequence number of the last log record
+        self.id_limit = 0  # IDs below this are reserved (handed out or skippable)
+        self.open = {}  # track id -> entry time of every visit without an exit yet
+        self.lost = 0  # visits written off after a restart (never seen to exit)
+        self.last_checkpoint = time.monotonic()
+        self._wal = None
+        self._dirty = False  # log written since the last fsync
+        self._closing = threading.Event()
+        self._syncer = None
+
+    def load(self) -> dict:
+        """State saved by a previous run: {entered, exited, lost, next_id, waits (WaitStats),
+        open ({track id: entry time} of the visits still open)}."""
+        state = {"entered": 0, "exited": 0, "next_id": 0, "waits": WaitStats()}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                saved = json.load(f)
+            self.lsn = saved["lsn"]
+            state.update(entered=saved["entered"], exited=saved["exited"], next_id=saved["id_limit"],
+                         waits=WaitStats.from_dict(saved["waits"]))
+            self.open = {int(i): ts for i, ts in saved.get("open", {}).items()}
+            self.lost = saved.get("lost", 0)
+        replayed = 0
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # a torn last line after a crash; everything before it is good
+                    if record["lsn"] <= self.lsn:
+                        continue  # already in the checkpoint (crash between checkpoint and truncate)
+                    self.lsn = record["lsn"]
+                    replayed += 1
+                    if record["type"] == "enter":
+                        state["entered"] += 1
+                        self.open[record["id"]] = record["ts"]
+                    elif record["type"] == "exit":
+                        state["exited"] += 1
+                        state["waits"].add(record["wait"])
+                        self.open.pop(record["id"], None)
+                    elif record["type"] == "ids":
+                        state["next_id"] = max(state["next_id"], record["limit"])
+                    elif record["type"] == "adopt":
+                        self.open[record["id"]] = self.open.pop(record["from"], record["ts"])
+                    elif record["type"] == "lost":
+                        self.lost += len(record["ids"])
+                        for i in record["ids"]:
+                            self.open.pop(i, None)
+        # Whatever the last run reserved may have been handed out; continue after it
+        self.id_limit = state["next_id"]
+        state.update(replayed=replayed, lost=self.lost, open=dict(self.open))
+        self._wal = open(self.wal_path, "a")
+        if self.fsync:
+            self._syncer = threading.Thread(target=self._sync_loop, name="counter-wal-sync", daemon=True)
+            self._syncer.start()
+        return state
+
+    def _append(self, record: dict):
+        self.lsn += 1
+        record["lsn"] = self.lsn
+        self._wal.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._wal.flush()  # in the OS from here on: survives a crash of this process
+        self._dirty = True
+
+    def _sync_loop(self):
+        while not self._closing.wait(self.sync_interval):
+            if self._dirty:
+                self._dirty = False
+                os.fsync(self._wal.fileno())
+
+    def reserve_id(self, next_id: int):
+        """Call before handing out `next_id`; logs a new block when the reserved one runs out."""
+        if next_id >= self.id_limit:
+            self.id_limit = next_id + self.id_block
+            self._append({"type": "ids", "limit": self.id_limit})
+
+    def record_enter(self, track_id: int, ts: float):
+        self.open[track_id] = ts
+        self._append({"type": "enter", "id": track_id, "ts": ts})
+
+    def record_exit(self, track_id: int, ts: float, wait: float):
+        self.open.pop(track_id, None)
+        self._append({"type": "exit", "id": track_id, "ts": ts, "wait": wait})
+
+    def record_adopt(self, track_id: int, previous_id: int):
+        """The open visit of `previous_id` (from before a restart) continues as `track_id`."""
+        ts = self.open.pop(previous_id)
+        self.open[track_id] = ts
+        self._append({"type": "adopt", "id": track_id, "from": previous_id, "ts": ts})
+
+    def record_lost(self, track_ids: list):
+        """Close open visits from before a restart whose person was not seen again."""
+        for i in track_ids:
+            self.open.pop(i, None)
+        self.lost += len(track_ids)
+        self._append({"type": "lost", "ids": list(track_ids)})
+
+    def maybe_checkpoint(self, entered: int, exited: int, waits: WaitStats):
+        if time.monotonic() - self.last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint(entered, exited, waits)
+
+    def checkpoint(self, entered: int, exited: int, waits: WaitStats):
+        """Write the full state atomically, then start a new (empty) log."""
+        self.last_checkpoint = time.monotonic()
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"lsn": self.lsn, "entered": entered, "exited": exited, "id_limit": self.id_limit,
+                       "waits": waits.to_dict(), "open": self.open, "lost": self.lost, "saved_at": time.time()},
+                      f, separators=(",", ":"))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+        # Records up to self.lsn are in the checkpoint now; load() skips them
+        # anyway if we crash before the truncate lands.
+        self._wal.truncate(0)
+        self._wal.seek(0)
+
+    def close(self, entered: int, exited: int, waits: WaitStats):
+        if self._wal is None:
+            return
+        self._closing.set()
+        if self._syncer is not None:
+            self._syncer.join()
+        self.checkpoint(entered, exited, waits)
+        self._wal.close()
+        self._wal = None
+
+    @staticmethod
+    def reset(directory: str, camera_id: str):
+        """Forget the saved state of `camera_id` (start counting from zero)."""
+        for name in (f"counter_{camera_id}.json", f"counter_{camera_id}.wal"):
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                os.remove(path)
@@ -1,5 +1,21 @@
-from database import Base,engine
-from models import queueData
+import asyncio
+from database import Base,engine,sessionLocal
+import migrate
+import rollups
 
-#Run this to create table in database
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+
+async def main():
+    #Run this to create tables in database
+    async with engine.begin() as conn:
+        #queuedata is created (or upgraded from the old layout) by migrate.py
+        print(f"[CREATE] queuedata: {await conn.run_sync(migrate.upgrade)}")
+        await conn.run_sync(Base.metadata.create_all)
+
+    #Rebuild the aggregate tables from existing queuedata rows (safe to re-run)
+    async with sessionLocal() as db:
+        await rollups.rebuild(db)
+        await db.commit()
+
+    await engine.dispose()
+
+asyncio.run(main())
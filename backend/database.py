@@ -1,12 +1,14 @@
 # database.py
-from sqlalchemy.orm.session import Session
-
-
+import asyncio
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
 from dotenv import load_dotenv
 
+from logs import get_logger
+
 load_dotenv()
 
 DB_HOST = os.getenv("DB_HOST")
@@ -15,12 +17,56 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_PORT = os.getenv("DB_PORT")
 
+log = get_logger("database")
+
+# Connection pool (per process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))  # connections kept open
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))  # extra connections allowed under load
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))  # 0 = no limit
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "2"))  # connections opened in the background at start-up
 
-database_url=f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine=create_engine(database_url)
-sessionLocal=sessionmaker[Session](bind=engine,autoflush=False,autocommit=False)
+database_url=f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+engine=create_async_engine(
+    database_url,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,  # drop connections the server closed while idle
+    connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}},
+)
+sessionLocal=async_sessionmaker(bind=engine,class_=AsyncSession,autoflush=False,expire_on_commit=False)
 
 Base=declarative_base()
 
-print(DB_HOST)
\ No newline at end of file
+# Creating the engine does not connect. app.py starts warm_pool() in the
+# background, so the server binds and answers right away and the first
+# queries find connections already open; /ready reports pool_ready.
+pool_ready = False
+
+async def warm_pool(connections: int = DB_POOL_WARM, max_retry_delay: float = 30.0):
+    """Open `connections` pooled connections at once, retrying with backoff until the database answers."""
+    global pool_ready
+    connections = max(connections, 1)
+
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    t0 = time.perf_counter()
+    delay = 1.0
+    while True:
+        try:
+            await asyncio.gather(*(ping() for _ in range(connections)))
+            break
+        except Exception as e:
+            log.warning("connect_failed", host=DB_HOST, port=DB_PORT, error=str(e), retry_in=delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_retry_delay)
+    pool_ready = True
+    log.info("pool_ready", connections=connections, host=DB_HOST, port=DB_PORT,
+             ms=round((time.perf_counter() - t0) * 1000))
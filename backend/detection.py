@@ -1,25 +1,41 @@
 # detection.py (edited)
-import cv2
 import time
+STARTED_AT = time.perf_counter()  # start-up phases are timed from here (see mark_startup)
+
+import cv2
 import numpy as np
-from ultralytics import YOLO
 import math
-from collections import OrderedDict
-import requests
 from datetime import datetime
 import threading
 import os
+import sys
 import json
+import argparse
+import uuid
+
+import tracker
+import metrics
+from logs import get_logger
+from profiler import SamplingProfiler
+from inference import BACKENDS, load_backend
+from frame_channel import STATS_CAPACITY, FrameChannelWriter, channel_name
+from counterstate import CounterStore, WaitStats
+from zones import ZoneEngine, ZoneEvent, load_layout, ENTER, EXIT, CROSS
 
 # -------------------- CONFIGURATION & CONSTANTS --------------------
 # Model and Detection Settings
 MODEL_PATH = "yolov8n.pt"
+INFERENCE_BACKEND = "torch"  # "torch", "onnx" or "openvino" (see inference.py)
+INFERENCE_INT8 = False  # use the INT8 quantized export (onnx/openvino only)
 CONF_THRESHOLD = 0.6
 MIN_BOX_AREA = 4000
 
 # Tracking Settings
 MAX_DIST = 120
 MAX_LOST = 50
+TRACK_CAPACITY = 64  # initial slots in the TrackStore (grows if ever exceeded)
+HISTORY_LEN = 8  # recent centroids kept per track for crossing tests
+IOU_WEIGHT = 0.5  # weight of the (1 - IoU) term in the matching cost, 0 = centroid distance only
 
 # Frame and Room Geometry
 FRAME_W, FRAME_H = 960, 540
@@ -35,6 +51,7 @@ EXIT_LINE_X = ROOM_X1 + 80 # Red line (Left)
 COL_ENTRY = (0, 255, 0) # Green
 COL_EXIT = (0, 0, 255) # Red
 COL_ROOM = (60, 60, 60) # Dark Grey
+COL_LINE = (0, 255, 255) # Yellow for lines without a role
 COL_INSIDE = (255, 255, 0) # Yellow/Cyan
 COL_DEFAULT = (255, 255, 255) # White
 COL_ALERT = (0, 0, 255) # Red for alert
@@ -42,17 +59,116 @@ COL_ALERT = (0, 0, 255) # Red for alert
 # **[NEW FEATURE]** Crowd Limit Constant
 MAX_PEOPLE = 4 # Do not detect or assign ID to more than 1 people (set as needed)
 
+# Frame/State Output
+# Frames and stats go to app.py through shared memory (frame_channel.py).
+# detection_frame.jpg / detection_state.json are only written in debug mode.
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEBUG_WRITE_FILES = False  # same as --debug-files
+
+# Rendering
+# The overlay is only drawn for frames somebody will see: the local window, a
+# backend video client (it flags demand through the frame channel) or debug
+# files. Drawing runs on a render thread, on a copy of the frame.
+HEADLESS = False  # same as --headless: no local window (servers without a display)
+
+# Zones & Lines (zones.py)
+# Counting lines and zones per camera come from ZONE_CONFIG (or --zones). Without
+# that file, DEFAULT_LAYOUT reproduces the entry/exit lines above and the room
+# rectangle with MAX_PEOPLE as its capacity. The crowd alert is raised when any
+# zone is at capacity; while every zone has one, tracks are capped at their sum.
+ZONE_CONFIG = os.path.join(BACKEND_DIR, "zones.json")
+DEFAULT_LAYOUT = {
+    "lines": [
+        {"name": "entry", "role": "entry", "points": [[ENTRY_LINE_X, 0], [ENTRY_LINE_X, FRAME_H]]},
+        {"name": "exit", "role": "exit", "points": [[EXIT_LINE_X, 0], [EXIT_LINE_X, FRAME_H]]},
+    ],
+    "zones": [
+        {"name": "room", "polygon": [[ROOM_X1, ROOM_Y1], [ROOM_X2, ROOM_Y1], [ROOM_X2, ROOM_Y2], [ROOM_X1, ROOM_Y2]],
+         "capacity": MAX_PEOPLE},
+    ],
+}
+
+# Start-up
+# The model runs WARMUP_RUNS times on a blank frame while the source opens,
+# so the first real frame does not pay for graph and allocator set-up. What
+# the first frame does not need (SciPy's assignment solver, the exit shipper
+# and its requests session) is loaded on a background thread once it is out.
+# The "startup" log line reports when each phase finished.
+WARMUP_RUNS = 1
+
 # Backend endpoints
 BACKEND_BASE = "http://127.0.0.1:8000"
 PUBLISH_URL = f"{BACKEND_BASE}/publish/"
 UPDATE_URL = f"{BACKEND_BASE}/updateData/"
-
-# Stats Storage
-waiting_times = [] # Individual stay times. This list remains global.
+UPDATE_BATCH_URL = f"{BACKEND_BASE}/updateData/batch"
+
+# Stored with every exit row; tracker ids restart each run, so the session tells runs apart
+CAMERA_ID = "default"  # multicam.py uses each stream's own id
+SESSION_ID = datetime.now().strftime("%Y%m%d%H%M%S-") + uuid.uuid4().hex[:8]
+
+# Exit event shipping (see shipper.py)
+SHIP_BATCH_SIZE = 50  # max exit events per POST
+SHIP_BATCH_INTERVAL = 0.5  # seconds an event may wait for its batch to fill
+SHIP_MAX_BACKOFF = 30.0  # retry backoff cap (seconds)
+EXIT_SPOOL_PATH = os.path.join(BACKEND_DIR, "exit_spool.jsonl")
+EXIT_SPOOL_MAX_EVENTS = 10000  # oldest spooled events are dropped beyond this
+
+# Counter State (counterstate.py)
+# entered/exited, the wait statistics and the track ID sequence carry over
+# between runs (write-ahead log + checkpoint per camera); --reset-counts starts from zero.
+# People who were inside at a restart come back as new, never-entered tracks.
+# RESUME_RECONCILE_FRAMES frames after resuming, their open visits are handed to
+# the tracks that have not entered (oldest visit to oldest track) and any left
+# over are written off as lost, so `inside` does not count them forever.
+COUNTER_STATE_DIR = os.path.join(BACKEND_DIR, "counter_state")
+RESUME_RECONCILE_FRAMES = 15
 
 # Throttle publishing (seconds)
 PUBLISH_INTERVAL = 1.0  # publish max once per second
 
+# Pipeline Mode (--pipeline)
+PIPELINE_QUEUE_SIZE = 2  # frames buffered between stages; the oldest is dropped when full
+PIPELINE_REPORT_INTERVAL = 5.0  # seconds between per-stage queue/latency reports
+
+# ROI Inference (--roi)
+# Counting only looks at the room rectangle, so by default that is all YOLO sees.
+# Several (x1, y1, x2, y2) rectangles may be listed; they are batched together.
+INFERENCE_ROIS = [(ROOM_X1, ROOM_Y1, ROOM_X2, ROOM_Y2)]
+ROI_IMGSZ = 480  # letterboxed model input size for each ROI (full-frame default is 640)
+
+# Adaptive Mode (--adaptive)
+ADAPTIVE_TARGET_FPS = 15.0  # K (infer every Kth frame) is raised/lowered to hold this
+ADAPTIVE_MAX_K = 6
+ADAPTIVE_MAX_SKIP = 30  # never go longer than this many frames without inference
+MOTION_THRESHOLD = 2.0  # mean grey-level change (0-255) below which the scene counts as static
+
+# Metrics & Logging
+# Served at http://<host>:METRICS_PORT/metrics (metrics.py); when the detector
+# runs inside app.py (worker.py) the same metrics appear in the app's /metrics.
+METRICS_PORT = 9101  # 0 = off, same as --metrics-port
+CROWD_ALERT_LOG_INTERVAL = 10.0  # seconds between crowd alert log lines while it lasts
+PUBLISH_ERROR_LOG_INTERVAL = 5.0  # seconds between repeated publish failure log lines
+
+log = get_logger("detection")
+
+FRAMES_CAPTURED = metrics.counter("detector_frames_captured_total", "Frames read from the video source", ("camera",))
+FRAMES_DROPPED = metrics.counter("detector_frames_dropped_total",
+                                 "Frames discarded before they were processed", ("camera", "stage"))
+STAGE_SECONDS = metrics.histogram("detector_stage_seconds",
+                                  "Per-frame time in each stage (capture, inference, tracking, draw, output)",
+                                  ("stage",))
+ACTIVE_TRACKS = metrics.gauge("detector_active_tracks", "People currently tracked", ("camera",))
+PEOPLE_INSIDE = metrics.gauge("detector_people_inside", "Entered minus exited (and lost over a restart)",
+                              ("camera",))
+CROWDED = metrics.gauge("detector_crowded", "1 while a zone is at its capacity", ("camera",))
+ZONE_OCCUPANCY = metrics.gauge("detector_zone_occupancy", "Tracks inside each zone", ("camera", "zone"))
+ZONE_EVENTS = metrics.counter("detector_zone_events_total",
+                              "Line crossings and zone enter/exit/dwell events", ("camera", "name", "kind"))
+ENTRIES = metrics.counter("detector_entries_total", "Entry line crossings", ("camera",))
+EXITS = metrics.counter("detector_exits_total", "Exit line crossings", ("camera",))
+PUBLISH_FAILURES = metrics.counter("detector_publish_failures_total",
+                                   "Failed deliveries to the backend (stats posts, exit batches)", ("kind",))
+
 # -------------------- UTILITIES --------------------
 
 def calculate_distance(p1: tuple, p2: tuple) -> float:
@@ -66,37 +182,78 @@ def get_box_area(box: tuple) -> int:
     x1, y1, x2, y2 = box
     return (x2 - x1) * (y2 - y1)
 
-def post_exit_to_backend(person_id: int, entry_epoch: float, exit_epoch: float, wait_seconds: float, alert_flag: bool):
-    """Post exit data to the backend FastAPI which persists to Postgres.
-    Runs in a background thread to avoid blocking the main loop.
+startup_marks = {}  # phase -> ms after STARTED_AT
+deferred_startup = None  # thread loading what the first frame did not need
+
+def mark_startup(phase: str):
+    """Note that start-up `phase` is done. The first frame logs them all and starts the deferred loading."""
+    global deferred_startup
+    if phase in startup_marks:
+        return
+    startup_marks[phase] = round((time.perf_counter() - STARTED_AT) * 1000, 1)
+    if phase == "first_frame":
+        log.info("startup", **startup_marks)
+        deferred_startup = threading.Thread(target=_load_deferred, name="deferred-startup", daemon=True)
+        deferred_startup.start()
+
+def _load_deferred():
+    tracker.load_solver()
+    start_exit_shipper()  # also replays what a previous run spooled
+
+exit_shipper = None # ExitEventShipper, started by main()/start_exit_shipper()
+exit_shipper_lock = threading.Lock()
+
+def start_exit_shipper():
+    global exit_shipper
+    with exit_shipper_lock:
+        if exit_shipper is None:
+            from shipper import ExitEventShipper
+            exit_shipper = ExitEventShipper(
+                UPDATE_BATCH_URL, EXIT_SPOOL_PATH, SHIP_BATCH_SIZE, SHIP_BATCH_INTERVAL,
+                SHIP_MAX_BACKOFF, EXIT_SPOOL_MAX_EVENTS,
+            )
+            exit_shipper.start()
+        return exit_shipper
+
+def stop_exit_shipper():
+    global exit_shipper
+    if deferred_startup is not None:
+        deferred_startup.join()  # it may still be starting the shipper
+    if exit_shipper is not None:
+        exit_shipper.stop()
+        exit_shipper = None
+
+def post_exit_to_backend(person_id: int, entry_epoch: float, exit_epoch: float, wait_seconds: float, alert_flag: bool,
+                         camera_id: str = CAMERA_ID):
+    """Queue exit data for the backend FastAPI which persists to Postgres.
+    The shipper batches, retries and spools it, so this never blocks the main loop.
     """
-    try:
-        payload = {
-            "id": int(person_id),
-            "entryTime": datetime.fromtimestamp(entry_epoch).isoformat(),
-            "exitTime": datetime.fromtimestamp(exit_epoch).isoformat(),
-            "waitTime": float(wait_seconds),
-            "alert": 1 if alert_flag else 0,
-        }
-        resp = requests.post(UPDATE_URL, json=payload, timeout=5)
-        if resp.status_code == 200:
-            print(f"[POST_EXIT] Posted exit data for ID {person_id} to backend")
-        else:
-            print(f"[POST_EXIT] Backend returned {resp.status_code} for ID {person_id}: {resp.text}")
-    except Exception as e:
-        print(f"[POST_EXIT] Failed to post exit data for ID {person_id}: {e}")
+    payload = {
+        "id": int(person_id),
+        "entryTime": datetime.fromtimestamp(entry_epoch).isoformat(),
+        "exitTime": datetime.fromtimestamp(exit_epoch).isoformat(),
+        "waitTime": float(wait_seconds),
+        "alert": 1 if alert_flag else 0,
+        "camera_id": camera_id,
+        "session_id": SESSION_ID,
+    }
+    start_exit_shipper().submit(payload)
 
 def publish_stats(payload: dict):
     """Send aggregated stats to backend /publish/ to be broadcast over websocket.
     Fire-and-forget in a thread.
     """
+    import requests  # loaded on the publishing thread, not at start-up
     try:
         resp = requests.post(PUBLISH_URL, json=payload, timeout=2)
         if resp.status_code != 200:
-            print(f"[PUBLISH] backend returned {resp.status_code}: {resp.text}")
+            PUBLISH_FAILURES.inc(kind="stats")
+            log.warning("publish_rejected", every=PUBLISH_ERROR_LOG_INTERVAL,
+                        status=resp.status_code, detail=resp.text[:200])
     except Exception as e:
         # keep errors non-fatal to detection loop
-        print(f"[PUBLISH] failed: {e}")
+        PUBLISH_FAILURES.inc(kind="stats")
+        log.warning("publish_failed", every=PUBLISH_ERROR_LOG_INTERVAL, error=str(e))
 
 '''def draw_stats_panel(panel: np.ndarray, entered: int, exited: int, total_wait: float, avg_wait: float):
     cv2.putText(panel, "People Tracker", (14, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, COL_DEFAULT, 2)
@@ -109,167 +266,365 @@ def publish_stats(payload: dict):
     cv2.putText(panel, f"Max Limit: {MAX_PEOPLE}", (14, 330), cv2.FONT_HERSHEY_SIMPLEX, 0.7, COL_DEFAULT, 1)
     cv2.putText(panel, "Press Q to Quit", (14, 500), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 1)'''
 
-# Load Model
-model = YOLO(MODEL_PATH)
-
-# Initialize Video Capture
-cap = cv2.VideoCapture(0)
-if not cap.isOpened():
-    print(" Cannot open camera")
-    exit()
-
-# Tracking Variables
-next_id = 0
-tracks = OrderedDict()
-entered, exited = 0, 0
-
-print("press 'q' to quit.")
-
-last_publish_time = 0.0
-
-# main loop
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    frame = cv2.resize(frame, (FRAME_W, FRAME_H))
-    results = model(frame, verbose=False, classes=0, conf=CONF_THRESHOLD)
-    detections = results[0].boxes.data.cpu().numpy()
-
-    is_crowded_at_start = (entered - exited) >= MAX_PEOPLE
-
-    # 1. Prepare Valid Detections
-    boxes = []
-    for x1, y1, x2, y2, conf, cls in detections:
-        box = (int(x1), int(y1), int(x2), int(y2))
-        if get_box_area(box) > MIN_BOX_AREA:
-            boxes.append(box)
-
-    det_centroids = [get_centroid(b) for b in boxes]
-
-    # If crowded, ignore new detections
-    if is_crowded_at_start:
-        used_det_indices = [True] * len(boxes)
-    else:
-        used_det_indices = [False] * len(boxes)
-
-    # 2. Track Matching & Update
-    ids = list(tracks.keys())
-    tr_centroids = [tracks[i]['centroid'] for i in ids]
-
-    for i, c in enumerate(det_centroids):
-        best_tid, best_d = None, MAX_DIST + 1
-
-        for j, tid in enumerate(ids):
-            d = calculate_distance(c, tr_centroids[j])
-            if d < best_d and d <= MAX_DIST:
-                best_tid, best_d = tid, d
-
-        if best_tid is not None:
-            t = tracks[best_tid]
-            t['centroid'] = c
-            t['box'] = boxes[i]
-            t['lost'] = 0
-            t['history'].append(c)
-            used_det_indices[i] = True
-
-    # 3. Create New Tracks
-    if not is_crowded_at_start:
-        for i, is_used in enumerate(used_det_indices):
-            if not is_used:
-                if len(tracks) < MAX_PEOPLE:
-                    tracks[next_id] = {
-                        'centroid': det_centroids[i],
-                        'box': boxes[i],
-                        'history': [det_centroids[i]],
-                        'lost': 0,
-                        'entered': False,
-                        'exited': False,
-                        'entry_time': None,
-                        'waiting_time': None
-                    }
-                    next_id += 1
-                else:
-                    break
-
-    # 4. Remove Lost Tracks
-    for tid in list(tracks.keys()):
-        tracks[tid]['lost'] += 1
-        if tracks[tid]['lost'] > MAX_LOST:
-            if tracks[tid]['entered'] and not tracks[tid]['exited']:
-                print(f" ID {tid} LOST without exiting!")
-            del tracks[tid]
-
-    # 5. ENTRY/EXIT LOGIC & Statistics Update
-    for tid, t in tracks.items():
-        if len(t['history']) < 2:
-            continue
-
-        p_prev = t['history'][-2]
-        p_curr = t['history'][-1]
-
-        # ENTRY crossing
-        if (not t['entered'] and p_prev[0] > ENTRY_LINE_X and p_curr[0] < ENTRY_LINE_X):
-            t['entered'] = True
-            t['entry_time'] = time.time()
-            entered += 1
-            print(f" ID {tid} ENTERED at {time.strftime('%H:%M:%S')}")
-
-        # EXIT crossing
-        elif (t['entered'] and not t['exited'] and p_prev[0] > EXIT_LINE_X and p_curr[0] < EXIT_LINE_X):
-            t['exited'] = True
-            exit_time = time.time()
-            exited += 1
-            stay = exit_time - t['entry_time']
-            t['waiting_time'] = stay
-            waiting_times.append(stay)
-            print(f" ID {tid} EXITED | Stay: {stay:.1f}s")
-
-            print(f" Individual Wait Details:")
-            print(f"     Person ID: {tid}")
-            print(f"     Entry Time: {time.strftime('%H:%M:%S', time.localtime(t['entry_time']))}")
-            print(f"     Exit Time:  {time.strftime('%H:%M:%S', time.localtime(exit_time))}")
-            print(f"     Wait Duration: {stay:.2f} seconds\n")
-
-            # Determine whether alert was active while the person was inside.
-            try:
-                alert_flag_at_exit = (entered - exited + 1) >= MAX_PEOPLE
-                threading.Thread(
-                    target=post_exit_to_backend,
-                    args=(tid, t['entry_time'], exit_time, stay, alert_flag_at_exit),
-                    daemon=True,
-                ).start()
-            except Exception as e:
-                print(f"Failed to start background post thread for ID {tid}: {e}")
-
-    # After processing compute current inside count and crowd status
-    current_inside = entered - exited
-    is_crowded = current_inside >= MAX_PEOPLE
+# -------------------- TRACKING & COUNTING --------------------
+
+class PeopleCounter:
+    """Tracking and entry/exit counting state for a single camera.
 
+    `update()` runs steps 1-5 of the detection loop on one frame worth of
+    detections; drawing and output are handled separately so the same state
+    can be driven by the sequential loop or by the staged pipeline.
+    """
+
+    def __init__(self, predict_motion: bool = False, post_exits: bool = True, on_event=None,
+                 camera_id: str = CAMERA_ID, store: CounterStore = None, zones: ZoneEngine = None):
+        # With predict_motion, matching and drawing use each track's box moved
+        # along its constant-velocity estimate (needed when inference skips frames).
+        # post_exits=False keeps exits local (benchmarks and offline runs).
+        # on_event(event) is called with a ZoneEvent for every line crossing
+        # ("enter", "exit", "cross") and zone event ("zone_enter", "zone_exit", "dwell").
+        # camera_id is stored with the exits posted to the backend.
+        # store (see open_counter_store) resumes the counts of the previous run
+        # and logs every crossing so the next run can do the same.
+        # zones defaults to the camera's section of ZONE_CONFIG (see load_zones).
+        self.predict_motion = predict_motion
+        self.camera_id = camera_id
+        self.post_exits = post_exits
+        self.on_event = on_event
+        self.store = store
+        self.zones = zones if zones is not None else load_zones(camera_id)
+        # Per line: 1 = entry, 2 = exit, 0 = only reports crossings
+        self.line_kind = np.array([{"entry": 1, "exit": 2}.get(role, 0) for role in self.zones.line_roles],
+                                  dtype=np.int8)
+        self.occupancy = np.zeros(len(self.zones.zone_names), dtype=np.int64)  # last value sent to the gauge
+        for name in self.zones.zone_names:
+            ZONE_OCCUPANCY.set(0, camera=camera_id, zone=name)
+        self.next_id = 0
+        self.tracks = tracker.TrackStore(TRACK_CAPACITY, HISTORY_LEN)
+        self.entered = 0
+        self.exited = 0
+        self.lost = 0  # visits open at a restart whose person was not seen again
+        self.waits = WaitStats()  # running aggregates of the individual stay times
+        self.resumed_visits = {}  # track id (previous run) -> entry time, until reconcile()
+        self.reconcile_in = 0  # frames left until reconcile()
+        if store is not None:
+            t0 = time.perf_counter()
+            state = store.load()
+            self.entered, self.exited, self.lost = state["entered"], state["exited"], state["lost"]
+            self.next_id, self.waits = state["next_id"], state["waits"]
+            self.resumed_visits = state["open"]
+            self.reconcile_in = RESUME_RECONCILE_FRAMES if self.resumed_visits else 0
+            if self.entered or self.next_id:
+                log.info("counter_resumed", camera=camera_id, entered=self.entered, exited=self.exited,
+                         open=len(self.resumed_visits), next_id=self.next_id, replayed=state["replayed"],
+                         ms=round((time.perf_counter() - t0) * 1000, 2))
+
+    @property
+    def inside(self) -> int:
+        return self.entered - self.exited - self.lost
+
+    @property
+    def is_crowded(self) -> bool:
+        return self.zones.crowded
+
+    def update(self, detections: np.ndarray):
+        is_crowded_at_start = self.is_crowded
+        tracks = self.tracks
+        tracks.tick()
+
+        # 1. Prepare Valid Detections
+        boxes = []
+        for x1, y1, x2, y2, conf, cls in detections:
+            box = (int(x1), int(y1), int(x2), int(y2))
+            if get_box_area(box) > MIN_BOX_AREA:
+                boxes.append(box)
+
+        det_centroids = [get_centroid(b) for b in boxes]
+
+        # If crowded, ignore new detections
+        if is_crowded_at_start:
+            used_det_indices = [True] * len(boxes)
+        else:
+            used_det_indices = [False] * len(boxes)
+
+        # 2. Track Matching & Update (one-to-one assignment, gated by MAX_DIST)
+        slots = tracks.active_slots()
+        tr_boxes = tracks.predicted_box(slots) if self.predict_motion else tracks.box[slots]
+        matches = tracker.match(tr_boxes, boxes, MAX_DIST, IOU_WEIGHT)
+        matched = np.zeros(0, dtype=np.int64)  # slots that got a new centroid this frame
+        if matches:
+            tr_idx, det_idx = np.array(matches).T
+            matched = slots[tr_idx]
+            tracks.update(matched, np.array(det_centroids)[det_idx], np.array(boxes)[det_idx])
+            for i in det_idx:
+                used_det_indices[i] = True
+
+        # 3. Create New Tracks
+        max_tracks = self.zones.max_tracks
+        if not is_crowded_at_start:
+            for i, is_used in enumerate(used_det_indices):
+                if not is_used:
+                    if max_tracks is None or len(tracks) < max_tracks:
+                        if self.store is not None:
+                            self.store.reserve_id(self.next_id)
+                        tracks.add(self.next_id, det_centroids[i], boxes[i])
+                        self.next_id += 1
+                    else:
+                        break
+
+        # 4. Remove Lost Tracks
+        tracks.age()
+        for slot in tracks.prune(MAX_LOST):
+            if tracks.entered[slot] and not tracks.exited[slot]:
+                log.info("track_lost_inside", camera=self.camera_id, id=int(tracks.ids[slot]))
+        if self.reconcile_in:
+            self.reconcile_in -= 1
+            if not self.reconcile_in:
+                self.reconcile()
+
+        # 5. ENTRY/EXIT LOGIC & Statistics Update
+        # Crossing tests run over the last step of every track matched this
+        # frame, all at once (zones.py); a lost track keeps its last step, which
+        # was already tested. Only the (rare) tracks that actually crossed a
+        # line are handled one by one, oldest first.
+        prev, curr, valid = tracks.last_two()
+        moving = matched[valid[matched] & np.any(prev[matched] != curr[matched], axis=1)]
+        steps, lines = self.zones.crossings(prev[moving], curr[moving])
+        crossed_slots, kinds = moving[steps], self.line_kind[lines]
+        entering = np.zeros(tracks.capacity, dtype=bool)
+        exiting = np.zeros(tracks.capacity, dtype=bool)
+        entering[crossed_slots[kinds == 1]] = True
+        exiting[crossed_slots[kinds == 2]] = True
+        entering &= ~tracks.entered
+        exiting &= tracks.entered & ~tracks.exited
+        hits = np.flatnonzero(entering | exiting)
+        now = time.time()
+        events = [ZoneEvent(CROSS, int(tracks.ids[slot]), self.zones.line_names[line], now)
+                  for slot, line in zip(crossed_slots[kinds == 0], lines[kinds == 0])]
+
+        for slot in hits[np.argsort(tracks.ids[hits], kind="stable")]:
+            tid = int(tracks.ids[slot])
+
+            # ENTRY crossing
+            if entering[slot]:
+                tracks.entered[slot] = True
+                tracks.entry_time[slot] = time.time()
+                if self.store is not None:
+                    self.store.record_enter(tid, float(tracks.entry_time[slot]))
+                self.entered += 1
+                ENTRIES.inc(camera=self.camera_id)
+                log.info("entered", camera=self.camera_id, id=tid)
+                if self.on_event is not None:
+                    self.on_event(ZoneEvent(ENTER, tid, self._line_name(slot, crossed_slots, lines, 1), now))
+
+            # EXIT crossing
+            else:
+                tracks.exited[slot] = True
+                exit_time = time.time()
+                entry_time = float(tracks.entry_time[slot])
+                stay = exit_time - entry_time
+                if self.store is not None:
+                    self.store.record_exit(tid, exit_time, stay)
+                self.exited += 1
+                tracks.waiting_time[slot] = stay
+                self.waits.add(stay)
+                EXITS.inc(camera=self.camera_id)
+                log.info("exited", camera=self.camera_id, id=tid,
+                         entry=time.strftime('%H:%M:%S', time.localtime(entry_time)),
+                         exit=time.strftime('%H:%M:%S', time.localtime(exit_time)), wait_s=round(stay, 2))
+
+                if self.on_event is not None:
+                    self.on_event(ZoneEvent(EXIT, tid, self._line_name(slot, crossed_slots, lines, 2), exit_time))
+
+                if not self.post_exits:
+                    continue
+
+                # The alert flag records whether the queue was at its limit with this
+                # person still inside (counted before the exit); layouts without a
+                # capacity fall back to "a zone was full when the frame started".
+                limit = self.zones.max_tracks
+                alert = (self.inside + 1) >= limit if limit is not None else is_crowded_at_start
+                post_exit_to_backend(tid, entry_time, exit_time, stay, alert, self.camera_id)
+
+        # 6. Zone membership: enter/exit/dwell events and per-zone occupancy
+        slots = tracks.active_slots()
+        events += self.zones.update_membership(tracks.ids[slots], curr[slots], now)
+        for event in events:
+            ZONE_EVENTS.inc(camera=self.camera_id, name=event.name, kind=event.kind)
+            log.debug(event.kind, camera=self.camera_id, id=event.track_id, name=event.name)
+            if self.on_event is not None:
+                self.on_event(event)
+        for z in np.flatnonzero(self.zones.occupancy != self.occupancy):
+            ZONE_OCCUPANCY.set(int(self.zones.occupancy[z]), camera=self.camera_id, zone=self.zones.zone_names[z])
+        self.occupancy = self.zones.occupancy.copy()
+
+        # 7. Gauges, and the crowd alert (logged while it lasts, not on every frame)
+        ACTIVE_TRACKS.set(len(tracks), camera=self.camera_id)
+        PEOPLE_INSIDE.set(self.inside, camera=self.camera_id)
+        crowded = self.is_crowded
+        CROWDED.set(int(crowded), camera=self.camera_id)
+        if crowded:
+            log.warning("crowd_alert", every=CROWD_ALERT_LOG_INTERVAL, camera=self.camera_id,
+                        zones=",".join(self.zones.crowded_zones()), inside=self.inside)
+
+        if self.store is not None:
+            self.store.maybe_checkpoint(self.entered, self.exited, self.waits)
+
+    def reconcile(self):
+        """Match the visits left open by the previous run to the people seen now.
+
+        The tracks that have not entered take over the open visits, oldest
+        first, with their original entry times; visits nobody is left for
+        are written off as lost.
+        """
+        tracks = self.tracks
+        slots = tracks.active_slots()
+        slots = slots[~tracks.entered[slots]]
+        slots = slots[np.argsort(tracks.ids[slots], kind="stable")]
+        visits = sorted(self.resumed_visits.items(), key=lambda visit: visit[1])
+        for slot, (previous_id, entry_time) in zip(slots, visits):
+            tracks.entered[slot] = True
+            tracks.entry_time[slot] = entry_time
+            self.store.record_adopt(int(tracks.ids[slot]), previous_id)
+        lost = [previous_id for previous_id, _ in visits[len(slots):]]
+        if lost:
+            self.store.record_lost(lost)
+            self.lost += len(lost)
+        log.info("counter_reconciled", camera=self.camera_id, adopted=min(len(slots), len(visits)),
+                 lost=len(lost), inside=self.inside)
+        self.resumed_visits = {}
+
+    def _line_name(self, slot: int, crossed_slots: np.ndarray, lines: np.ndarray, kind: int) -> str:
+        """Name of the first line of `kind` that `slot` crossed this frame."""
+        hit = lines[(crossed_slots == slot) & (self.line_kind[lines] == kind)][0]
+        return self.zones.line_names[hit]
+
+    def close(self):
+        """Write a final checkpoint (if the counts are persisted)."""
+        if self.store is not None:
+            self.store.close(self.entered, self.exited, self.waits)
+
+    def advance(self):
+        """Account for a frame on which inference was skipped.
+
+        Tracks keep moving along their predicted path, but they do not age:
+        MAX_LOST counts inference frames without a match. Crossings are only
+        tested between real detections, so entry/exit counting is unaffected.
+        """
+        self.tracks.tick()
+
+    def track_views(self) -> list:
+        """Copy of what the overlay needs from each track.
+
+        The drawing code works from this snapshot so it can run on another
+        thread while `update()` keeps mutating `tracks`.
+        """
+        t = self.tracks
+        slots = t.active_slots()
+        boxes = t.predicted_box(slots) if self.predict_motion else t.box[slots]
+        views = []
+        for slot, box in zip(slots, boxes):
+            entry_time = float(t.entry_time[slot])
+            waiting_time = float(t.waiting_time[slot])
+            views.append((
+                int(t.ids[slot]),
+                tuple(box.tolist()),
+                bool(t.entered[slot]),
+                bool(t.exited[slot]),
+                None if math.isnan(entry_time) else entry_time,
+                None if math.isnan(waiting_time) else waiting_time,
+            ))
+        return views
+
+    def layout_views(self) -> list:
+        """Copy of the lines and zones (with occupancy) for the overlay."""
+        return self.zones.views()
+
+    def stats(self) -> dict:
+        return {
+            'entered': self.entered,
+            'exited': self.exited,
+            'inside': self.inside,
+            'total_wait_time': self.waits.total,
+            'average_wait_time': self.waits.mean,
+            'p50_wait_time': self.waits.quantile(0.50),
+            'p95_wait_time': self.waits.quantile(0.95),
+            'is_crowded': self.is_crowded,
+            'current_people': len(self.tracks),
+            'max_limit': self.zones.max_tracks,
+            'zones': dict(zip(self.zones.zone_names, self.zones.occupancy.tolist())),
+            'crowded_zones': self.zones.crowded_zones(),
+            'ts': datetime.utcnow().isoformat()
+        }
+
+    def print_summary(self):
+        print(f"\n FINAL SUMMARY")
+        print(f"  → Total Entered: {self.entered}")
+        print(f"  → Total Exited: {self.exited}")
+        print(f"  → Current Inside (Estimated): {self.inside}")
+        print(f"  → Total Wait Time Recorded: {self.waits.total:.1f}s")
+        print(f"  → Average Wait Time: {self.waits.mean:.1f}s")
+        print(f"  → Median / p95 Wait Time: {self.waits.quantile(0.50):.1f}s / {self.waits.quantile(0.95):.1f}s")
+
+# -------------------- FRAME STAGES --------------------
+
+def detect_people(model, frame: np.ndarray) -> np.ndarray:
+    """Run the detector backend on a frame and return rows of [x1, y1, x2, y2, conf, cls]."""
+    return model.detect([frame], CONF_THRESHOLD)[0]
+
+def make_roi_detector():
+    from roi import RoiDetector
+    return RoiDetector(INFERENCE_ROIS, ROI_IMGSZ, CONF_THRESHOLD, FRAME_W, FRAME_H)
+
+def warm_up(model, detect=detect_people, runs: int = WARMUP_RUNS):
+    """Run `detect` on blank frames so the first real one does not pay for the model's set-up."""
+    blank = np.zeros((FRAME_H, FRAME_W, 3), dtype=np.uint8)
+    for _ in range(runs):
+        detect(model, blank)
+
+def detect_people_batch(model, frames: list) -> list:
+    """Run the detector once over several frames; returns one detections array per frame."""
+    return model.detect(frames, CONF_THRESHOLD)
+
+def draw_layout(frame: np.ndarray, layout: list):
+    """Draw the zones (with occupancy) and counting lines from `PeopleCounter.layout_views()`."""
+    for item in layout:
+        if item[0] == "zone":
+            _, name, polygon, occupancy, capacity = item
+            full = capacity and occupancy >= capacity
+            cv2.polylines(frame, [polygon], True, COL_ALERT if full else COL_ROOM, 2)
+            label = f"{name} {occupancy}/{capacity}" if capacity else f"{name} {occupancy}"
+            x, y = polygon[0]
+            cv2.putText(frame, label, (int(x) + 6, int(y) + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                        COL_ALERT if full else COL_DEFAULT, 1)
+    for item in layout:
+        if item[0] == "line":
+            _, name, role, a, b = item
+            color = COL_ENTRY if role == "entry" else COL_EXIT if role == "exit" else COL_LINE
+            cv2.line(frame, a, b, color, 3)
+            x, y = min(a, b, key=lambda p: p[1])  # label the upper end
+            cv2.putText(frame, name.upper(), (x + 10, y + 55), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+
+def draw_overlay(frame: np.ndarray, track_views: list, is_crowded: bool, layout: list = ()):
     # 6. DRAWING SECTION
-    cv2.rectangle(frame, (ROOM_X1, ROOM_Y1), (ROOM_X2, ROOM_Y2), COL_ROOM, 2)
-    cv2.line(frame, (ENTRY_LINE_X, ROOM_Y1), (ENTRY_LINE_X, ROOM_Y2), COL_ENTRY, 3)
-    cv2.putText(frame, "ENTRY", (ENTRY_LINE_X - 70, ROOM_Y1 + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, COL_ENTRY, 2)
-    cv2.line(frame, (EXIT_LINE_X, ROOM_Y1), (EXIT_LINE_X, ROOM_Y2), COL_EXIT, 3)
-    cv2.putText(frame, "EXIT", (EXIT_LINE_X + 10, ROOM_Y1 + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, COL_EXIT, 2)
-
-    for tid, t in tracks.items():
-        x1, y1, x2, y2 = t['box']
-        if t['entered'] and not t['exited']:
+    draw_layout(frame, layout)
+
+    for tid, box, has_entered, has_exited, entry_time, waiting_time in track_views:
+        x1, y1, x2, y2 = box
+        if has_entered and not has_exited:
             color = COL_INSIDE
-        elif t['exited']:
+        elif has_exited:
             color = COL_EXIT
         else:
             color = COL_DEFAULT
 
         cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
         label = f"ID:{tid}"
-        if t['entered'] and not t['exited']:
-            stay = int(time.time() - t['entry_time'])
+        if has_entered and not has_exited:
+            stay = int(time.time() - entry_time)
             label += f" | {stay}s (in)"
-        elif t['exited']:
-            stay = int(t['waiting_time'])
+        elif has_exited:
+            stay = int(waiting_time)
             label += f" | {stay}s (wait)"
         cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
@@ -280,63 +635,349 @@ while True:
         text_y = int(FRAME_H / 2)
         cv2.rectangle(frame, (text_x - 10, text_y - text_h - 10), (text_x + text_w + 10, text_y + 10), (0, 0, 255), -1)
         cv2.putText(frame, alert_text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 3)
-        print(f" CROWD ALERT: Limit of {MAX_PEOPLE} reached or exceeded. New people are NOT being tracked.")
-
-    # 7. SIDE PANEL
-    panel = np.full((FRAME_H, 300, 3), (25, 25, 25), np.uint8)
-    current_total_waiting = sum(waiting_times)
-    current_average_waiting = current_total_waiting / len(waiting_times) if waiting_times else 0.0
 
-    # draw_stats_panel(panel, entered, exited, current_total_waiting, current_average_waiting)
+def save_outputs(frame: np.ndarray, stats: dict, camera_id: str = None):
+    """Save current frame and stats to disk (debug mode only).
 
-    # Save current frame and stats for backend to serve if needed
+    With a `camera_id` the files get a per-camera suffix
+    (detection_frame_<id>.jpg / detection_state_<id>.json).
+    """
+    suffix = f"_{camera_id}" if camera_id is not None else ""
     try:
-        backend_dir = os.path.dirname(os.path.abspath(__file__))
-        frame_path = os.path.join(backend_dir, "detection_frame.jpg")
-        state_path = os.path.join(backend_dir, "detection_state.json")
+        frame_path = os.path.join(BACKEND_DIR, f"detection_frame{suffix}.jpg")
+        state_path = os.path.join(BACKEND_DIR, f"detection_state{suffix}.json")
         cv2.imwrite(frame_path, frame)
 
-        stats = {
-            'entered': entered,
-            'exited': exited,
-            'inside': entered - exited,
-            'total_wait_time': current_total_waiting,
-            'average_wait_time': current_average_waiting,
-            'is_crowded': is_crowded,
-            'current_people': len(tracks),
-            'max_limit': MAX_PEOPLE,
-            'ts': datetime.utcnow().isoformat()
-        }
         with open(state_path, 'w') as f:
             json.dump(stats, f)
     except Exception as e:
-        print(f"Error saving state/frame: {e}")
+        log.error("save_outputs_failed", every=PUBLISH_ERROR_LOG_INTERVAL, error=str(e))
+
+def stats_capacity(zones: ZoneEngine) -> int:
+    """Bytes the channel's stats record needs for this layout: the fixed fields
+    plus each zone's name twice (occupancy map and crowded_zones) and its count."""
+    return STATS_CAPACITY + sum(2 * len(json.dumps(name).encode()) + 24 for name in zones.zone_names)
+
+
+class FrameOutput:
+    """Hands each processed frame and its stats to app.py.
+
+    Stats go into the shared-memory channel on every frame. The frame itself
+    is annotated and handed over only while somebody will look at it: the
+    local window (`show`), a backend client (demand flagged through the
+    channel) or debug files (`write_files`). That happens on a render thread,
+    on a copy, so the detection loop pays for the copy and nothing else; when
+    drawing falls behind, the render thread skips to the newest frame.
+    Raw frames go into the ring (no encoding here); the backend encodes a
+    JPEG only when a client asks for one.
+    `stats_capacity` sizes the channel's stats record (see stats_capacity()).
+    """
 
-    # Publish stats to backend (throttled)
-    now = time.time()
-    if now - last_publish_time >= PUBLISH_INTERVAL:
+    def __init__(self, camera_id: str = None, write_files: bool = DEBUG_WRITE_FILES, show: bool = False,
+                 stats_capacity: int = STATS_CAPACITY):
+        self.camera_id = camera_id
+        self.write_files = write_files
+        self.show = show
+        self.channel = None
+        self.frames = 0
+        self.rendered_frames = 0
+        self.latest = None  # newest annotated frame, for the local window
+        try:
+            self.channel = FrameChannelWriter(channel_name(camera_id), FRAME_W, FRAME_H,
+                                              stats_capacity=stats_capacity)
+        except Exception as e:
+            log.warning("frame_channel_unavailable", camera=camera_id, error=str(e),
+                        detail="frames will not reach the backend")
+        self._cond = threading.Condition()
+        self._pending = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._render_loop, name=f"render-{camera_id or 'default'}",
+                                        daemon=True)
+        self._thread.start()
+
+    def wants_frames(self) -> bool:
+        return (self.show or self.write_files
+                or (self.channel is not None and self.channel.frames_wanted()))
+
+    def write_stats(self, stats: dict):
+        """Publish `stats` only (nobody wants the frame)."""
+        self.frames += 1
+        if self.channel is not None and not self.channel.write_stats(stats):
+            # Too big for the record: keep the totals current without the per-zone maps
+            log.warning("stats_too_large", every=PUBLISH_ERROR_LOG_INTERVAL, camera=self.camera_id,
+                        zones=len(stats.get("zones", ())), capacity=self.channel.stats_capacity)
+            self.channel.write_stats({k: v for k, v in stats.items() if k not in ("zones", "crowded_zones")})
+
+    def write(self, frame: np.ndarray, stats: dict, track_views: list = (), is_crowded: bool = False,
+              layout: list = ()):
+        """Publish `stats`, and queue `frame` for drawing and publishing if anyone wants it."""
+        self.write_stats(stats)
+        if not self.wants_frames():
+            return
+        with self._cond:
+            self._pending = (frame.copy(), track_views, is_crowded, layout, stats)
+            self._cond.notify()
+
+    def _render_loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                frame, track_views, is_crowded, layout, stats = self._pending
+                self._pending = None
+            with STAGE_SECONDS.time(stage="draw"):
+                draw_overlay(frame, track_views, is_crowded, layout)
+            if self.channel is not None:
+                self.channel.write_frame(frame)
+            if self.write_files:
+                save_outputs(frame, stats, self.camera_id)
+            self.latest = frame
+            self.rendered_frames += 1
+
+    def show_latest(self, window: str = "Smart Entry-Exit Tracker") -> bool:
+        """Show the newest annotated frame in the local window; False when 'q' was pressed."""
+        if self.latest is not None:
+            cv2.imshow(window, self.latest)
+        return not (cv2.waitKey(1) & 0xFF == ord('q'))
+
+    def close(self):
+        with self._cond:
+            self._closed = True  # the last pending frame is still drawn
+            self._cond.notify()
+        self._thread.join()
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+
+class StatsPublisher:
+    """Throttles `publish_stats` to at most once per PUBLISH_INTERVAL.
+
+    `send` replaces the HTTP POST, e.g. the in-process worker (worker.py)
+    hands stats straight to app.py's broadcaster.
+    """
+
+    def __init__(self, interval: float = PUBLISH_INTERVAL, send=None):
+        self.interval = interval
+        self.send = send or self._post_in_thread
+        self.last_publish_time = 0.0
+
+    def maybe_publish(self, stats: dict):
+        if time.time() - self.last_publish_time >= self.interval:
+            self.publish(stats)
+
+    def publish(self, stats: dict):
+        """Publish now, regardless of the throttle."""
+        self.send(stats)
+        self.last_publish_time = time.time()
+
+    @staticmethod
+    def _post_in_thread(stats: dict):
         try:
             threading.Thread(target=publish_stats, args=(stats,), daemon=True).start()
         except Exception as e:
-            print(f"[PUBLISH_THREAD] failed to start: {e}")
-        last_publish_time = now
+            PUBLISH_FAILURES.inc(kind="stats")
+            log.error("publish_thread_failed", every=PUBLISH_ERROR_LOG_INTERVAL, error=str(e))
+
+# -------------------- MAIN LOOP --------------------
+
+def open_counter_store(camera_id: str, reset: bool = False) -> CounterStore:
+    """Persistent counter state for `camera_id` in COUNTER_STATE_DIR (`reset` discards the old one)."""
+    if reset:
+        CounterStore.reset(COUNTER_STATE_DIR, camera_id)
+    return CounterStore(COUNTER_STATE_DIR, camera_id)
 
-    # Show locally (optional)
-    cv2.imshow("Smart Entry-Exit Tracker", frame)
+def load_zones(camera_id: str, path: str = ZONE_CONFIG) -> ZoneEngine:
+    """Lines and zones of `camera_id` from the layout file at `path` (DEFAULT_LAYOUT if it is missing)."""
+    return ZoneEngine(load_layout(path, camera_id, DEFAULT_LAYOUT))
 
-    # Quit Handler
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+class SourceOpener:
+    """Opens a capture on a background thread (cameras and streams take a while); `result()` waits for it."""
 
-cap.release()
-cv2.destroyAllWindows()
+    def __init__(self, source: str):
+        self.cap = None
+        self._thread = threading.Thread(target=self._open, args=(source,), name="source-open", daemon=True)
+        self._thread.start()
 
-final_total_waiting = sum(waiting_times)
-final_average_waiting = final_total_waiting / len(waiting_times) if waiting_times else 0.0
+    def _open(self, source: str):
+        self.cap = cv2.VideoCapture(parse_source(source))
 
-print(f"\n FINAL SUMMARY")
-print(f"  → Total Entered: {entered}")
-print(f"  → Total Exited: {exited}")
-print(f"  → Current Inside (Estimated): {entered - exited}")
-print(f"  → Total Wait Time Recorded: {final_total_waiting:.1f}s")
-print(f"  → Average Wait Time: {final_average_waiting:.1f}s")
+    def result(self):
+        self._thread.join()
+        return self.cap
+
+def parse_source(source: str):
+    """Camera indices come in as strings from the CLI; VideoCapture wants ints for those."""
+    return int(source) if source.isdigit() else source
+
+def run_sequential(model, cap, counter: PeopleCounter, adaptive=None, detect=detect_people,
+                   output: FrameOutput = None, publisher: StatsPublisher = None,
+                   stop: threading.Event = None):
+    """Original single-threaded loop: every stage runs back to back per frame.
+
+    `adaptive` (a cadence.AdaptiveInference) lets frames skip inference;
+    `detect` swaps in another detector such as roi.RoiDetector.
+    `stop` ends the loop from another thread. The local window is shown
+    (and 'q' quits) only when `output.show` is set.
+    """
+    publisher = publisher or StatsPublisher()
+    output = output or FrameOutput(stats_capacity=stats_capacity(counter.zones))
+
+    camera = counter.camera_id
+
+    while stop is None or not stop.is_set():
+        with STAGE_SECONDS.time(stage="capture"):
+            ret, frame = cap.read()
+            if ret:
+                frame = cv2.resize(frame, (FRAME_W, FRAME_H))
+        if not ret:
+            break
+        FRAMES_CAPTURED.inc(camera=camera)
+
+        if adaptive is not None:
+            with STAGE_SECONDS.time(stage="inference"):  # includes tracking on inference frames
+                adaptive.process(model, frame, counter)
+        else:
+            with STAGE_SECONDS.time(stage="inference"):
+                detections = detect(model, frame)
+            with STAGE_SECONDS.time(stage="tracking"):
+                counter.update(detections)
+
+        # Drawing happens on the output's render thread, and only if someone is watching
+        stats = counter.stats()
+        with STAGE_SECONDS.time(stage="output"):
+            if output.wants_frames():
+                output.write(frame, stats, counter.track_views(), counter.is_crowded, counter.layout_views())
+            else:
+                output.write_stats(stats)
+
+        # Publish stats to backend (throttled)
+        publisher.maybe_publish(stats)
+
+        mark_startup("first_frame")
+
+        # Show locally and handle 'q' (not in headless mode)
+        if output.show and not output.show_latest():
+            break
+
+def main():
+    parser = argparse.ArgumentParser(description="Smart entry/exit people tracker")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="run capture, inference, tracking and output as separate stages")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="run YOLO every Kth frame (K tuned to ADAPTIVE_TARGET_FPS) "
+                             "and skip it while the scene is static")
+    parser.add_argument("--roi", action="store_true",
+                        help="run YOLO only on INFERENCE_ROIS at ROI_IMGSZ instead of the full frame")
+    parser.add_argument("--backend", choices=BACKENDS, default=INFERENCE_BACKEND,
+                        help=f"detector backend (default: {INFERENCE_BACKEND})")
+    parser.add_argument("--int8", action="store_true", default=INFERENCE_INT8,
+                        help="use the INT8 quantized model (onnx/openvino backends)")
+    parser.add_argument("--headless", action="store_true", default=HEADLESS,
+                        help="no local window; the overlay is drawn only for backend viewers and debug files")
+    parser.add_argument("--debug-files", action="store_true", default=DEBUG_WRITE_FILES,
+                        help="also write detection_frame.jpg / detection_state.json every frame")
+    parser.add_argument("--source", nargs="+", default=["0"],
+                        help="camera index, video file or stream URL (default: 0); "
+                             "several sources share one model with batched inference")
+    parser.add_argument("--reset-counts", action="store_true",
+                        help="start entered/exited, wait statistics and track IDs from zero "
+                             "instead of resuming the previous run")
+    parser.add_argument("--zones", metavar="FILE", default=ZONE_CONFIG,
+                        help="JSON file with the counting lines and zones per camera "
+                             "(default: zones.json next to detection.py, else the built-in entry/exit lines)")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help=f"serve Prometheus metrics at :PORT/metrics (default: {METRICS_PORT}, 0 = off)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="run the sampling profiler and write collapsed stacks to FILE on exit")
+    args = parser.parse_args()
+    mark_startup("imports")
+
+    # Open a single source while the model loads and warms up
+    opener = SourceOpener(args.source[0]) if len(args.source) == 1 else None
+
+    if args.metrics_port:
+        try:
+            metrics.serve(args.metrics_port)
+        except OSError as e:
+            log.warning("metrics_server_failed", port=args.metrics_port, error=str(e))
+    profiler = SamplingProfiler() if args.profile else None
+    if profiler is not None:
+        profiler.start()
+
+    # Load Model
+    model = load_backend(args.backend, MODEL_PATH, args.int8)
+    mark_startup("model")
+
+    # Exit events go through one batching worker, started after the first
+    # frame (or by the first exit); anything spooled by a previous run is
+    # replayed as soon as it starts.
+    try:
+        run_detection(args, model, opener)
+    finally:
+        stop_exit_shipper()
+        if profiler is not None:
+            profiler.stop()
+            profiler.save(args.profile)
+            log.info("profile_saved", samples=profiler.samples, path=args.profile)
+
+def run_detection(args, model, opener: SourceOpener = None):
+    if len(args.source) > 1:
+        if args.pipeline or args.adaptive or args.roi:
+            log.warning("options_ignored", options="--pipeline/--adaptive/--roi", detail="several sources")
+        warm_up(model)
+        mark_startup("warmup")
+        from multicam import run_multicam
+        run_multicam(model, args.source, args.debug_files, show=not args.headless, reset_counts=args.reset_counts,
+                     zones_path=args.zones)
+        return
+
+    detect = make_roi_detector() if args.roi else detect_people
+    warm_up(model, detect)
+    mark_startup("warmup")
+
+    # Initialize Video Capture
+    cap = opener.result() if opener is not None else cv2.VideoCapture(parse_source(args.source[0]))
+    if not cap.isOpened():
+        log.error("source_unavailable", source=args.source[0])
+        sys.exit(1)
+    mark_startup("source")
+
+    counter = PeopleCounter(predict_motion=args.adaptive, store=open_counter_store(CAMERA_ID, args.reset_counts),
+                            zones=load_zones(CAMERA_ID, args.zones))
+    output = FrameOutput(write_files=args.debug_files, show=not args.headless,
+                         stats_capacity=stats_capacity(counter.zones))
+
+    print("Ctrl+C to quit." if args.headless else "press 'q' to quit.")
+
+    try:
+        if args.pipeline:
+            if args.adaptive:
+                log.warning("options_ignored", options="--adaptive", detail="--pipeline mode")
+            from pipeline import run_pipeline
+            run_pipeline(model, cap, counter, detect, output)
+        elif args.adaptive:
+            from cadence import AdaptiveInference
+            adaptive = AdaptiveInference(detect, ADAPTIVE_TARGET_FPS, ADAPTIVE_MAX_K,
+                                         MOTION_THRESHOLD, ADAPTIVE_MAX_SKIP)
+            run_sequential(model, cap, counter, adaptive, output=output)
+            print(adaptive.summary())
+        else:
+            run_sequential(model, cap, counter, detect=detect, output=output)
+    except KeyboardInterrupt:
+        pass  # Ctrl+C (the only way out when headless) ends the run like 'q'
+
+    output.close()
+    cap.release()
+    if output.show:
+        cv2.destroyAllWindows()
+
+    counter.close()
+    counter.print_summary()
+
+if __name__ == "__main__":
+    # pipeline.py and multicam.py import "detection": let that be this module
+    # rather than a second copy with its own start-up marks and exit shipper
+    sys.modules.setdefault("detection", sys.modules[__name__])
+    main()
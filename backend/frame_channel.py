@@ -0,0 +1,232 @@
+# frame_channel.py
+# Shared-memory channel between detection.py (writer) and app.py (reader).
+# The writer copies each annotated frame into a small ring of raw BGR slots
+# and the latest stats into a JSON record. Nothing is encoded or written to
+# disk on the detection hot path; the reader encodes a JPEG only when a client
+# actually asks for a frame, straight from the shared buffer.
+#
+# The reader also stamps a demand time whenever a client wants frames; the
+# writer annotates and copies frames in only while that stamp is recent, so a
+# detector nobody is watching does none of that work (stats always flow).
+#
+# The writer sizes the stats region (recorded in the header) for what it
+# publishes; the per-zone maps grow with the number of zones.
+#
+# Consistency uses seqlocks: the writer bumps a slot's sequence number to an
+# odd value before writing and to the next even value after. A reader checks
+# the number before and after using the data and retries if it changed.
+import json
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DEFAULT_CHANNEL = "queue_detector_frames"
+MAGIC = 0x51444643  # "QDFC"
+VERSION = 2
+DEFAULT_SLOTS = 3
+STATS_CAPACITY = 4096  # default size of the stats record; writers may ask for more
+DEMAND_TTL = 2.0  # seconds one request_frames() keeps the writer handing frames over
+
+# Header: magic, version, width, height, channels, slots, stats_capacity, pad
+_HEADER = struct.Struct("<8I")
+_LATEST_OFF = 32     # u64 frames written so far
+_HEARTBEAT_OFF = 40  # f64 time.time() of the last write
+_STATS_SEQ_OFF = 48  # u64 stats seqlock
+_STATS_LEN_OFF = 56  # u32 length of the JSON record
+_DEMAND_OFF = 64     # f64 time.time() a reader last asked for frames
+_SLOT_SEQ_OFF = 72   # u64[slots] per-slot seqlocks
+
+
+def channel_name(camera_id: str = None) -> str:
+    return DEFAULT_CHANNEL if camera_id is None else f"{DEFAULT_CHANNEL}_{camera_id}"
+
+
+def _layout(width: int, height: int, channels: int, slots: int, stats_capacity: int) -> tuple:
+    stats_off = _SLOT_SEQ_OFF + 8 * slots
+    frames_off = (stats_off + stats_capacity + 63) // 64 * 64
+    frame_bytes = width * height * channels
+    return stats_off, frames_off, frames_off + frame_bytes * slots
+
+
+def _untrack(shm: shared_memory.SharedMemory):
+    """Stop this process's resource tracker from unlinking a segment it only attached to."""
+    if sys.platform == "win32":
+        return
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+class _Views:
+    """NumPy views over a mapped channel."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, width: int, height: int, channels: int, slots: int,
+                 stats_capacity: int):
+        buf = shm.buf
+        stats_off, frames_off, _ = _layout(width, height, channels, slots, stats_capacity)
+        self.latest = np.ndarray((1,), np.uint64, buf, _LATEST_OFF)
+        self.heartbeat = np.ndarray((1,), np.float64, buf, _HEARTBEAT_OFF)
+        self.stats_seq = np.ndarray((1,), np.uint64, buf, _STATS_SEQ_OFF)
+        self.stats_len = np.ndarray((1,), np.uint32, buf, _STATS_LEN_OFF)
+        self.demand = np.ndarray((1,), np.float64, buf, _DEMAND_OFF)
+        self.slot_seq = np.ndarray((slots,), np.uint64, buf, _SLOT_SEQ_OFF)
+        self.stats = np.ndarray((stats_capacity,), np.uint8, buf, stats_off)
+        self.frames = np.ndarray((slots, height, width, channels), np.uint8, buf, frames_off)
+        self.slots = slots
+
+
+class FrameChannelWriter:
+    def __init__(self, name: str, width: int, height: int, channels: int = 3, slots: int = DEFAULT_SLOTS,
+                 stats_capacity: int = STATS_CAPACITY):
+        self.name = name
+        self.stats_capacity = stats_capacity
+        size = _layout(width, height, channels, slots, stats_capacity)[2]
+        header = _HEADER.pack(MAGIC, VERSION, width, height, channels, slots, stats_capacity, 0)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a previous run. Reuse it when the geometry matches
+            # so a running app.py keeps its mapping; otherwise recreate it.
+            self.shm = shared_memory.SharedMemory(name=name)
+            if self.shm.size < size or bytes(self.shm.buf[:_HEADER.size]) != header:
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        # The segment must outlive this process (app.py may still be reading).
+        _untrack(self.shm)
+        self.shm.buf[:_HEADER.size] = header
+        self.views = _Views(self.shm, width, height, channels, slots, stats_capacity)
+        self.seq = int(self.views.latest[0])
+
+    def write_frame(self, frame: np.ndarray):
+        v = self.views
+        slot = self.seq % v.slots
+        v.slot_seq[slot] = 2 * self.seq + 1
+        np.copyto(v.frames[slot], frame)
+        v.slot_seq[slot] = 2 * self.seq + 2
+        self.seq += 1
+        v.latest[0] = self.seq
+        v.heartbeat[0] = time.time()
+
+    def write_stats(self, stats: dict) -> bool:
+        """Publish `stats`; False (nothing written) if it does not fit the stats region."""
+        data = json.dumps(stats).encode()
+        if len(data) > self.stats_capacity:
+            return False
+        v = self.views
+        v.stats_seq[0] += 1
+        v.stats[:len(data)] = np.frombuffer(data, np.uint8)
+        v.stats_len[0] = len(data)
+        v.stats_seq[0] += 1
+        v.heartbeat[0] = time.time()
+        return True
+
+    def frames_wanted(self, ttl: float = DEMAND_TTL) -> bool:
+        """True if a reader asked for frames within the last `ttl` seconds."""
+        return time.time() - float(self.views.demand[0]) < ttl
+
+    def close(self):
+        self.views = None
+        self.shm.close()
+
+
+class FrameChannelReader:
+    """Attaches lazily, so app.py can start before (or without) detection.py."""
+
+    def __init__(self, name: str = DEFAULT_CHANNEL):
+        self.name = name
+        self.shm = None
+        self.views = None
+
+    def _attach(self) -> bool:
+        if self.views is not None:
+            return True
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except (FileNotFoundError, ValueError):
+            return False
+        _untrack(shm)
+        magic, version, width, height, channels, slots, stats_cap, _ = _HEADER.unpack(bytes(shm.buf[:_HEADER.size]))
+        if magic != MAGIC or version != VERSION or shm.size < _layout(width, height, channels, slots, stats_cap)[2]:
+            shm.close()
+            return False
+        self.shm = shm
+        self.views = _Views(shm, width, height, channels, slots, stats_cap)
+        return True
+
+    def heartbeat(self) -> float:
+        """time.time() of the writer's last update, 0.0 if not attached."""
+        if not self._attach():
+            return 0.0
+        return float(self.views.heartbeat[0])
+
+    def latest_seq(self) -> int:
+        if not self._attach():
+            return 0
+        return int(self.views.latest[0])
+
+    def request_frames(self) -> float:
+        """Tell the writer frames are wanted; returns the previous request time (0.0 if none)."""
+        if not self._attach():
+            return 0.0
+        previous = float(self.views.demand[0])
+        self.views.demand[0] = time.time()
+        return previous
+
+    def wait_for_frame(self, after: int, timeout: float) -> bool:
+        """Poll until latest_seq() passes `after`; False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.latest_seq() <= after:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def read_frame(self, use, retries: int = 5):
+        """Call `use(view)` on the newest frame without copying it out.
+
+        `view` is only valid inside `use`; return whatever should outlive it
+        (for example the encoded JPEG). Returns (seq, result) or None.
+        """
+        if not self._attach():
+            return None
+        v = self.views
+        for _ in range(retries):
+            latest = int(v.latest[0])
+            if latest == 0:
+                return None
+            seq = latest - 1
+            slot = seq % v.slots
+            before = int(v.slot_seq[slot])
+            if before != 2 * seq + 2:
+                continue
+            result = use(v.frames[slot])
+            if int(v.slot_seq[slot]) == before:
+                return seq, result
+        return None
+
+    def read_stats(self, retries: int = 5):
+        if not self._attach():
+            return None
+        v = self.views
+        for _ in range(retries):
+            before = int(v.stats_seq[0])
+            if before == 0:
+                return None
+            if before % 2:
+                continue
+            data = bytes(v.stats[:int(v.stats_len[0])])
+            if int(v.stats_seq[0]) == before:
+                return json.loads(data)
+        return None
+
+    def close(self):
+        self.views = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
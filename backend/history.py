@@ -0,0 +1,165 @@
+# history.py
+# Paged and streamed reads of queuedata for reporting.
+# `page()` returns visits newest exit first, continuing after an opaque keyset
+# cursor on (exitTime, row_id). The row comparison is an index condition on
+# ix_queuedata_exit, so page 10,000 costs the same as page 1 (no OFFSET).
+# `export()` streams every matching row as NDJSON or CSV from a server-side
+# cursor, fetching EXPORT_CHUNK rows at a time and encoding each chunk on a
+# worker thread. Only a couple of chunks are ever held, so memory stays flat
+# for any number of rows, and the event loop keeps serving other requests.
+# Rows without an exitTime (still inside) have no place in this order and are
+# not returned.
+import asyncio
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import SmallInteger, select, tuple_, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import queueData
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK = 1000  # rows per server-side cursor fetch (and per response chunk)
+EXPORT_BUFFER = 2  # encoded chunks fetched ahead of the client
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+q = queueData
+FIELDS = ("row_id", "id", "camera_id", "session_id", "entryTime", "exitTime", "waitTime", "alert")
+# alert as its plain 0/1 value rather than AlertStatus (cheaper, and that is what gets written)
+COLUMNS = [q.__table__.c[name] for name in FIELDS[:-1]] + [type_coerce(q.alert, SmallInteger).label("alert")]
+_json = json.JSONEncoder(separators=(",", ":"))
+
+
+def encode_cursor(exit_time: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{exit_time.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """(exitTime, row_id) from `encode_cursor`; ValueError if it is not one."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        exit_time, row_id = raw.split("|")
+        return datetime.fromisoformat(exit_time), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+
+
+def filtered(start: Optional[datetime] = None, end: Optional[datetime] = None,
+             alert: Optional[int] = None, camera: Optional[str] = None):
+    """SELECT of the exported columns for exits in [start, end), optionally one alert status / camera."""
+    stmt = select(*COLUMNS).where(q.exitTime.isnot(None))
+    if start is not None:
+        stmt = stmt.where(q.exitTime >= start)
+    if end is not None:
+        stmt = stmt.where(q.exitTime < end)
+    if alert is not None:
+        stmt = stmt.where(q.alert == alert)
+    if camera is not None:
+        stmt = stmt.where(q.camera_id == camera)
+    return stmt
+
+
+def _row(r) -> dict:
+    return {
+        "row_id": r.row_id,
+        "id": r.id,
+        "camera_id": r.camera_id,
+        "session_id": r.session_id,
+        "entryTime": r.entryTime.isoformat() if r.entryTime else None,
+        "exitTime": r.exitTime.isoformat() if r.exitTime else None,
+        "waitTime": r.waitTime,
+        "alert": r.alert,
+    }
+
+
+async def page(db: AsyncSession, limit: int = PAGE_SIZE, cursor: Optional[str] = None, **filters) -> dict:
+    """One page, newest exit first, plus the cursor of the next one (None on the last page)."""
+    stmt = filtered(**filters)
+    if cursor:
+        stmt = stmt.where(tuple_(q.exitTime, q.row_id) < tuple_(*decode_cursor(cursor)))
+    # One extra row tells whether there is a next page without a COUNT
+    stmt = stmt.order_by(q.exitTime.desc().nulls_last(), q.row_id.desc()).limit(limit + 1)
+    rows = (await db.execute(stmt)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "entries": [_row(r) for r in rows],
+        "next_cursor": encode_cursor(rows[-1].exitTime, rows[-1].row_id) if more else None,
+    }
+
+
+def _iso(ts: Optional[datetime]) -> Optional[str]:
+    return ts.isoformat() if ts is not None else None
+
+
+def _encode_csv(rows: list, header: bool) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(FIELDS)
+    writer.writerows((r[0], r[1], r[2], r[3], _iso(r[4]), _iso(r[5]), r[6], r[7]) for r in rows)
+    return buf.getvalue().encode()
+
+
+def _encode_ndjson(rows: list) -> bytes:
+    lines = []
+    for r in rows:
+        d = dict(zip(FIELDS, r))
+        d["entryTime"] = _iso(r[4])
+        d["exitTime"] = _iso(r[5])
+        lines.append(_json.encode(d))
+    lines.append("")
+    return "\n".join(lines).encode()
+
+
+async def _produce(session_factory, fmt: str, filters: dict, chunks: asyncio.Queue, stop: asyncio.Event):
+    stmt = filtered(**filters).order_by(q.exitTime, q.row_id)
+    first = True
+    try:
+        async with session_factory() as db:
+            result = await db.stream(stmt.execution_options(yield_per=EXPORT_CHUNK))
+            async for rows in result.partitions():
+                if stop.is_set():
+                    return
+                if fmt == "csv":
+                    chunk = await asyncio.to_thread(_encode_csv, rows, first)
+                else:
+                    chunk = await asyncio.to_thread(_encode_ndjson, rows)
+                await chunks.put(chunk)
+                first = False
+            if first and fmt == "csv":
+                await chunks.put(_encode_csv([], header=True))
+    finally:
+        if not stop.is_set():
+            await chunks.put(None)
+
+
+async def export(session_factory, fmt: str, **filters):
+    """Async iterator of encoded chunks, oldest exit first, for a StreamingResponse.
+
+    The rows are fetched and encoded by a separate task with its own session
+    (the response body is produced after the endpoint has returned), at most
+    EXPORT_BUFFER chunks ahead of the client. When the client disconnects, the
+    task is told to stop rather than cancelled, so it finishes its current
+    fetch, closes the cursor and returns the connection to the pool cleanly.
+    """
+    chunks = asyncio.Queue(maxsize=EXPORT_BUFFER)
+    stop = asyncio.Event()
+    producer = asyncio.create_task(_produce(session_factory, fmt, filters, chunks, stop))
+    try:
+        while (chunk := await chunks.get()) is not None:
+            yield chunk
+        await producer  # re-raises a failed query
+    finally:
+        stop.set()
+        while not chunks.empty():  # unblock a pending put
+            chunks.get_nowait()
+        # Also when the client left before the first chunk: let the task see
+        # `stop` and close its cursor. Shielded, because a disconnect cancels
+        # this generator and would otherwise cancel the task mid-fetch too.
+        await asyncio.shield(asyncio.gather(producer, return_exceptions=True))
@@ -0,0 +1,264 @@
+# inference.py
+# Pluggable detector backends.
+# Every backend exposes the same `detect(frames, conf, imgsz=None)` call that
+# returns one [x1, y1, x2, y2, conf, cls] array per frame (person class only),
+# which is exactly what PeopleCounter.update() consumes.
+#
+#   torch     - ultralytics + PyTorch (the original path)
+#   onnx      - ONNX Runtime on an exported .onnx model
+#   openvino  - OpenVINO runtime on an exported IR model
+#
+# Only the torch backend imports ultralytics/torch, and only when it is built,
+# so the ONNX and OpenVINO paths start without loading PyTorch at all.
+# Start-up work is cached next to the exported model: ONNX Runtime saves the
+# graph after its (portable) optimizations to <model>.opt.onnx on first load,
+# and OpenVINO keeps its compiled blobs in <model dir>/cache.
+# Exporting is a one-time step that does need ultralytics:
+#
+#   python inference.py --export onnx [--int8]
+#   python inference.py --export openvino [--int8]
+import os
+import argparse
+import cv2
+import numpy as np
+
+from logs import get_logger
+
+log = get_logger("inference")
+
+BACKENDS = ("torch", "onnx", "openvino")
+DEFAULT_IMGSZ = 640
+NMS_IOU = 0.7  # same default as ultralytics
+PERSON_CLASS = 0
+OPENVINO_CACHE = "cache"  # compiled-model cache, inside the OpenVINO model directory
+
+
+def artifact_path(model_path: str, backend: str, int8: bool = False) -> str:
+    """Where the exported model for `backend` lives, next to the .pt file.
+
+    yolov8n.pt -> yolov8n.onnx / yolov8n_int8.onnx
+               -> yolov8n_openvino_model/ / yolov8n_int8_openvino_model/
+    """
+    stem, _ = os.path.splitext(model_path)
+    if backend == "onnx":
+        return f"{stem}_int8.onnx" if int8 else f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    return model_path
+
+
+def optimized_path(path: str) -> str:
+    """Where ONNX Runtime's optimized copy of `path` is cached: yolov8n.onnx -> yolov8n.opt.onnx."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.opt{ext}"
+
+
+# -------------------- EXPORT --------------------
+
+def export_model(model_path: str, backend: str, int8: bool = False, imgsz: int = DEFAULT_IMGSZ) -> str:
+    """Export `model_path` for `backend` once; later calls reuse the artifact."""
+    target = artifact_path(model_path, backend, int8)
+    if os.path.exists(target):
+        return target
+
+    from ultralytics import YOLO
+
+    if backend == "onnx":
+        fp32 = artifact_path(model_path, "onnx")
+        if not os.path.exists(fp32):
+            exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+            if os.path.abspath(exported) != os.path.abspath(fp32):
+                os.replace(exported, fp32)
+        if int8:
+            # Dynamic (weight-only) quantization needs no calibration data.
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(fp32, target, weight_type=QuantType.QUInt8)
+        return target
+
+    if backend == "openvino":
+        # ultralytics handles INT8 for OpenVINO through NNCF post-training quantization.
+        exported = YOLO(model_path).export(format="openvino", imgsz=imgsz, int8=int8)
+        if os.path.abspath(exported) != os.path.abspath(target):
+            os.replace(exported, target)
+        return target
+
+    raise ValueError(f"Nothing to export for backend {backend!r}")
+
+
+# -------------------- PRE/POST PROCESSING --------------------
+
+def letterbox(frame: np.ndarray, size: int) -> tuple:
+    """Resize keeping aspect ratio and pad to size x size (ultralytics style).
+
+    Returns (image, scale, (pad_x, pad_y)).
+    """
+    h, w = frame.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+    return canvas, scale, (pad_x, pad_y)
+
+
+def to_blob(images: list) -> np.ndarray:
+    """BGR uint8 HWC images -> RGB float32 NCHW in [0, 1]."""
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+def decode(output: np.ndarray, conf: float, scale: float, pad: tuple, frame_shape: tuple) -> np.ndarray:
+    """Raw YOLOv8 head output (84, N) for one image -> person rows in frame coordinates."""
+    scores = output[4 + PERSON_CLASS]
+    keep = scores >= conf
+    if not keep.any():
+        return np.zeros((0, 6), dtype=np.float32)
+    cx, cy, w, h = output[:4, keep]
+    scores = scores[keep]
+
+    x1 = (cx - w / 2 - pad[0]) / scale
+    y1 = (cy - h / 2 - pad[1]) / scale
+    x2 = (cx + w / 2 - pad[0]) / scale
+    y2 = (cy + h / 2 - pad[1]) / scale
+    fh, fw = frame_shape[:2]
+    boxes = np.stack([x1.clip(0, fw), y1.clip(0, fh), x2.clip(0, fw), y2.clip(0, fh)], axis=1)
+
+    idx = cv2.dnn.NMSBoxes(
+        np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]]).tolist(),
+        scores.tolist(), conf, NMS_IOU,
+    )
+    idx = np.asarray(idx, dtype=np.int64).reshape(-1)
+    rows = np.zeros((len(idx), 6), dtype=np.float32)
+    rows[:, :4] = boxes[idx]
+    rows[:, 4] = scores[idx]
+    rows[:, 5] = PERSON_CLASS
+    return rows
+
+
+# -------------------- BACKENDS --------------------
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model_path: str):
+        from ultralytics import YOLO
+        self.model = YOLO(model_path)
+
+    def detect(self, frames: list, conf: float, imgsz: int = None) -> list:
+        kwargs = {"imgsz": imgsz} if imgsz else {}
+        results = self.model(frames, verbose=False, classes=PERSON_CLASS, conf=conf, **kwargs)
+        return [r.boxes.data.cpu().numpy() for r in results]
+
+
+class _ExportedBackend:
+    """Shared letterbox -> run -> decode loop for the exported-model backends."""
+
+    name = None
+    fixed_batch = False
+    fixed_size = False
+
+    def __init__(self, imgsz: int):
+        self.imgsz = imgsz
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def detect(self, frames: list, conf: float, imgsz: int = None) -> list:
+        # A requested `imgsz` is honoured when the graph was exported with
+        # dynamic spatial dimensions, otherwise the graph's own size is used.
+        size = imgsz if imgsz and not self.fixed_size else self.imgsz
+        prepared = [letterbox(f, size) for f in frames]
+        blob = to_blob([p[0] for p in prepared])
+        if self.fixed_batch and len(frames) > 1:
+            outputs = np.concatenate([self._run(blob[i:i + 1]) for i in range(len(frames))])
+        else:
+            outputs = self._run(blob)
+        return [
+            decode(out, conf, scale, pad, frame.shape)
+            for out, (_, scale, pad), frame in zip(outputs, prepared, frames)
+        ]
+
+
+class OnnxBackend(_ExportedBackend):
+    name = "onnx"
+
+    def __init__(self, path: str, imgsz: int = DEFAULT_IMGSZ):
+        import onnxruntime as ort
+        super().__init__(imgsz)
+        cached = optimized_path(path)
+        if not (os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(path)):
+            # Save the graph after the optimizations that do not depend on this
+            # CPU; the hardware-specific ones still run on every load.
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+            options.optimized_model_filepath = cached
+            try:
+                ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+            except Exception as e:
+                log.warning("graph_cache_failed", path=cached, error=str(e))
+                cached = path
+        self.session = ort.InferenceSession(cached, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.fixed_batch = isinstance(inp.shape[0], int)
+        self.fixed_size = isinstance(inp.shape[2], int)
+        if self.fixed_size:
+            self.imgsz = inp.shape[2]
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(_ExportedBackend):
+    name = "openvino"
+
+    def __init__(self, path: str, imgsz: int = DEFAULT_IMGSZ):
+        import openvino as ov
+        super().__init__(imgsz)
+        if os.path.isdir(path):
+            path = next(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".xml"))
+        core = ov.Core()
+        core.set_property({"CACHE_DIR": os.path.join(os.path.dirname(path), OPENVINO_CACHE)})
+        self.compiled = core.compile_model(core.read_model(path), "CPU")
+        self.output = self.compiled.output(0)
+        shape = self.compiled.input(0).get_partial_shape()
+        self.fixed_batch = shape[0].is_static
+        self.fixed_size = shape[2].is_static
+        if self.fixed_size:
+            self.imgsz = shape[2].get_length()
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        return self.compiled(blob)[self.output]
+
+
+def load_backend(backend: str, model_path: str, int8: bool = False):
+    """Build the detector for `backend`, exporting the model first if needed."""
+    if backend == "torch":
+        if int8:
+            log.warning("int8_unsupported", backend=backend, detail="INT8 is only available for onnx/openvino")
+        return TorchBackend(model_path)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+
+    path = artifact_path(model_path, backend, int8)
+    if not os.path.exists(path):
+        log.info("exporting_model", model=model_path, to=path, detail="one-time")
+        path = export_model(model_path, backend, int8)
+    if backend == "onnx":
+        return OnnxBackend(path)
+    return OpenVinoBackend(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the detection model for a non-torch backend")
+    parser.add_argument("--export", choices=("onnx", "openvino"), required=True)
+    parser.add_argument("--int8", action="store_true", help="also produce the INT8 quantized variant")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    args = parser.parse_args()
+    print(export_model(args.model, args.export, args.int8, args.imgsz))
+
+
+if __name__ == "__main__":
+    main()
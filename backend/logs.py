@@ -0,0 +1,114 @@
+# logs.py
+# Structured, rate-limited logging for the detector and the backend.
+# `get_logger(name)` returns an EventLogger; each call takes an event name plus
+# key=value fields and writes one line, logfmt by default or JSON with
+# LOG_FORMAT=json:
+#
+#   2026-10-17T09:12:03.418 WARNING detection crowd_alert inside=4 limit=4 suppressed=211
+#
+# `every=` rate limits an event to one line per that many seconds; the number
+# of lines held back in between is reported on the next one. Conditions that
+# hold for many frames in a row (the crowd alert, a backend that is down) log
+# through that instead of printing on every frame.
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "logfmt")  # "logfmt" or "json"
+ROOT = "queue"  # all loggers live under this name, so one handler covers them
+
+
+def _logfmt_value(value) -> str:
+    if isinstance(value, float):
+        value = round(value, 3)
+    text = str(value)
+    if text == "" or any(c in text for c in ' ="'):
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+
+class _Formatter(logging.Formatter):
+    def __init__(self, fmt: str):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        ts = datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds")
+        name = record.name[len(ROOT) + 1:] if record.name.startswith(ROOT + ".") else record.name
+        fields = getattr(record, "fields", {})
+        if self.json:
+            return json.dumps({"ts": ts, "level": record.levelname, "logger": name,
+                               "event": record.getMessage(), **fields}, default=str)
+        line = f"{ts} {record.levelname} {name} {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{k}={_logfmt_value(v)}" for k, v in fields.items())
+        return line
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _configure():
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(_Formatter(LOG_FORMAT))
+        root = logging.getLogger(ROOT)
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False  # uvicorn configures the root logger its own way
+        _configured = True
+
+
+class EventLogger:
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(f"{ROOT}.{name}")
+        self._lock = threading.Lock()
+        self._limits = {}  # event -> [next allowed monotonic time, suppressed count]
+
+    def _log(self, level: int, event: str, every, fields: dict):
+        if not self.logger.isEnabledFor(level):
+            return
+        if every is not None:
+            now = time.monotonic()
+            with self._lock:
+                limit = self._limits.get(event)
+                if limit is not None and now < limit[0]:
+                    limit[1] += 1
+                    return
+                suppressed = limit[1] if limit is not None else 0
+                self._limits[event] = [now + every, 0]
+            if suppressed:
+                fields["suppressed"] = suppressed
+        self.logger.log(level, event, extra={"fields": fields})
+
+    def debug(self, event: str, every: float = None, **fields):
+        self._log(logging.DEBUG, event, every, fields)
+
+    def info(self, event: str, every: float = None, **fields):
+        self._log(logging.INFO, event, every, fields)
+
+    def warning(self, event: str, every: float = None, **fields):
+        self._log(logging.WARNING, event, every, fields)
+
+    def error(self, event: str, every: float = None, **fields):
+        self._log(logging.ERROR, event, every, fields)
+
+
+def set_level(level):
+    """Change the level of every logger at run time (a name such as "WARNING" or a number)."""
+    _configure()
+    logging.getLogger(ROOT).setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def get_logger(name: str) -> EventLogger:
+    _configure()
+    return EventLogger(name)
@@ -0,0 +1,204 @@
+# migrate.py
+# Brings the queuedata table up to the layout in models.py.
+#
+# The original table (created by earlier versions of create.py) used the
+# tracker id plus entryTime as its primary key, had no camera/session columns,
+# no index on exitTime and stored `alert` as a Postgres enum. upgrade() renames
+# it to queuedata_legacy, creates the new table, copies the rows over in
+# entryTime order (camera "default", session "legacy"), builds the indexes
+# after the copy and analyzes the table. Everything runs in one transaction.
+#
+# With --partition the new table is range partitioned by month on entryTime.
+# Partitions are created for the months already holding data plus
+# --months-ahead future months, and a default partition catches anything
+# outside them. Re-run this script (e.g. monthly from cron) to keep creating
+# partitions ahead of time; on an up-to-date table that is all it does.
+#
+#   python migrate.py                      # upgrade / create, unpartitioned
+#   python migrate.py --partition          # upgrade / create (or convert), partitioned
+#   python migrate.py --drop-legacy        # also drop the old table once copied
+import argparse
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from database import engine
+from models import queueData
+
+TABLE = queueData.__tablename__
+LEGACY_TABLE = "queuedata_legacy"
+DEFAULT_PARTITION = f"{TABLE}_default"
+MONTHS_AHEAD = 3
+
+# Columns copied from a table already in the current layout
+COLUMNS = '"row_id", "entryTime", "camera_id", "session_id", "id", "exitTime", "waitTime", "alert"'
+
+# Select list that maps an old-layout row onto the current columns
+LEGACY_SELECT = (
+    '"entryTime", \'default\', \'legacy\', "id", "exitTime", "waitTime", '
+    "CASE WHEN alert::text = 'ALERT_POPPED' THEN 1 WHEN alert IS NULL THEN NULL ELSE 0 END"
+)
+LEGACY_COLUMNS = '"entryTime", "camera_id", "session_id", "id", "exitTime", "waitTime", "alert"'
+
+
+def layout(conn) -> str:
+    """'missing', 'legacy' or 'current' for the queuedata table."""
+    insp = inspect(conn)
+    if not insp.has_table(TABLE):
+        return "missing"
+    columns = {c["name"] for c in insp.get_columns(TABLE)}
+    return "current" if "row_id" in columns else "legacy"
+
+
+def is_partitioned(conn, table: str = TABLE) -> bool:
+    return conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t))"),
+        {"t": table},
+    ).scalar()
+
+
+def month_start(ts: datetime) -> datetime:
+    return datetime(ts.year, ts.month, 1)
+
+
+def next_month(ts: datetime) -> datetime:
+    return datetime(ts.year + ts.month // 12, ts.month % 12 + 1, 1)
+
+
+def _add_months(ts: datetime, months: int) -> datetime:
+    month = month_start(ts)
+    for _ in range(months):
+        month = next_month(month)
+    return month
+
+
+def create_table(conn, partitioned: bool = False):
+    """CREATE TABLE for queuedata, without its secondary indexes (see create_indexes)."""
+    table = queueData.__table__
+    if partitioned:
+        table = table.to_metadata(MetaData())
+        table.dialect_kwargs["postgresql_partition_by"] = 'RANGE ("entryTime")'
+    conn.execute(CreateTable(table, include_foreign_key_constraints=[]))
+
+
+def create_indexes(conn):
+    """Indexes declared in models.py (on a partitioned table they cascade to every partition)."""
+    for index in queueData.__table__.indexes:
+        conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def ensure_partitions(conn, start: datetime, end: datetime):
+    """Monthly partitions covering [start, end), plus the default partition."""
+    month = month_start(start)
+    while month < end:
+        upper = next_month(month)
+        name = f"{TABLE}_p{month:%Y_%m}"
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        ))
+        month = upper
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+
+
+def _rename_aside(conn, new_name: str):
+    """Move the existing table, and the names of its indexes and sequence, out of the way."""
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {new_name}"))
+    for name, kind in conn.execute(text(
+        "SELECT c.relname, c.relkind FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = to_regclass(:t) "
+        "UNION ALL SELECT c.relname, c.relkind FROM pg_depend d JOIN pg_class c ON c.oid = d.objid "
+        "WHERE d.refobjid = to_regclass(:t) AND c.relkind = 'S'"
+    ), {"t": new_name}).all():
+        # Renaming an index also renames the constraint it backs (e.g. queuedata_pkey)
+        renamed = name.replace(TABLE, new_name, 1) if TABLE in name else f"{name}_{new_name}"
+        kind = "SEQUENCE" if kind == "S" else "INDEX"
+        conn.execute(text(f'ALTER {kind} "{name}" RENAME TO "{renamed}"'))
+
+
+def _time_range(conn, table: str):
+    return conn.execute(text(f'SELECT min("entryTime"), max("entryTime") FROM {table}')).one()
+
+
+def _create_for(conn, partitioned: bool, lo, hi, months_ahead: int):
+    """Create the table; partitioned, with partitions from `lo` to `months_ahead` past `hi`."""
+    create_table(conn, partitioned)
+    if partitioned:
+        now = datetime.now()
+        ensure_partitions(conn, min(lo or now, now), _add_months(max(hi or now, now), months_ahead + 1))
+
+
+def _finish(conn, old: str, drop_old: bool):
+    create_indexes(conn)
+    # Keep the surrogate key sequence ahead of any copied row_id
+    conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'row_id'), "
+        f"COALESCE((SELECT max(row_id) FROM {TABLE}), 0) + 1, false)"
+    ))
+    conn.execute(text(f"ANALYZE {TABLE}"))
+    if drop_old:
+        conn.execute(text(f"DROP TABLE {old}"))
+        if old == LEGACY_TABLE:
+            conn.execute(text("DROP TYPE IF EXISTS alertstatus"))  # the old `alert` column type
+
+
+def upgrade(conn, partition: bool = False, months_ahead: int = MONTHS_AHEAD, drop_legacy: bool = False) -> str:
+    """Create or upgrade queuedata (call through `AsyncConnection.run_sync`). Returns what was done."""
+    state = layout(conn)
+
+    if state == "missing":
+        _create_for(conn, partition, None, None, months_ahead)
+        create_indexes(conn)
+        return "created" + (" (partitioned)" if partition else "")
+
+    if state == "legacy":
+        _rename_aside(conn, LEGACY_TABLE)
+        lo, hi = _time_range(conn, LEGACY_TABLE)
+        _create_for(conn, partition, lo, hi, months_ahead)
+        copied = conn.execute(text(
+            f"INSERT INTO {TABLE} ({LEGACY_COLUMNS}) "
+            f'SELECT {LEGACY_SELECT} FROM {LEGACY_TABLE} ORDER BY "entryTime", id'
+        )).rowcount
+        _finish(conn, LEGACY_TABLE, drop_legacy)
+        return f"migrated {copied} legacy row(s)" + (" (partitioned)" if partition else "")
+
+    partitioned = is_partitioned(conn)
+    if partition and not partitioned:
+        old = f"{TABLE}_unpartitioned"
+        _rename_aside(conn, old)
+        lo, hi = _time_range(conn, old)
+        _create_for(conn, True, lo, hi, months_ahead)
+        copied = conn.execute(text(
+            f'INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {old} ORDER BY "entryTime"'
+        )).rowcount
+        _finish(conn, old, drop_old=True)
+        return f"partitioned {copied} row(s)"
+
+    if partitioned:
+        # New partitions inherit the parent's indexes
+        ensure_partitions(conn, datetime.now(), _add_months(datetime.now(), months_ahead + 1))
+        return "up to date (partitions ensured)"
+
+    create_indexes(conn)
+    return "up to date"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Create or upgrade the queuedata table")
+    parser.add_argument("--partition", action="store_true", help="range partition queuedata by month")
+    parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD,
+                        help=f"future monthly partitions to keep (default: {MONTHS_AHEAD})")
+    parser.add_argument("--drop-legacy", action="store_true",
+                        help=f"drop {LEGACY_TABLE} after copying it (default: keep it)")
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        result = await conn.run_sync(upgrade, args.partition, args.months_ahead, args.drop_legacy)
+    await engine.dispose()
+    print(f"[MIGRATE] {TABLE}: {result}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,5 @@
-from sqlalchemy import Column,Integer,Float,String,DateTime,Enum
+from sqlalchemy import Column,Integer,BigInteger,SmallInteger,Float,String,DateTime,Index,UniqueConstraint
+from sqlalchemy.types import TypeDecorator
 from database import Base
 from datetime import datetime
 import enum
@@ -9,14 +10,71 @@ class AlertStatus(enum.Enum):
     ALERT_POPPED = 1  # alert was popped at timestamp
 
 
+class AlertType(TypeDecorator):
+    """AlertStatus stored as a smallint (0/1) rather than a Postgres enum type."""
+    impl=SmallInteger
+    cache_ok=True
+
+    def process_bind_param(self,value,dialect):
+        if value is None:
+            return None
+        return value.value if isinstance(value,AlertStatus) else int(value)
+
+    def process_result_value(self,value,dialect):
+        return None if value is None else AlertStatus(value)
+
+
 class queueData(Base):
+    """One visit (entry to exit) of a tracked person.
+
+    `row_id` is the surrogate key; `id` is the tracker id, which restarts with
+    every detector session, so a visit is identified by camera, session, id and
+    entryTime. entryTime is part of the primary key so the table can be range
+    partitioned by month (see migrate.py).
+    """
     __tablename__="queuedata"
+    __table_args__=(
+        UniqueConstraint("camera_id","session_id","id","entryTime",name="uq_queuedata_visit"),
+    )
 
-    id=Column(Integer,primary_key=True,index=True)
+    row_id=Column(BigInteger,primary_key=True,autoincrement=True)
     entryTime=Column(DateTime,default=datetime.now,primary_key=True)
+    camera_id=Column(String(64),nullable=False,default="default",server_default="default")
+    session_id=Column(String(64),nullable=False,default="",server_default="")
+    id=Column(Integer,nullable=False)
     exitTime=Column(DateTime)
     waitTime=Column(Float)
-    alert=Column(Enum(AlertStatus),nullable=True,default=AlertStatus.NO_ALERT)
+    alert=Column(AlertType,nullable=True,default=AlertStatus.NO_ALERT)
+
+
+# Newest exits first (/recent-entries and paging by exitTime)
+Index("ix_queuedata_exit",queueData.exitTime.desc().nulls_last(),queueData.row_id.desc())
+# Rows arrive roughly in entryTime order, so a BRIN index stays tiny and still prunes time ranges
+Index("ix_queuedata_entry_brin",queueData.entryTime,postgresql_using="brin")
+
+
+class QueueRollup(Base):
+    """Pre-aggregated queuedata per minute/hour/day, kept up to date by rollups.py."""
+    __tablename__="queue_rollups"
+
+    bucket=Column(String(8),primary_key=True)    # "minute", "hour" or "day"
+    start=Column(DateTime,primary_key=True)       # bucket start (exitTime truncated)
+    count=Column(Integer,nullable=False,default=0)
+    wait_count=Column(Integer,nullable=False,default=0)  # rows with a waitTime
+    wait_sum=Column(Float,nullable=False,default=0.0)
+    wait_min=Column(Float)
+    wait_max=Column(Float)
+    alert_count=Column(Integer,nullable=False,default=0)
+
+
+class QueueWaitHistogram(Base):
+    """Wait-time histogram per rollup bucket, used for percentiles (bins in rollups.WAIT_BIN_EDGES)."""
+    __tablename__="queue_wait_histogram"
+
+    bucket=Column(String(8),primary_key=True)
+    start=Column(DateTime,primary_key=True)
+    bin=Column(Integer,primary_key=True)
+    count=Column(Integer,nullable=False,default=0)
 
 
 class ContactMessage(Base):
@@ -0,0 +1,179 @@
+# multicam.py
+# One process, one YOLO model, N camera streams.
+# Every stream is read on its own thread that only keeps the newest frame.
+# The engine gathers the latest frame from each stream that has produced one,
+# runs a single batched model call over all of them and then routes each
+# result back to that camera's own PeopleCounter.
+import os
+import cv2
+import threading
+
+from detection import (
+    FRAME_W, FRAME_H, FRAMES_CAPTURED, FRAMES_DROPPED, STAGE_SECONDS, ZONE_CONFIG,
+    FrameOutput, PeopleCounter, StatsPublisher, detect_people_batch, load_zones, mark_startup, open_counter_store,
+    parse_source, stats_capacity,
+)
+from logs import get_logger
+
+log = get_logger("multicam")
+
+
+class CameraStream:
+    """Reads one source on a background thread and exposes its latest frame.
+
+    Live sources (webcams, RTSP) overwrite the pending frame so the engine
+    always sees the freshest image. Video files are read one frame at a time
+    and wait until the engine has taken the previous frame, so no part of the
+    recording is skipped.
+    """
+
+    def __init__(self, camera_id: str, source: str, frame_ready: threading.Event, write_files: bool = False,
+                 show: bool = False, reset_counts: bool = False, zones_path: str = ZONE_CONFIG):
+        self.camera_id = camera_id
+        self.source = source
+        self.is_file = os.path.isfile(source)
+        self.cap = cv2.VideoCapture(parse_source(source))
+        self.counter = PeopleCounter(camera_id=camera_id, store=open_counter_store(camera_id, reset_counts),
+                                     zones=load_zones(camera_id, zones_path))
+        self.publisher = StatsPublisher()
+        self.output = FrameOutput(camera_id, write_files, show, stats_capacity(self.counter.zones))
+
+        self._frame_ready = frame_ready
+        self._cond = threading.Condition()
+        self._frame = None
+        self.finished = False
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._read_loop, name=f"camera-{camera_id}", daemon=True)
+
+    def is_opened(self) -> bool:
+        return self.cap.isOpened()
+
+    def start(self):
+        self._thread.start()
+
+    def _read_loop(self):
+        while not self.finished:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            FRAMES_CAPTURED.inc(camera=self.camera_id)
+            with self._cond:
+                if self.is_file:
+                    while self._frame is not None and not self.finished:
+                        self._cond.wait(0.1)
+                elif self._frame is not None:
+                    self.dropped += 1
+                    FRAMES_DROPPED.inc(camera=self.camera_id, stage="capture")
+                self._frame = frame
+            self._frame_ready.set()
+        with self._cond:
+            self.finished = True
+        self._frame_ready.set()
+
+    def take_frame(self):
+        """Return the pending frame (or None) and clear the slot."""
+        with self._cond:
+            frame, self._frame = self._frame, None
+            self._cond.notify()
+        return frame
+
+    def stop(self):
+        with self._cond:
+            self.finished = True
+            self._cond.notify()
+        self._thread.join(timeout=2)
+        self.cap.release()
+        self.output.close()
+        self.counter.close()
+
+
+class MultiCameraEngine:
+    def __init__(self, model, sources: list, write_files: bool = False, show: bool = True,
+                 reset_counts: bool = False, zones_path: str = ZONE_CONFIG):
+        self.model = model
+        self.show = show
+        self.frame_ready = threading.Event()
+        self.streams = []
+        for idx, source in enumerate(sources):
+            stream = CameraStream(str(idx), source, self.frame_ready, write_files, show, reset_counts, zones_path)
+            if not stream.is_opened():
+                log.warning("source_unavailable", camera=str(idx), source=source)
+                stream.output.close()
+                stream.counter.close()
+                continue
+            self.streams.append(stream)
+
+    def step(self) -> bool:
+        """Run one batched inference over every stream with a new frame.
+
+        Returns False once every stream has finished.
+        """
+        self.frame_ready.wait(0.1)
+        self.frame_ready.clear()
+
+        batch_streams, batch_frames = [], []
+        for stream in self.streams:
+            frame = stream.take_frame()
+            if frame is not None:
+                batch_streams.append(stream)
+                batch_frames.append(cv2.resize(frame, (FRAME_W, FRAME_H)))
+
+        if not batch_frames:
+            return not all(s.finished for s in self.streams)
+
+        with STAGE_SECONDS.time(stage="inference"):  # one batched call for every stream
+            batch_detections = detect_people_batch(self.model, batch_frames)
+        for stream, frame, detections in zip(batch_streams, batch_frames, batch_detections):
+            counter = stream.counter
+            with STAGE_SECONDS.time(stage="tracking"):
+                counter.update(detections)
+
+            stats = counter.stats()
+            stats['camera'] = stream.camera_id
+            with STAGE_SECONDS.time(stage="output"):  # drawn on the stream's render thread if watched
+                if stream.output.wants_frames():
+                    stream.output.write(frame, stats, counter.track_views(), counter.is_crowded,
+                                        counter.layout_views())
+                else:
+                    stream.output.write_stats(stats)
+            stream.publisher.maybe_publish(stats)
+        mark_startup("first_frame")
+        return True
+
+    def show_windows(self) -> bool:
+        """One local window per stream; False when 'q' was pressed."""
+        for stream in self.streams:
+            if stream.output.latest is not None:
+                cv2.imshow(f"Smart Entry-Exit Tracker [{stream.camera_id}]", stream.output.latest)
+        return not (cv2.waitKey(1) & 0xFF == ord('q'))
+
+    def run(self):
+        if not self.streams:
+            log.error("no_sources")
+            return
+
+        for stream in self.streams:
+            stream.start()
+        quit_key = "press 'q'" if self.show else "Ctrl+C"
+        log.info("serving", streams=len(self.streams), quit=quit_key)
+
+        try:
+            while self.step():
+                if self.show and not self.show_windows():
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for stream in self.streams:
+                stream.stop()
+            if self.show:
+                cv2.destroyAllWindows()
+
+        for stream in self.streams:
+            log.info("stream_finished", camera=stream.camera_id, source=stream.source, frames_dropped=stream.dropped)
+            stream.counter.print_summary()
+
+
+def run_multicam(model, sources: list, write_files: bool = False, show: bool = True,
+                 reset_counts: bool = False, zones_path: str = ZONE_CONFIG):
+    MultiCameraEngine(model, sources, write_files, show, reset_counts, zones_path).run()
@@ -0,0 +1,264 @@
+# pipeline.py
+# Staged detection loop: capture -> inference -> tracking -> output.
+# (Drawing the overlay is left to FrameOutput's render thread.)
+# Each stage runs on its own thread and hands frames to the next one through a
+# small bounded queue. When a queue is full the oldest frame is dropped, so a
+# slow stage (usually YOLO) never makes the camera reader block.
+import cv2
+import time
+import threading
+from collections import deque
+
+import metrics
+from logs import get_logger
+from detection import (
+    FRAME_W, FRAME_H, PIPELINE_QUEUE_SIZE, PIPELINE_REPORT_INTERVAL,
+    FRAMES_CAPTURED, FRAMES_DROPPED, STAGE_SECONDS,
+    FrameOutput, PeopleCounter, StatsPublisher, detect_people, mark_startup, stats_capacity,
+)
+
+log = get_logger("pipeline")
+
+FRAME_LATENCY = metrics.histogram("detector_frame_latency_seconds",
+                                  "Capture to end of output per frame (--pipeline)")
+
+
+class DropOldestQueue:
+    """Bounded FIFO whose `put` never blocks: a full queue evicts its oldest item.
+
+    `on_drop()` is called (outside the lock) for every evicted item.
+    """
+
+    def __init__(self, maxsize: int, on_drop=None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        dropped = False
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                dropped = True
+            self._items.append(item)
+            self._cond.notify()
+        if dropped and self.on_drop is not None:
+            self.on_drop()
+
+    def get(self, timeout: float = None):
+        """Return the oldest item, or None if nothing arrived within `timeout`."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+
+class StageStats:
+    """Per-stage counters, reset every report interval."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float):
+        ms = seconds * 1000.0
+        with self._lock:
+            self.count += 1
+            self.total_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def snapshot_and_reset(self) -> tuple:
+        with self._lock:
+            snap = (self.count, self.total_ms, self.max_ms)
+            self.count, self.total_ms, self.max_ms = 0, 0.0, 0.0
+        return snap
+
+
+class FramePacket:
+    """A frame travelling through the pipeline plus what each stage adds to it."""
+
+    __slots__ = ("seq", "frame", "captured_at", "detections", "track_views", "is_crowded", "layout", "stats")
+
+    def __init__(self, seq: int, frame, captured_at: float):
+        self.seq = seq
+        self.frame = frame
+        self.captured_at = captured_at
+        self.detections = None
+        self.track_views = None
+        self.is_crowded = False
+        self.layout = ()
+        self.stats = None
+
+
+class Pipeline:
+    def __init__(self, model, cap, counter: PeopleCounter, detect=detect_people,
+                 output: FrameOutput = None, queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.model = model
+        self.detect = detect
+        self.output = output or FrameOutput(stats_capacity=stats_capacity(counter.zones))
+        self.cap = cap
+        self.counter = counter
+        # stop_event aborts every stage (user quit); the *_done events let a
+        # finite source such as a video file drain through the stages in order.
+        self.stop_event = threading.Event()
+        self.capture_done = threading.Event()
+        self.inference_done = threading.Event()
+        self.tracking_done = threading.Event()
+
+        # Drops count against the stage that feeds the queue, as in report()
+        camera = counter.camera_id
+        self.capture_q = DropOldestQueue(queue_size, lambda: FRAMES_DROPPED.inc(camera=camera, stage="capture"))
+        self.inference_q = DropOldestQueue(queue_size, lambda: FRAMES_DROPPED.inc(camera=camera, stage="inference"))
+        self.output_q = DropOldestQueue(queue_size, lambda: FRAMES_DROPPED.inc(camera=camera, stage="tracking"))
+
+        self.stage_stats = {
+            name: StageStats(name)
+            for name in ("capture", "inference", "tracking", "output", "end_to_end")
+        }
+        self.publisher = StatsPublisher()
+        self.last_report = time.time()
+
+    # ---- stage loops ----
+
+    def _capture_loop(self):
+        seq = 0
+        stats = self.stage_stats["capture"]
+        while not self.stop_event.is_set():
+            t0 = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            frame = cv2.resize(frame, (FRAME_W, FRAME_H))
+            elapsed = time.perf_counter() - t0
+            stats.record(elapsed)
+            STAGE_SECONDS.observe(elapsed, stage="capture")
+            FRAMES_CAPTURED.inc(camera=self.counter.camera_id)
+            self.capture_q.put(FramePacket(seq, frame, time.perf_counter()))
+            seq += 1
+        self.capture_done.set()
+
+    def _inference_loop(self):
+        stats = self.stage_stats["inference"]
+        while not self.stop_event.is_set():
+            packet = self.capture_q.get(timeout=0.1)
+            if packet is None:
+                if self.capture_done.is_set():
+                    break
+                continue
+            t0 = time.perf_counter()
+            packet.detections = self.detect(self.model, packet.frame)
+            elapsed = time.perf_counter() - t0
+            stats.record(elapsed)
+            STAGE_SECONDS.observe(elapsed, stage="inference")
+            self.inference_q.put(packet)
+        self.inference_done.set()
+
+    def _tracking_loop(self):
+        # This is the only stage that touches `counter`, so tracking state
+        # needs no locking; the overlay gets a snapshot via track_views().
+        stats = self.stage_stats["tracking"]
+        while not self.stop_event.is_set():
+            packet = self.inference_q.get(timeout=0.1)
+            if packet is None:
+                if self.inference_done.is_set():
+                    break
+                continue
+            t0 = time.perf_counter()
+            self.counter.update(packet.detections)
+            if self.output.wants_frames():  # the overlay snapshot is only needed if the frame is drawn
+                packet.track_views = self.counter.track_views()
+                packet.layout = self.counter.layout_views()
+            packet.is_crowded = self.counter.is_crowded
+            packet.stats = self.counter.stats()
+            elapsed = time.perf_counter() - t0
+            stats.record(elapsed)
+            STAGE_SECONDS.observe(elapsed, stage="tracking")
+            self.output_q.put(packet)
+        self.tracking_done.set()
+
+    def _output_step(self, packet: FramePacket) -> bool:
+        """Hand over, publish and show one frame. Returns False when the user quits."""
+        t0 = time.perf_counter()
+        with STAGE_SECONDS.time(stage="output"):
+            if packet.track_views is not None:
+                self.output.write(packet.frame, packet.stats, packet.track_views, packet.is_crowded, packet.layout)
+            else:
+                self.output.write_stats(packet.stats)
+        self.publisher.maybe_publish(packet.stats)
+        mark_startup("first_frame")
+        keep_going = not self.output.show or self.output.show_latest()
+        done = time.perf_counter()
+        self.stage_stats["output"].record(done - t0)
+        self.stage_stats["end_to_end"].record(done - packet.captured_at)
+        FRAME_LATENCY.observe(done - packet.captured_at)
+        return keep_going
+
+    # ---- reporting ----
+
+    def report(self):
+        now = time.time()
+        elapsed = now - self.last_report
+        self.last_report = now
+        # Queue depth/drops are reported against the stage that feeds the queue.
+        depths = {
+            "capture": self.capture_q.depth(),
+            "inference": self.inference_q.depth(),
+            "tracking": self.output_q.depth(),
+        }
+        drops = {
+            "capture": self.capture_q.dropped,
+            "inference": self.inference_q.dropped,
+            "tracking": self.output_q.dropped,
+        }
+        for name, stats in self.stage_stats.items():
+            count, total_ms, max_ms = stats.snapshot_and_reset()
+            avg_ms = total_ms / count if count else 0.0
+            fps = count / elapsed if elapsed > 0 else 0.0
+            queue = {"q": depths[name], "dropped": drops[name]} if name in depths else {}
+            log.info("pipeline_stage", stage=name, fps=round(fps, 1), avg_ms=round(avg_ms, 1),
+                     max_ms=round(max_ms, 1), **queue)
+
+    # ---- lifecycle ----
+
+    def run(self):
+        workers = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+            threading.Thread(target=self._tracking_loop, name="tracking", daemon=True),
+        ]
+        for w in workers:
+            w.start()
+
+        # cv2.imshow/waitKey have to stay on the main thread, so the output
+        # stage runs here instead of on a worker (drawing is on the render thread).
+        try:
+            while True:
+                packet = self.output_q.get(timeout=0.1)
+                if packet is not None and not self._output_step(packet):
+                    break
+                if packet is None and self.tracking_done.is_set():
+                    break
+                if time.time() - self.last_report >= PIPELINE_REPORT_INTERVAL:
+                    self.report()
+        finally:
+            self.stop_event.set()
+            for w in workers:
+                w.join(timeout=2)
+            self.report()
+
+
+def run_pipeline(model, cap, counter: PeopleCounter, detect=detect_people, output: FrameOutput = None):
+    Pipeline(model, cap, counter, detect, output).run()
@@ -0,0 +1,176 @@
+# replay.py
+# Headless replay of a recorded video through the detection/tracking/counting
+# code, as fast as the machine allows (no imshow, no waitKey pacing, nothing
+# posted to the backend). Reports throughput, per-stage latency percentiles,
+# peak RSS and the entered/exited error against a ground-truth file.
+#
+#   python replay.py clip.mp4 --truth clip.truth.json [--backend onnx] [--roi] [--json out.json]
+#
+# The ground-truth file is JSON, either totals:
+#   {"entered": 12, "exited": 11}
+# or a list of annotated events (only the counts are compared):
+#   {"events": [{"frame": 140, "type": "enter"}, {"frame": 410, "type": "exit"}, ...]}
+import argparse
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from detection import (
+    ADAPTIVE_MAX_K, ADAPTIVE_MAX_SKIP, ADAPTIVE_TARGET_FPS, FRAME_H, FRAME_W,
+    INFERENCE_BACKEND, MODEL_PATH, MOTION_THRESHOLD,
+    PeopleCounter, detect_people, draw_overlay, make_roi_detector,
+)
+from inference import BACKENDS, load_backend
+import logs
+
+STAGES = ("read", "resize", "inference", "tracking", "draw")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_truth(path: str) -> dict:
+    with open(path) as f:
+        data = json.load(f)
+    if "events" in data:
+        types = [e.get("type") for e in data["events"]]
+        return {"entered": types.count("enter"), "exited": types.count("exit")}
+    return {"entered": int(data["entered"]), "exited": int(data["exited"])}
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    ms = np.asarray(samples) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(ms.mean())}
+
+
+def replay(model, video: str, detect=detect_people, adaptive=None, draw: bool = True,
+           max_frames: int = 0) -> dict:
+    """Run one recording through the counter and collect timings."""
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open {video}")
+
+    counter = PeopleCounter(predict_motion=adaptive is not None, post_exits=False)
+    timings = {name: [] for name in STAGES}
+    frames = 0
+    started = time.perf_counter()
+
+    while max_frames <= 0 or frames < max_frames:
+        t0 = time.perf_counter()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        t1 = time.perf_counter()
+        frame = cv2.resize(frame, (FRAME_W, FRAME_H))
+        t2 = time.perf_counter()
+
+        if adaptive is not None:
+            # The adaptive step interleaves inference and tracking, so it is
+            # reported as a single inference sample.
+            adaptive.process(model, frame, counter)
+            t3 = t4 = time.perf_counter()
+        else:
+            detections = detect(model, frame)
+            t3 = time.perf_counter()
+            counter.update(detections)
+            t4 = time.perf_counter()
+
+        if draw:
+            draw_overlay(frame, counter.track_views(), counter.is_crowded, counter.layout_views())
+        t5 = time.perf_counter()
+
+        for name, dt in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+            timings[name].append(dt)
+        frames += 1
+
+    elapsed = time.perf_counter() - started
+    cap.release()
+
+    return {
+        "video": video,
+        "frames": frames,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "stages_ms": {name: percentiles(samples) for name, samples in timings.items()},
+        "peak_rss_mb": peak_rss_mb(),
+        "entered": counter.entered,
+        "exited": counter.exited,
+    }
+
+
+def print_report(report: dict):
+    print(f"\n REPLAY {report['video']}")
+    print(f"  frames: {report['frames']}  time: {report['seconds']:.2f}s  fps: {report['fps']:.1f}")
+    if report["peak_rss_mb"] is not None:
+        print(f"  peak RSS: {report['peak_rss_mb']:.1f} MB")
+    print(f"  {'stage':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, p in report["stages_ms"].items():
+        print(f"  {name:<10} {p['p50']:>8.2f} {p['p95']:>8.2f} {p['p99']:>8.2f} {p['mean']:>8.2f}")
+    line = f"  entered: {report['entered']}  exited: {report['exited']}"
+    if "truth" in report:
+        t = report["truth"]
+        line += (f"  | truth entered: {t['entered']} exited: {t['exited']}"
+                 f"  | error entered: {report['entered_error']:+d} exited: {report['exited_error']:+d}")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless replay/benchmark of the detection loop")
+    parser.add_argument("video")
+    parser.add_argument("--truth", help="ground-truth JSON with entered/exited counts or events")
+    parser.add_argument("--backend", choices=BACKENDS, default=INFERENCE_BACKEND)
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--roi", action="store_true")
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--no-draw", action="store_true", help="skip the overlay stage")
+    parser.add_argument("--frames", type=int, default=0, help="stop after N frames")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the per-event log lines")
+    args = parser.parse_args()
+
+    model = load_backend(args.backend, MODEL_PATH, args.int8)
+    detect = make_roi_detector() if args.roi else detect_people
+    adaptive = None
+    if args.adaptive:
+        from cadence import AdaptiveInference
+        adaptive = AdaptiveInference(detect, ADAPTIVE_TARGET_FPS, ADAPTIVE_MAX_K,
+                                     MOTION_THRESHOLD, ADAPTIVE_MAX_SKIP)
+
+    # Entries, exits and the like are INFO log lines; only warnings get through
+    # unless --verbose.
+    if not args.verbose:
+        logs.set_level("WARNING")
+    report = replay(model, args.video, detect, adaptive, not args.no_draw, args.frames)
+
+    report["config"] = {
+        "backend": args.backend, "int8": args.int8, "roi": args.roi,
+        "adaptive": args.adaptive, "draw": not args.no_draw,
+    }
+    if args.truth:
+        truth = load_truth(args.truth)
+        report["truth"] = truth
+        report["entered_error"] = report["entered"] - truth["entered"]
+        report["exited_error"] = report["exited"] - truth["exited"]
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
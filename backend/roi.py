@@ -0,0 +1,67 @@
+# roi.py
+# Region-of-interest inference (--roi).
+# Instead of the full frame, YOLO only sees the configured rectangles (by
+# default the room rectangle). The crops go through one batched call at a
+# smaller letterboxed input size and the boxes are shifted back into frame
+# coordinates, so the tracking/counting code does not know the difference.
+import numpy as np
+
+
+def clip_roi(roi: tuple, frame_w: int, frame_h: int) -> tuple:
+    x1, y1, x2, y2 = roi
+    return (max(0, int(x1)), max(0, int(y1)), min(frame_w, int(x2)), min(frame_h, int(y2)))
+
+
+def nms(detections: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy non-maximum suppression over [x1, y1, x2, y2, conf, cls] rows.
+
+    Only needed when ROIs overlap and the same person is found in two crops.
+    """
+    if len(detections) < 2:
+        return detections
+    order = np.argsort(-detections[:, 4])
+    boxes = detections[order, :4]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    alive = np.ones(len(order), dtype=bool)
+    for i in range(len(order)):
+        if not alive[i]:
+            continue
+        keep.append(i)
+        ix1 = np.maximum(boxes[i, 0], boxes[i + 1:, 0])
+        iy1 = np.maximum(boxes[i, 1], boxes[i + 1:, 1])
+        ix2 = np.minimum(boxes[i, 2], boxes[i + 1:, 2])
+        iy2 = np.minimum(boxes[i, 3], boxes[i + 1:, 3])
+        inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+        iou = inter / (areas[i] + areas[i + 1:] - inter + 1e-9)
+        alive[i + 1:] &= iou <= iou_threshold
+    return detections[order[keep]]
+
+
+class RoiDetector:
+    """Callable with the same signature/result as detection.detect_people."""
+
+    def __init__(self, rois: list, imgsz: int, conf: float, frame_w: int, frame_h: int,
+                 iou_threshold: float = 0.5):
+        self.rois = [clip_roi(r, frame_w, frame_h) for r in rois]
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou_threshold = iou_threshold
+
+    def __call__(self, model, frame: np.ndarray) -> np.ndarray:
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self.rois]
+        results = model.detect(crops, self.conf, self.imgsz)
+
+        merged = []
+        for (x1, y1, _, _), det in zip(self.rois, results):
+            if len(det):
+                det = det.copy()
+                det[:, [0, 2]] += x1
+                det[:, [1, 3]] += y1
+                merged.append(det)
+        if not merged:
+            return np.zeros((0, 6), dtype=np.float32)
+        detections = np.concatenate(merged)
+        if len(self.rois) > 1:
+            detections = nms(detections, self.iou_threshold)
+        return detections
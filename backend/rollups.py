@@ -0,0 +1,210 @@
+# rollups.py
+# Incrementally maintained aggregates over queuedata.
+# Every inserted row is folded into one rollup row per granularity (minute,
+# hour, day; keyed by its exitTime truncated to the bucket) and into a wait-time
+# histogram, in the same transaction as the insert. Totals and time-windowed
+# statistics are then read from these small tables instead of scanning queuedata.
+# `rebuild()` recomputes everything from queuedata (run by create.py).
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import AlertStatus, QueueRollup, QueueWaitHistogram, queueData
+
+BUCKETS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+# Upper edges of the wait-time histogram bins in seconds. Bin i (1-based) holds
+# waits in [edge[i-1], edge[i]); bin 0 is below the first edge and the last bin
+# is open-ended. Matches Postgres width_bucket(wait, edges).
+WAIT_BIN_EDGES = [0, 1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 300,
+                  450, 600, 900, 1200, 1800, 2700, 3600, 7200]
+
+
+def truncate(ts: datetime, bucket: str) -> datetime:
+    if bucket == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if bucket == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def wait_bin(wait: float) -> int:
+    return bisect_right(WAIT_BIN_EDGES, wait)
+
+
+async def record(db: AsyncSession, rows: list):
+    """Fold newly inserted queuedata rows into the rollups (caller commits).
+
+    Each row is a mapping with entryTime, exitTime, waitTime and alert.
+    """
+    stats = {}
+    hist = defaultdict(int)
+    for row in rows:
+        ts = row["exitTime"] or row["entryTime"]
+        wait = row["waitTime"]
+        alert = row["alert"] in (AlertStatus.ALERT_POPPED, 1)
+        for bucket in BUCKETS:
+            key = (bucket, truncate(ts, bucket))
+            s = stats.get(key)
+            if s is None:
+                s = stats[key] = {"count": 0, "wait_count": 0, "wait_sum": 0.0,
+                                  "wait_min": None, "wait_max": None, "alert_count": 0}
+            s["count"] += 1
+            s["alert_count"] += alert
+            if wait is not None:
+                s["wait_count"] += 1
+                s["wait_sum"] += wait
+                s["wait_min"] = wait if s["wait_min"] is None else min(s["wait_min"], wait)
+                s["wait_max"] = wait if s["wait_max"] is None else max(s["wait_max"], wait)
+                hist[key + (wait_bin(wait),)] += 1
+    if not stats:
+        return
+
+    # Rows are upserted (and so locked) in key order: two transactions folding
+    # overlapping buckets then lock them in the same order and cannot deadlock.
+    r = QueueRollup.__table__
+    stmt = pg_insert(r).values([{"bucket": b, "start": st, **s} for (b, st), s in sorted(stats.items())])
+    ex = stmt.excluded
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[r.c.bucket, r.c.start],
+        set_={
+            "count": r.c.count + ex.count,
+            "wait_count": r.c.wait_count + ex.wait_count,
+            "wait_sum": r.c.wait_sum + ex.wait_sum,
+            "wait_min": func.least(r.c.wait_min, ex.wait_min),
+            "wait_max": func.greatest(r.c.wait_max, ex.wait_max),
+            "alert_count": r.c.alert_count + ex.alert_count,
+        },
+    ))
+
+    if hist:
+        h = QueueWaitHistogram.__table__
+        stmt = pg_insert(h).values([{"bucket": b, "start": st, "bin": n, "count": c}
+                                    for (b, st, n), c in sorted(hist.items())])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[h.c.bucket, h.c.start, h.c.bin],
+            set_={"count": h.c.count + stmt.excluded.count},
+        ))
+
+
+async def rebuild(db: AsyncSession):
+    """Recompute all rollups from queuedata in SQL (caller commits)."""
+    q = queueData.__table__
+    ts = func.coalesce(q.c.exitTime, q.c.entryTime)
+    edges = text("ARRAY[" + ",".join(str(float(e)) for e in WAIT_BIN_EDGES) + "]::float8[]")
+    await db.execute(delete(QueueWaitHistogram))
+    await db.execute(delete(QueueRollup))
+    for bucket in BUCKETS:
+        start = func.date_trunc(bucket, ts)
+        await db.execute(QueueRollup.__table__.insert().from_select(
+            ["bucket", "start", "count", "wait_count", "wait_sum", "wait_min", "wait_max", "alert_count"],
+            select(
+                literal(bucket), start, func.count(), func.count(q.c.waitTime),
+                func.coalesce(func.sum(q.c.waitTime), 0.0), func.min(q.c.waitTime), func.max(q.c.waitTime),
+                func.count().filter(q.c.alert == AlertStatus.ALERT_POPPED),
+            ).group_by(start),
+        ))
+        wb = func.width_bucket(q.c.waitTime, edges)
+        await db.execute(QueueWaitHistogram.__table__.insert().from_select(
+            ["bucket", "start", "bin", "count"],
+            select(literal(bucket), start, wb, func.count())
+            .where(q.c.waitTime.isnot(None))
+            .group_by(start, wb),
+        ))
+
+
+# Built once: this runs on every dashboard read and constructing it costs more than executing it.
+_TOTALS = (
+    select(func.coalesce(func.sum(QueueRollup.count), 0), func.coalesce(func.sum(QueueRollup.wait_count), 0),
+           func.coalesce(func.sum(QueueRollup.wait_sum), 0.0))
+    .where(QueueRollup.bucket == "day")
+)
+
+
+async def totals(db: AsyncSession) -> dict:
+    """All-time row count and wait sum/count, from the day rollups."""
+    count, wait_count, wait_sum = (await db.execute(_TOTALS)).one()
+    return {"count": int(count), "wait_count": int(wait_count), "wait_sum": float(wait_sum)}
+
+
+def percentile(hist: dict, q: float) -> float:
+    """Approximate q-quantile from {bin: count}, interpolating inside the bin."""
+    total = sum(hist.values())
+    if total == 0:
+        return 0.0
+    target = q * total
+    seen = 0
+    for n in sorted(hist):
+        c = hist[n]
+        if seen + c >= target:
+            lo = WAIT_BIN_EDGES[n - 1] if n >= 1 else 0.0
+            hi = WAIT_BIN_EDGES[n] if n < len(WAIT_BIN_EDGES) else lo
+            return float(lo + (hi - lo) * (target - seen) / c)
+        seen += c
+    return float(WAIT_BIN_EDGES[-1])
+
+
+def _summary(count: int, wait_count: int, wait_sum: float, wait_min, wait_max, alerts: int, hist: dict) -> dict:
+    def clamp(p: float) -> float:
+        # interpolation can overshoot the observed range inside the outer bins
+        return p if wait_min is None else min(max(p, wait_min), wait_max)
+
+    return {
+        "count": count,
+        "alert_count": alerts,
+        "avg_wait": wait_sum / wait_count if wait_count else 0.0,
+        "min_wait": wait_min,
+        "max_wait": wait_max,
+        "p50_wait": clamp(percentile(hist, 0.50)),
+        "p95_wait": clamp(percentile(hist, 0.95)),
+    }
+
+
+async def window(db: AsyncSession, start: datetime, end: datetime, bucket: str) -> dict:
+    """Per-bucket series and overall summary for buckets starting in [start, end)."""
+    r, h = QueueRollup, QueueWaitHistogram
+    rows = (await db.execute(
+        select(r.start, r.count, r.wait_count, r.wait_sum, r.wait_min, r.wait_max, r.alert_count)
+        .where(r.bucket == bucket, r.start >= start, r.start < end)
+        .order_by(r.start)
+    )).all()
+    hists = defaultdict(dict)
+    for st, n, c in await db.execute(
+        select(h.start, h.bin, h.count).where(h.bucket == bucket, h.start >= start, h.start < end)
+    ):
+        hists[st][n] = c
+
+    series = []
+    total = {"count": 0, "wait_count": 0, "wait_sum": 0.0, "alerts": 0}
+    mins, maxs = [], []
+    merged = defaultdict(int)
+    for st, count, wait_count, wait_sum, wait_min, wait_max, alerts in rows:
+        hist = hists.get(st, {})
+        series.append({"start": st.isoformat(),
+                       **_summary(count, wait_count, wait_sum, wait_min, wait_max, alerts, hist)})
+        total["count"] += count
+        total["wait_count"] += wait_count
+        total["wait_sum"] += wait_sum
+        total["alerts"] += alerts
+        if wait_min is not None:
+            mins.append(wait_min)
+            maxs.append(wait_max)
+        for n, c in hist.items():
+            merged[n] += c
+
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "bucket": bucket,
+        "summary": _summary(total["count"], total["wait_count"], total["wait_sum"],
+                            min(mins) if mins else None, max(maxs) if maxs else None,
+                            total["alerts"], merged),
+        "series": series,
+    }
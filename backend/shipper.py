@@ -0,0 +1,224 @@
+# shipper.py
+# Delivery of exit events to the backend.
+# A single worker thread drains an in-memory queue, groups events into
+# micro-batches (by size or by age) and POSTs each batch to /updateData/batch
+# over one keep-alive requests.Session. Failed batches are retried with
+# exponential backoff; whatever is still undelivered is kept in a bounded
+# on-disk spool (JSON lines) that is replayed first on the next start.
+# A batch the backend rejects (4xx) is split in halves and each half is sent
+# again, so one bad event does not take the rest with it; events rejected on
+# their own are appended to a dead-letter file (spool path + ".rejected").
+import os
+import json
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from logs import get_logger
+
+# Outcomes of one POST
+SENT, RETRY, REJECTED = "sent", "retry", "rejected"
+
+log = get_logger("shipper")
+# Shared with detection.py (kind="stats")
+PUBLISH_FAILURES = metrics.counter("detector_publish_failures_total",
+                                   "Failed deliveries to the backend (stats posts, exit batches)", ("kind",))
+
+
+class ExitEventShipper:
+    def __init__(self, url: str, spool_path: str, batch_size: int = 50, batch_interval: float = 0.5,
+                 max_backoff: float = 30.0, spool_max_events: int = 10000, timeout: float = 5.0,
+                 dead_letter_path: str = None):
+        self.url = url
+        self.spool_path = spool_path
+        self.dead_letter_path = dead_letter_path or spool_path + ".rejected"
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_backoff = max_backoff
+        self.spool_max_events = spool_max_events
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
+        self._queue = queue.Queue()
+        self._pending = []  # events taken off the queue but not yet acknowledged
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="exit-shipper", daemon=True)
+
+        self.sent = 0
+        self.failures = 0
+        self.spooled = 0
+        self.dropped = 0
+
+    # ---- public API ----
+
+    def start(self):
+        self._pending = self._load_spool()
+        if self._pending:
+            log.info("spool_replay", events=len(self._pending))
+        self._thread.start()
+
+    def submit(self, event: dict):
+        """Queue one exit payload; never blocks the detection loop."""
+        self._queue.put(event)
+
+    def stop(self):
+        """Flush what the backend accepts right now, spool the rest."""
+        self._stop.set()
+        # The worker makes at most one more POST attempt per batch once
+        # stopping, each bounded by the request timeout.
+        self._thread.join()
+        self._drain_queue(whole=True)
+        self._write_spool()
+        self.session.close()
+        log.info("stopped", sent=self.sent, failed_posts=self.failures, spooled=len(self._pending),
+                 dropped=self.dropped)
+
+    # ---- worker ----
+
+    def _drain_queue(self, deadline: float = None, whole: bool = False):
+        """Move queued events into _pending.
+
+        Normally stops once a full batch is pending, waiting until `deadline`
+        for it to fill; `whole` takes everything queued so it can be spooled.
+        """
+        while whole or len(self._pending) < self.batch_size:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            try:
+                if remaining is None:
+                    event = self._queue.get_nowait()
+                elif remaining <= 0:
+                    break
+                else:
+                    event = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            self._pending.append(event)
+
+    def _run(self):
+        backoff = 0.0
+        while True:
+            stopping = self._stop.is_set()
+            if not self._pending and not stopping:
+                # Wait for the first event, then give the batch a short window to fill.
+                try:
+                    self._pending.append(self._queue.get(timeout=0.5))
+                except queue.Empty:
+                    continue
+                self._drain_queue(time.monotonic() + self.batch_interval)
+            else:
+                self._drain_queue(time.monotonic())
+
+            if not self._pending:
+                if stopping:
+                    return
+                continue
+
+            outcome = self._deliver(self._pending[:self.batch_size])
+            if outcome != RETRY:
+                backoff = 0.0
+                if self.spooled:
+                    self._write_spool()
+                continue
+
+            self.failures += 1
+            self._drain_queue(whole=True)
+            self._write_spool()
+            if stopping:
+                return
+            backoff = min(self.max_backoff, backoff * 2 if backoff else 0.5)
+            self._stop.wait(backoff)
+
+    def _deliver(self, batch: list) -> str:
+        """POST `batch` (the head of _pending) and remove whatever got settled.
+
+        A rejected batch is split in halves and each half delivered the same
+        way, until the events the backend refuses are isolated and set aside.
+        Returns RETRY as soon as any part has to be retried later.
+        """
+        outcome = self._post(batch)
+        if outcome == REJECTED and len(batch) > 1:
+            half = len(batch) // 2
+            outcome = self._deliver(batch[:half])
+            return outcome if outcome == RETRY else self._deliver(batch[half:])
+        if outcome == SENT:
+            self.sent += len(batch)
+        elif outcome == REJECTED:
+            self._dead_letter(batch)
+        if outcome != RETRY:
+            del self._pending[:len(batch)]
+        return outcome
+
+    def _post(self, batch: list) -> str:
+        try:
+            resp = self.session.post(self.url, json=batch, timeout=self.timeout)
+        except requests.RequestException as e:
+            PUBLISH_FAILURES.inc(kind="exits")
+            log.warning("post_failed", events=len(batch), error=str(e))
+            return RETRY
+        if resp.status_code == 200:
+            return SENT
+        PUBLISH_FAILURES.inc(kind="exits")
+        log.warning("post_rejected", events=len(batch), status=resp.status_code, detail=resp.text[:200])
+        if 400 <= resp.status_code < 500 and resp.status_code not in (408, 429):
+            # The backend will never accept this batch; retrying would block the queue.
+            return REJECTED
+        return RETRY
+
+    # ---- spool ----
+
+    def _dead_letter(self, events: list):
+        self.dropped += len(events)
+        try:
+            with open(self.dead_letter_path, "a") as f:
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+        except OSError as e:
+            log.error("dead_letter_failed", events=len(events), path=self.dead_letter_path, error=str(e))
+            return
+        log.warning("events_rejected", events=len(events), total=self.dropped, path=self.dead_letter_path)
+
+    def _load_spool(self) -> list:
+        if not os.path.exists(self.spool_path):
+            return []
+        events = []
+        with open(self.spool_path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line after a crash; everything before it is good.
+                    continue
+        self.spooled = len(events)
+        return events
+
+    def _write_spool(self):
+        """Persist undelivered events, keeping only the newest spool_max_events."""
+        pending = list(self._pending)
+        if len(pending) > self.spool_max_events:
+            overflow = len(pending) - self.spool_max_events
+            self.dropped += overflow
+            del self._pending[:overflow]
+            pending = pending[overflow:]
+
+        if not pending:
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+            self.spooled = 0
+            return
+
+        tmp = self.spool_path + ".tmp"
+        with open(tmp, "w") as f:
+            for event in pending:
+                f.write(json.dumps(event) + "\n")
+        os.replace(tmp, self.spool_path)
+        self.spooled = len(pending)
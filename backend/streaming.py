@@ -0,0 +1,98 @@
+# streaming.py
+# Live video for the dashboard (MJPEG and binary WebSocket).
+# One encoder task reads the newest frame from the shared-memory channel,
+# encodes it once and publishes the bytes; every viewer just sends whatever
+# the newest encoded frame is when it is ready for the next one. A slow viewer
+# therefore skips frames instead of building up a queue, and detection.py is
+# never touched by the number or speed of viewers.
+# OpenCV is imported on the first encode, so the API starts without it.
+import asyncio
+from typing import Optional
+
+import metrics
+from frame_channel import FrameChannelReader
+
+# (min viewers, JPEG quality, scale): more viewers -> smaller, cheaper frames.
+STREAM_PROFILES = (
+    (1, 80, 1.0),
+    (3, 70, 0.75),
+    (6, 60, 0.5),
+)
+STREAM_MAX_FPS = 15
+
+MJPEG_BOUNDARY = "frame"
+
+JPEG_ENCODE_SECONDS = metrics.histogram("jpeg_encode_seconds", "Resize + JPEG encode time per frame")
+
+
+def encode_jpeg(view, quality: int, scale: float) -> bytes:
+    import cv2
+    with JPEG_ENCODE_SECONDS.time():
+        if scale != 1.0:
+            h, w = view.shape[:2]
+            view = cv2.resize(view, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", view, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes() if ok else b""
+
+
+class FrameStreamer:
+    def __init__(self, reader: FrameChannelReader, max_fps: float = STREAM_MAX_FPS,
+                 profiles: tuple = STREAM_PROFILES):
+        self.reader = reader
+        self.max_fps = max_fps
+        self.profiles = profiles
+        self.viewers = 0
+        self.frame_id = 0  # bumps on every newly encoded frame
+        self.jpeg: Optional[bytes] = None
+        self._source_seq = -1
+        self._cond: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def profile(self) -> tuple:
+        """(quality, scale) for the current number of viewers."""
+        quality, scale = self.profiles[0][1:]
+        for min_viewers, q, s in self.profiles:
+            if self.viewers >= min_viewers:
+                quality, scale = q, s
+        return quality, scale
+
+    async def _encode_loop(self):
+        interval = 1.0 / self.max_fps
+        while self.viewers > 0:
+            self.reader.request_frames()  # keeps the detector drawing frames while anyone watches
+            if self.reader.latest_seq() - 1 != self._source_seq:
+                quality, scale = self.profile()
+                read = await asyncio.to_thread(
+                    self.reader.read_frame, lambda view: encode_jpeg(view, quality, scale))
+                if read is not None and read[1]:
+                    self._source_seq, self.jpeg = read
+                    self.frame_id += 1
+                    async with self._cond:
+                        self._cond.notify_all()
+            await asyncio.sleep(interval)
+        self._task = None
+
+    async def frames(self):
+        """Async generator of JPEG bytes for one viewer, newest frame first."""
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        self.viewers += 1
+        if self._task is None:
+            self._task = asyncio.create_task(self._encode_loop())
+        last = -1
+        try:
+            while True:
+                async with self._cond:
+                    await self._cond.wait_for(lambda: self.frame_id != last)
+                last = self.frame_id
+                yield self.jpeg
+        finally:
+            self.viewers -= 1
+
+    async def mjpeg(self):
+        """multipart/x-mixed-replace body for StreamingResponse."""
+        async for jpeg in self.frames():
+            yield (
+                f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                f"Content-Length: {len(jpeg)}\r\n\r\n"
+            ).encode() + jpeg + b"\r\n"
@@ -0,0 +1,16 @@
+# test_cache.py
+# If-None-Match handling for the cached read endpoints (cache.py).
+#
+#   python -m pytest test_cache.py
+from cache import etag_matches
+
+ETAG = '"0123456789abcdef"'
+
+
+def test_etag_matches_whole_tags_only():
+    assert etag_matches(ETAG, ETAG)
+    assert etag_matches(f'"other", W/{ETAG}', ETAG)
+    assert etag_matches(" * ", ETAG)
+    assert not etag_matches("", ETAG)
+    assert not etag_matches(f'"{ETAG}"', ETAG)  # a tag that merely contains it
+    assert not etag_matches('"0123"', ETAG)
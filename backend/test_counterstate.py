@@ -0,0 +1,43 @@
+# test_counterstate.py
+# Resuming counter state (counterstate.py) after the detector was killed.
+#
+#   python -m pytest test_counterstate.py
+import numpy as np
+
+import detection
+from counterstate import CounterStore
+from zones import ZoneEngine
+
+
+def counter(directory) -> detection.PeopleCounter:
+    return detection.PeopleCounter(post_exits=False, store=CounterStore(str(directory), "cam"),
+                                   zones=ZoneEngine(detection.DEFAULT_LAYOUT))
+
+
+def people(*xs) -> np.ndarray:
+    # One person per x, in separate rows of the frame
+    return np.array([[x - 35, 20 + 170 * i, x + 35, 180 + 170 * i, 0.9, 0] for i, x in enumerate(xs)],
+                    dtype=np.float32)
+
+
+def test_people_inside_at_a_crash_are_reconciled(tmp_path):
+    first = counter(tmp_path)
+    for step in range(10):  # two people walk in past the entry line
+        first.update(people(885 - 30 * step, 885 - 30 * step))
+    assert first.inside == 2
+    # Killed here: no close(), only the log on disk
+
+    second = counter(tmp_path)
+    assert second.inside == 2
+    for _ in range(detection.RESUME_RECONCILE_FRAMES):  # only one of them is still in view
+        second.update(people(600))
+    assert (second.inside, second.lost) == (1, 1)
+    for step in range(20):  # and leaves through the exit line
+        second.update(people(585 - 30 * step))
+    assert (second.entered, second.exited, second.inside) == (2, 1, 0)
+    assert second.waits.count == 1
+    second.close()
+
+    third = counter(tmp_path)
+    assert (third.inside, third.lost, third.resumed_visits) == (0, 1, {})
+    third.close()
@@ -0,0 +1,48 @@
+# test_frame_channel.py
+# Tests for the stats record of frame_channel.py as detection.py fills it.
+#
+#   python -m pytest test_frame_channel.py
+import os
+from multiprocessing import shared_memory
+
+from detection import FrameOutput, PeopleCounter, stats_capacity
+from frame_channel import STATS_CAPACITY, FrameChannelReader, channel_name
+from zones import ZoneEngine
+
+
+def big_counter(camera_id: str) -> PeopleCounter:
+    # 200 zones with long names: the per-zone maps alone are well past 4 KB
+    layout = {"zones": [{"name": f"checkout-lane-{i:03d}-queue-area", "capacity": 5,
+                         "polygon": [[i, 0], [i + 1, 0], [i + 1, 1]]} for i in range(200)]}
+    return PeopleCounter(post_exits=False, camera_id=camera_id, zones=ZoneEngine(layout))
+
+
+def publish(counter: PeopleCounter, capacity: int) -> dict:
+    camera = f"test{os.getpid()}"
+    output = FrameOutput(camera, stats_capacity=capacity)
+    try:
+        output.write_stats(counter.stats())
+        reader = FrameChannelReader(channel_name(camera))
+        stats = reader.read_stats()
+        reader.close()
+        return stats
+    finally:
+        output.close()
+        segment = shared_memory.SharedMemory(name=channel_name(camera))  # outlives the writer by design
+        segment.close()
+        segment.unlink()
+
+
+def test_large_zone_set_fits():
+    counter = big_counter("big")
+    stats = publish(counter, stats_capacity(counter.zones))
+    assert len(stats["zones"]) == 200
+    assert stats["entered"] == 0
+
+
+def test_too_large_keeps_the_totals():
+    # A record sized for no zones still gets the counts, without the per-zone maps
+    counter = big_counter("small")
+    counter.entered = 7
+    stats = publish(counter, STATS_CAPACITY)
+    assert stats["entered"] == 7 and "zones" not in stats
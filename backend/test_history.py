@@ -0,0 +1,61 @@
+# test_history.py
+# Shutdown of the export stream in history.py, against a stand-in session.
+#
+#   python -m pytest test_history.py
+import asyncio
+from datetime import datetime
+
+import history
+
+
+class FakeSession:
+    """Server-side cursor stand-in: one row per fetch, each fetch takes a while."""
+
+    def __init__(self, log: list):
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.log.append("session_closed")
+
+    async def stream(self, stmt):
+        return self
+
+    async def partitions(self):
+        for i in range(1000):
+            try:
+                await asyncio.sleep(0.01)
+            except asyncio.CancelledError:
+                self.log.append("fetch_cancelled")
+                raise
+            yield [(i, i, "cam", "s", datetime(2026, 1, 1), datetime(2026, 1, 1), 1.0, 0)]
+
+
+def test_disconnect_mid_stream_lets_the_producer_finish():
+    async def run() -> tuple:
+        log = []
+        body = history.export(lambda: FakeSession(log), "ndjson")
+        received = []
+
+        async def client():
+            async for chunk in body:
+                received.append(chunk)
+
+        before = asyncio.all_tasks()
+        response = asyncio.create_task(client())
+        while not received:
+            await asyncio.sleep(0.005)
+        producer, = asyncio.all_tasks() - before - {response}
+        # A disconnect cancels the response task; anyio repeats the cancel
+        # at every await until the task is done
+        while not response.done():
+            response.cancel()
+            await asyncio.sleep(0.001)
+        await asyncio.wait({producer}, timeout=1.0)
+        return log, producer
+
+    log, producer = asyncio.run(run())
+    assert producer.done() and not producer.cancelled()
+    assert log == ["session_closed"]
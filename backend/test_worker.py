@@ -0,0 +1,40 @@
+# test_worker.py
+# Delivery of the in-process worker's messages through broadcast.py.
+#
+#   python -m pytest test_worker.py
+import asyncio
+import json
+
+from broadcast import ConnectionManager
+from detection import PeopleCounter
+from worker import DetectionWorker
+from zones import ZoneEvent
+
+
+class SlowSocket:
+    def __init__(self):
+        self.received = []
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(0.02)
+        self.received.append(json.loads(text))
+
+
+def test_slow_client_gets_every_event():
+    async def run() -> list:
+        manager = ConnectionManager()
+        socket = SlowSocket()
+        manager.attach(socket)
+        worker = DetectionWorker(asyncio.get_running_loop(), manager.publish)
+        worker.counter = PeopleCounter(post_exits=False)
+        for i in range(5):
+            worker._send(worker.counter.stats())  # periodic snapshot
+            worker._publish_event(ZoneEvent("zone_enter", i, "room", 0.0))
+            worker._send(worker.counter.stats())
+        await asyncio.sleep(0.5)
+        manager.disconnect(socket)
+        return socket.received
+
+    received = asyncio.run(run())
+    assert [m["track_id"] for m in received if "event" in m] == [0, 1, 2, 3, 4]
+    assert len(received) < 15  # the snapshots still coalesce
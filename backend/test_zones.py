@@ -0,0 +1,73 @@
+# test_zones.py
+# Regression tests for zones.py.
+#
+#   python -m pytest test_zones.py
+import numpy as np
+
+from zones import ZoneEngine
+
+
+def test_geometry_off_the_top_left_edge():
+    # Every line and zone has its max x/y below 0: the grid used to get zero
+    # cells and the first query raised IndexError.
+    engine = ZoneEngine({
+        "lines": [{"name": "off", "points": [[-50, -10], [-50, -100]]}],
+        "zones": [{"name": "corner", "polygon": [[-100, -100], [-10, -100], [-10, -10]]}],
+    })
+    steps, lines = engine.crossings(np.array([[5.0, 5.0]]), np.array([[1.0, 1.0]]))
+    assert len(steps) == len(lines) == 0
+    points, zones = engine.contains(np.array([[-50.0, -80.0], [5.0, 5.0]]))
+    assert points.tolist() == [0] and zones.tolist() == [0]
+    events = engine.update_membership(np.array([1, 2]), np.array([[-50.0, -80.0], [5.0, 5.0]]), 0.0)
+    assert [(e.kind, e.track_id) for e in events] == [("zone_enter", 1)]
+
+
+def test_empty_layout():
+    engine = ZoneEngine({})
+    steps, _ = engine.crossings(np.array([[5.0, 5.0]]), np.array([[1.0, 1.0]]))
+    assert len(steps) == 0
+    assert engine.update_membership(np.array([1]), np.array([[5.0, 5.0]]), 0.0) == []
+    assert engine.max_tracks is None and not engine.crowded
+
+
+def test_line_direction():
+    # Drawn top to bottom: counts right-to-left movement only
+    engine = ZoneEngine({"lines": [{"name": "door", "points": [[100, 0], [100, 200]]}]})
+    prev = np.array([[110.0, 50.0], [90.0, 50.0]])
+    curr = np.array([[90.0, 50.0], [110.0, 50.0]])
+    steps, lines = engine.crossings(prev, curr)
+    assert steps.tolist() == [0] and lines.tolist() == [0]
+
+
+def test_lost_track_crosses_once():
+    # A track that crosses a line and then goes unmatched keeps its last step;
+    # it must not report the crossing again on every frame it is lost.
+    from detection import PeopleCounter
+
+    events = []
+    counter = PeopleCounter(post_exits=False, on_event=events.append,
+                            zones=ZoneEngine({"lines": [{"name": "mid", "points": [[480, 0], [480, 540]]}]}))
+    for x in (503, 493, 483, 473):
+        counter.update(np.array([[x - 35, 200, x + 35, 380, 0.9, 0]], dtype=np.float32))
+    for _ in range(10):
+        counter.update(np.zeros((0, 6), dtype=np.float32))
+    assert [(e.kind, e.name) for e in events if e.kind == "cross"] == [("cross", "mid")]
+
+
+def test_exit_alert_counts_people_inside(monkeypatch):
+    # The alert posted with an exit is "people inside (before this exit) reached
+    # the limit", as before zones: here two are inside when the first leaves,
+    # although the zone that sets the limit is empty.
+    import detection
+
+    alerts = []
+    monkeypatch.setattr(detection, "post_exit_to_backend", lambda *args: alerts.append(args[4]))
+    layout = dict(detection.DEFAULT_LAYOUT,
+                  zones=[{"name": "elsewhere", "polygon": [[2000, 2000], [2100, 2000], [2100, 2100]], "capacity": 2}])
+    counter = detection.PeopleCounter(zones=ZoneEngine(layout))
+    for step in range(27):
+        a, b = 885 - 30 * step, max(885 - 30 * step, 500)
+        counter.update(np.array([[a - 35, 20, a + 35, 200, 0.9, 0],
+                                 [b - 35, 330, b + 35, 510, 0.9, 0]], dtype=np.float32))
+    assert (counter.entered, counter.exited) == (2, 1)
+    assert alerts == [True]
@@ -0,0 +1,230 @@
+# tracker.py
+# Track-to-detection assignment.
+# Builds the full tracks x detections cost matrix with NumPy (centroid distance
+# plus an IoU term) and solves it as a linear assignment problem, so every
+# detection is matched to at most one track and vice versa.
+# SciPy's solver takes about half a second to import, so it is only loaded
+# when two people compete for the same detection; the usual frame, where
+# every track has at most one candidate, is solved without it.
+import numpy as np
+
+# Cost given to pairs that fail the distance gate. Anything larger than the
+# worst feasible cost works; the solver never prefers it over a real match.
+GATED_COST = 1e6
+
+# Weight of the newest step in the per-track velocity estimate.
+VELOCITY_SMOOTHING = 0.5
+
+_linear_sum_assignment = None
+
+
+def load_solver():
+    """Import scipy.optimize.linear_sum_assignment (once); detection.py preloads it after the first frame."""
+    global _linear_sum_assignment
+    if _linear_sum_assignment is None:
+        from scipy.optimize import linear_sum_assignment
+        _linear_sum_assignment = linear_sum_assignment
+    return _linear_sum_assignment
+
+
+def as_boxes(boxes) -> np.ndarray:
+    """List of (x1, y1, x2, y2) tuples -> (N, 4) int array (empty-safe)."""
+    arr = np.asarray(boxes, dtype=np.int64)
+    return arr.reshape(-1, 4)
+
+
+def box_centroids(boxes: np.ndarray) -> np.ndarray:
+    """Integer centroids, same rounding as detection.get_centroid."""
+    cx = (boxes[:, 0] + boxes[:, 2]) // 2
+    cy = (boxes[:, 1] + boxes[:, 3]) // 2
+    return np.stack([cx, cy], axis=1)
+
+
+def pairwise_sq_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Squared Euclidean distance between every point in `a` (N, 2) and `b` (M, 2)."""
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    dx = a[:, None, 0] - b[None, :, 0]
+    dy = a[:, None, 1] - b[None, :, 1]
+    dx *= dx
+    dy *= dy
+    dx += dy
+    return dx
+
+
+def paired_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU of a[k] with b[k] for every row k of two (K, 4) arrays."""
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    iw = np.clip(np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0, None)
+    ih = np.clip(np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0, None)
+    inter = iw * ih
+    union = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]) + (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]) - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def cost_matrix(track_boxes: np.ndarray, det_boxes: np.ndarray,
+                max_dist: float, iou_weight: float) -> tuple:
+    """Return (cost, feasible) for every track/detection pair.
+
+    cost = distance / max_dist + iou_weight * (1 - IoU); pairs whose centroids
+    are more than `max_dist` apart are infeasible and get GATED_COST. IoU is
+    only evaluated for the feasible pairs, which keeps large scenes cheap.
+    """
+    sq_dist = pairwise_sq_distance(box_centroids(track_boxes), box_centroids(det_boxes))
+    feasible = sq_dist <= max_dist * max_dist
+    cost = np.full(sq_dist.shape, GATED_COST, dtype=np.float32)
+    ti, di = np.nonzero(feasible)
+    pair_cost = np.sqrt(sq_dist[ti, di]) / max_dist
+    if iou_weight:
+        pair_cost += iou_weight * (1.0 - paired_iou(track_boxes[ti], det_boxes[di]))
+    cost[ti, di] = pair_cost
+    return cost, feasible
+
+
+def match(track_boxes, det_boxes, max_dist: float, iou_weight: float = 0.0) -> list:
+    """Optimally assign detections to tracks.
+
+    Returns a list of (track_index, detection_index) pairs; unmatched tracks
+    and detections are simply absent from it.
+    """
+    track_boxes = as_boxes(track_boxes)
+    det_boxes = as_boxes(det_boxes)
+    if len(track_boxes) == 0 or len(det_boxes) == 0:
+        return []
+
+    cost, feasible = cost_matrix(track_boxes, det_boxes, max_dist, iou_weight)
+
+    # Drop rows/columns with no feasible partner before solving; with people
+    # spread across the frame most of the matrix is gated out.
+    rows = np.flatnonzero(feasible.any(axis=1))
+    cols = np.flatnonzero(feasible.any(axis=0))
+    if len(rows) == 0:
+        return []
+
+    sub = cost[np.ix_(rows, cols)]
+    sub_feasible = feasible[np.ix_(rows, cols)]
+    if len(rows) == 1:
+        r, c = np.zeros(1, dtype=np.int64), np.argmin(sub, axis=1)
+    elif len(cols) == 1:
+        r, c = np.argmin(sub, axis=0), np.zeros(1, dtype=np.int64)
+    elif (sub_feasible.sum(axis=1) == 1).all() and (sub_feasible.sum(axis=0) == 1).all():
+        r, c = np.nonzero(sub_feasible)  # no track shares a candidate: the feasible pairs are the optimum
+    else:
+        r, c = load_solver()(sub)
+    keep = feasible[rows[r], cols[c]]
+    return list(zip(rows[r][keep].tolist(), cols[c][keep].tolist()))
+
+
+class TrackStore:
+    """Fixed-capacity, column-oriented storage for live tracks.
+
+    Every per-track field is a NumPy column indexed by slot. Free slots have
+    `active == False` and are reused by later tracks; the store only grows
+    (doubling) if more than `capacity` tracks are alive at once. Instead of an
+    unbounded history list each track keeps its last `history_len` matched
+    centroids in a ring buffer, which is all the crossing test needs.
+    """
+
+    def __init__(self, capacity: int = 64, history_len: int = 8):
+        self.history_len = history_len
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int):
+        self.capacity = capacity
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.centroid = np.zeros((capacity, 2), dtype=np.int32)
+        self.box = np.zeros((capacity, 4), dtype=np.int32)
+        self.lost = np.zeros(capacity, dtype=np.int32)
+        self.entered = np.zeros(capacity, dtype=bool)
+        self.exited = np.zeros(capacity, dtype=bool)
+        self.entry_time = np.full(capacity, np.nan)
+        self.waiting_time = np.full(capacity, np.nan)
+        self.history = np.zeros((capacity, self.history_len, 2), dtype=np.int32)
+        self.history_count = np.zeros(capacity, dtype=np.int64)  # total pushes, ring index = count % len
+        self.velocity = np.zeros((capacity, 2), dtype=np.float32)  # px per frame, smoothed
+        self.since_update = np.zeros(capacity, dtype=np.int32)  # frames since the last matched detection
+
+    def _grow(self):
+        old = {name: getattr(self, name) for name in (
+            "ids", "active", "centroid", "box", "lost", "entered", "exited",
+            "entry_time", "waiting_time", "history", "history_count", "velocity", "since_update")}
+        n = self.capacity
+        self._alloc(n * 2)
+        for name, column in old.items():
+            getattr(self, name)[:n] = column
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.active))
+
+    def active_slots(self) -> np.ndarray:
+        """Slots of live tracks, oldest track first."""
+        slots = np.flatnonzero(self.active)
+        return slots[np.argsort(self.ids[slots], kind="stable")]
+
+    # ---- per-frame batch operations ----
+
+    def add(self, track_id: int, centroid: tuple, box: tuple) -> int:
+        free = np.flatnonzero(~self.active)
+        if len(free) == 0:
+            self._grow()
+            free = np.flatnonzero(~self.active)
+        slot = int(free[0])
+        self.ids[slot] = track_id
+        self.active[slot] = True
+        self.centroid[slot] = centroid
+        self.box[slot] = box
+        self.lost[slot] = 0
+        self.entered[slot] = False
+        self.exited[slot] = False
+        self.entry_time[slot] = np.nan
+        self.waiting_time[slot] = np.nan
+        self.history[slot, 0] = centroid
+        self.history_count[slot] = 1
+        self.velocity[slot] = 0.0
+        self.since_update[slot] = 0
+        return slot
+
+    def update(self, slots: np.ndarray, centroids: np.ndarray, boxes: np.ndarray):
+        """Write matched detections into `slots` and push their centroids to history."""
+        if len(slots) == 0:
+            return
+        last = self.history[slots, (self.history_count[slots] - 1) % self.history_len]
+        frames = np.maximum(self.since_update[slots], 1)[:, None]
+        step = (centroids - last) / frames
+        self.velocity[slots] = VELOCITY_SMOOTHING * step + (1.0 - VELOCITY_SMOOTHING) * self.velocity[slots]
+        self.since_update[slots] = 0
+
+        self.centroid[slots] = centroids
+        self.box[slots] = boxes
+        self.lost[slots] = 0
+        self.history[slots, self.history_count[slots] % self.history_len] = centroids
+        self.history_count[slots] += 1
+
+    def tick(self):
+        """Advance the clock by one frame for every live track."""
+        self.since_update[self.active] += 1
+
+    def predicted_box(self, slots: np.ndarray) -> np.ndarray:
+        """Last matched box shifted by velocity * frames since it was matched."""
+        shift = np.rint(self.velocity[slots] * self.since_update[slots, None]).astype(np.int32)
+        return self.box[slots] + np.tile(shift, 2)
+
+    def age(self):
+        self.lost[self.active] += 1
+
+    def prune(self, max_lost: int) -> np.ndarray:
+        """Free every track lost for more than `max_lost` frames; returns their slots."""
+        gone = np.flatnonzero(self.active & (self.lost > max_lost))
+        self.active[gone] = False
+        return gone
+
+    def last_two(self) -> tuple:
+        """(prev, curr, valid): the two most recent history points of every slot."""
+        count = self.history_count
+        rows = np.arange(self.capacity)
+        curr = self.history[rows, (count - 1) % self.history_len]
+        prev = self.history[rows, (count - 2) % self.history_len]
+        valid = self.active & (count >= 2)
+        return prev, curr, valid
@@ -0,0 +1,136 @@
+# worker.py
+# Optional in-process detection worker, managed by app.py.
+# Runs the sequential detection loop (detection.run_sequential) on a background
+# thread of the API process. Stats go straight to the WebSocket broadcaster via
+# the event loop instead of a loopback POST to /publish/: immediately on every
+# entry/exit or zone event (never coalesced, so a slow client still gets
+# each one), and otherwise at most once per PUBLISH_INTERVAL. Frames still go
+# through the shared-memory channel, so /stream.mjpeg works unchanged.
+import threading
+import time
+
+from detection import (
+    ADAPTIVE_MAX_K, ADAPTIVE_MAX_SKIP, ADAPTIVE_TARGET_FPS, CAMERA_ID, INFERENCE_BACKEND, MODEL_PATH,
+    MOTION_THRESHOLD, FrameOutput, PeopleCounter, SourceOpener, StatsPublisher, detect_people, make_roi_detector,
+    open_counter_store, run_sequential, start_exit_shipper, stats_capacity, stop_exit_shipper, warm_up,
+)
+from inference import load_backend
+from logs import get_logger
+
+log = get_logger("worker")
+
+STOPPED, STARTING, RUNNING, ERROR = "stopped", "starting", "running", "error"
+
+
+class DetectionWorker:
+    def __init__(self, loop, publish):
+        # publish(message, key) is called on `loop` (the app's event loop):
+        # ConnectionManager.publish, where messages sharing a key coalesce.
+        self.loop = loop
+        self.publish = publish
+        self.state = STOPPED
+        self.error = None
+        self.config = {}
+        self.started_at = None
+        self.counter = None
+        self.output = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, source: str = "0", backend: str = INFERENCE_BACKEND, int8: bool = False,
+              roi: bool = False, adaptive: bool = False) -> bool:
+        """Start the detection thread; False if it is already running."""
+        with self._lock:
+            if self.running:
+                return False
+            self.config = {"source": source, "backend": backend, "int8": int8, "roi": roi, "adaptive": adaptive}
+            self.state = STARTING
+            self.error = None
+            self.started_at = time.time()
+            self.counter = None
+            self.output = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="detection-worker", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """Ask the loop to finish and wait for it (blocking; run off the event loop)."""
+        thread = self._thread
+        if thread is None:
+            return True
+        self._stop.set()
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def status(self) -> dict:
+        status = {"state": self.state, "config": self.config, "error": self.error}
+        if self.started_at is not None and self.running:
+            uptime = time.time() - self.started_at
+            status["uptime_s"] = round(uptime, 1)
+            if self.output is not None:
+                status["frames"] = self.output.frames
+                status["fps"] = round(self.output.frames / uptime, 1) if uptime > 0 else 0.0
+        if self.counter is not None:
+            status["stats"] = self.counter.stats()
+        return status
+
+    def _send(self, stats: dict, key: str = "stats"):
+        try:
+            self.loop.call_soon_threadsafe(self.publish, stats, key)
+        except RuntimeError:
+            pass  # event loop already closed (app shutting down)
+
+    def _publish_event(self, event):
+        # Every line/zone event reaches every client: no coalescing key, so a
+        # slow client cannot have it replaced by the next snapshot
+        self._send(dict(self.counter.stats(), event=event.kind, track_id=event.track_id, zone=event.name),
+                   key=None)
+
+    def _run(self):
+        cfg = self.config
+        cap = None
+        try:
+            opener = SourceOpener(cfg["source"])  # opens while the model loads and warms up
+            model = load_backend(cfg["backend"], MODEL_PATH, cfg["int8"])
+            detect = make_roi_detector() if cfg["roi"] else detect_people
+            warm_up(model, detect)
+            cap = opener.result()
+            if self._stop.is_set():
+                return
+            if not cap.isOpened():
+                raise RuntimeError(f"cannot open source {cfg['source']}")
+
+            publisher = StatsPublisher(send=self._send)
+            self.counter = PeopleCounter(predict_motion=cfg["adaptive"], on_event=self._publish_event,
+                                         store=open_counter_store(CAMERA_ID))
+            self.output = FrameOutput(stats_capacity=stats_capacity(self.counter.zones))
+            adaptive = None
+            if cfg["adaptive"]:
+                from cadence import AdaptiveInference
+                adaptive = AdaptiveInference(detect, ADAPTIVE_TARGET_FPS, ADAPTIVE_MAX_K,
+                                             MOTION_THRESHOLD, ADAPTIVE_MAX_SKIP)
+
+            start_exit_shipper()
+            self.state = RUNNING
+            log.info("running", source=cfg["source"])
+            run_sequential(model, cap, self.counter, adaptive, detect, self.output, publisher,
+                           stop=self._stop)
+            self.counter.print_summary()
+        except Exception as e:
+            self.error = str(e)
+            log.error("stopped", error=str(e))
+        finally:
+            if cap is not None:
+                cap.release()
+            if self.output is not None:
+                self.output.close()
+            if self.counter is not None:
+                self.counter.close()  # final checkpoint of the counts
+            stop_exit_shipper()
+            self.state = ERROR if self.error else STOPPED
@@ -0,0 +1,241 @@
+# zones.py
+# Counting lines and zones for one camera, loaded from a JSON layout.
+# A line is a directed segment A -> B. A track crosses it when its last step
+# goes from the left-hand side to the right-hand side of someone walking from
+# A to B on screen, so a segment drawn top to bottom counts right-to-left
+# movement; swap the points to count the other way. A line with
+# a "role" of "entry" or "exit" drives the entered/exited counts, any other
+# line only reports "cross" events. A zone is a polygon; the engine keeps
+# which tracks are inside each one (occupancy, checked against the zone's
+# "capacity") and reports "zone_enter", "zone_exit" and, once per visit,
+# "dwell" after "dwell_seconds" inside.
+#
+#   {"default": {"lines": [{"name": "door", "role": "entry", "points": [[850, 0], [850, 540]]}],
+#                "zones": [{"name": "room", "polygon": [[30, 30], [930, 30], [930, 510], [30, 510]],
+#                           "capacity": 4, "dwell_seconds": 300}]},
+#    "1": {...}}
+#
+# Sections are keyed by camera id; "default" covers the cameras without one.
+# Every test runs for all tracks at once with NumPy. Lines and zones are
+# bucketed into a uniform grid of GRID_CELL pixels, and a track is only tested
+# against the geometry registered in the cells its last step touches, so the
+# cost grows with what is near each track rather than with tracks x zones.
+import json
+import os
+
+import numpy as np
+
+GRID_CELL = 64  # pixels per grid cell of the spatial index
+ROLES = ("entry", "exit")
+ENTER, EXIT, CROSS, ZONE_ENTER, ZONE_EXIT, DWELL = "enter", "exit", "cross", "zone_enter", "zone_exit", "dwell"
+
+
+class ZoneEvent:
+    """Something a track did: `kind` on the line or zone `name` at `ts`."""
+
+    __slots__ = ("kind", "track_id", "name", "ts")
+
+    def __init__(self, kind: str, track_id: int, name: str, ts: float):
+        self.kind = kind
+        self.track_id = track_id
+        self.name = name
+        self.ts = ts
+
+    def __repr__(self):
+        return f"ZoneEvent({self.kind!r}, {self.track_id}, {self.name!r}, {self.ts:.3f})"
+
+
+def load_layout(path: str, camera_id: str, default: dict) -> dict:
+    """The layout section for `camera_id` from the JSON file at `path`, else `default`."""
+    if not path or not os.path.exists(path):
+        return default
+    with open(path) as f:
+        sections = json.load(f)
+    return sections.get(str(camera_id), sections.get("default", default))
+
+
+def _cross(ax, ay, bx, by):
+    return ax * by - ay * bx
+
+
+class _GridIndex:
+    """Uniform grid over item bounding boxes, stored as CSR arrays (cell -> item ids)."""
+
+    def __init__(self, boxes: np.ndarray, cell: int):
+        # boxes: (N, 4) x1, y1, x2, y2 per item
+        # Queries clamp to the grid, so geometry off the top/left edge is
+        # clamped into the border cells the same way (the grid has at least one cell).
+        self.cell = cell
+        extent = np.maximum(boxes[:, 2:].max(axis=0), 0) if len(boxes) else np.zeros(2)
+        self.nx, self.ny = (int(extent[0]) // cell + 1, int(extent[1]) // cell + 1)
+        lo = np.clip(boxes[:, :2] // cell, 0, None).astype(np.int64)
+        hi = np.clip(boxes[:, 2:] // cell, 0, None).astype(np.int64)
+        cells, items = [], []
+        for i, ((x0, y0), (x1, y1)) in enumerate(zip(lo, hi)):
+            gx, gy = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+            cells.append((gy * self.nx + gx).ravel())
+            items.append(np.full(gx.size, i))
+        cells = np.concatenate(cells) if cells else np.zeros(0, np.int64)
+        items = np.concatenate(items) if items else np.zeros(0, np.int64)
+        order = np.argsort(cells, kind="stable")
+        self.items = items[order]
+        self.count = np.bincount(cells, minlength=self.nx * self.ny)
+        self.start = np.cumsum(self.count) - self.count
+
+    def _cell(self, points: np.ndarray) -> tuple:
+        gx = np.clip(points[:, 0] // self.cell, 0, self.nx - 1).astype(np.int64)
+        gy = np.clip(points[:, 1] // self.cell, 0, self.ny - 1).astype(np.int64)
+        return gx, gy
+
+    def _expand(self, owner: np.ndarray, cells: np.ndarray) -> tuple:
+        """(owner, item) for every item registered in each owner's cell."""
+        n = self.count[cells]
+        offsets = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        return np.repeat(owner, n), self.items[np.repeat(self.start[cells], n) + offsets]
+
+    def query_points(self, points: np.ndarray) -> tuple:
+        gx, gy = self._cell(points)
+        return self._expand(np.arange(len(points)), gy * self.nx + gx)
+
+    def query_boxes(self, lo: np.ndarray, hi: np.ndarray) -> tuple:
+        """(box index, item) pairs for the items in every cell each box touches (deduplicated)."""
+        x0, y0 = self._cell(lo)
+        x1, y1 = self._cell(hi)
+        w, h = x1 - x0 + 1, y1 - y0 + 1
+        n = w * h
+        owner = np.repeat(np.arange(len(lo)), n)
+        k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        cells = (y0[owner] + k // w[owner]) * self.nx + x0[owner] + k % w[owner]
+        owner, items = self._expand(owner, cells)
+        nitems = int(self.items.max()) + 1 if len(self.items) else 1
+        keys = np.unique(owner * nitems + items)
+        return keys // nitems, keys % nitems
+
+
+class ZoneEngine:
+    """Lines and zones of one camera plus the zone membership of its tracks."""
+
+    def __init__(self, layout: dict, cell: int = GRID_CELL):
+        lines = layout.get("lines", [])
+        zones = layout.get("zones", [])
+
+        self.line_names = [line["name"] for line in lines]
+        self.line_roles = [line.get("role") for line in lines]
+        for role in self.line_roles:
+            if role is not None and role not in ROLES:
+                raise ValueError(f"line role must be one of {ROLES} or absent, got {role!r}")
+        pts = np.array([line["points"] for line in lines], dtype=np.float64).reshape(-1, 2, 2)
+        self.line_a, self.line_b = pts[:, 0], pts[:, 1]
+        self._lines = _GridIndex(np.hstack([pts.min(axis=1), pts.max(axis=1)]), cell)
+
+        self.zone_names = [zone["name"] for zone in zones]
+        self.polygons = [np.array(zone["polygon"], dtype=np.float64).reshape(-1, 2) for zone in zones]
+        self.capacity = np.array([zone.get("capacity") or 0 for zone in zones], dtype=np.int64)  # 0 = unlimited
+        self.dwell = np.array([zone.get("dwell_seconds") or np.inf for zone in zones], dtype=np.float64)
+        # Polygon edges, grouped by zone
+        self.edge_count = np.array([len(p) for p in self.polygons], dtype=np.int64)
+        self.edge_start = np.cumsum(self.edge_count) - self.edge_count
+        self.edge_a = np.concatenate(self.polygons) if zones else np.zeros((0, 2))
+        self.edge_b = np.concatenate([np.roll(p, -1, axis=0) for p in self.polygons]) if zones else np.zeros((0, 2))
+        bounds = np.array([np.hstack([p.min(axis=0), p.max(axis=0)]) for p in self.polygons]).reshape(-1, 4)
+        self._zones = _GridIndex(bounds, cell)
+
+        # Membership: sorted keys (track id * zones + zone) with the time each visit began
+        self.occupancy = np.zeros(len(zones), dtype=np.int64)
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._since = np.zeros(0, dtype=np.float64)
+        self._dwelled = np.zeros(0, dtype=bool)
+
+    @property
+    def max_tracks(self):
+        """Total capacity when every zone has one, else None (no limit)."""
+        if len(self.capacity) == 0 or not self.capacity.all():
+            return None
+        return int(self.capacity.sum())
+
+    @property
+    def crowded(self) -> bool:
+        return bool(np.any((self.capacity > 0) & (self.occupancy >= self.capacity)))
+
+    def crowded_zones(self) -> list:
+        full = (self.capacity > 0) & (self.occupancy >= self.capacity)
+        return [self.zone_names[z] for z in np.flatnonzero(full)]
+
+    def crossings(self, prev: np.ndarray, curr: np.ndarray) -> tuple:
+        """(step index, line index) of every step prev[k] -> curr[k] that crosses a line forwards."""
+        if len(prev) == 0 or len(self.line_names) == 0:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        prev = prev.astype(np.float64)
+        curr = curr.astype(np.float64)
+        k, li = self._lines.query_boxes(np.minimum(prev, curr), np.maximum(prev, curr))
+        p, q = prev[k], curr[k]
+        a, b = self.line_a[li], self.line_b[li]
+        d = b - a
+        side_p = _cross(d[:, 0], d[:, 1], p[:, 0] - a[:, 0], p[:, 1] - a[:, 1])
+        side_q = _cross(d[:, 0], d[:, 1], q[:, 0] - a[:, 0], q[:, 1] - a[:, 1])
+        m = q - p
+        end_a = _cross(m[:, 0], m[:, 1], a[:, 0] - p[:, 0], a[:, 1] - p[:, 1])
+        end_b = _cross(m[:, 0], m[:, 1], b[:, 0] - p[:, 0], b[:, 1] - p[:, 1])
+        # Strictly from one side to the other, and the segment's ends not both on one side of the step
+        hit = (side_p < 0) & (side_q > 0) & (end_a * end_b <= 0)
+        return k[hit], li[hit]
+
+    def contains(self, points: np.ndarray) -> tuple:
+        """(point index, zone index) for every point inside a zone (even-odd rule)."""
+        if len(points) == 0 or len(self.zone_names) == 0:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        points = points.astype(np.float64)
+        k, z = self._zones.query_points(points)
+        # Every candidate pair against every edge of its zone
+        n = self.edge_count[z]
+        pair = np.repeat(np.arange(len(k)), n)
+        edge = np.repeat(self.edge_start[z], n) + (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n))
+        p = points[k[pair]]
+        a, b = self.edge_a[edge], self.edge_b[edge]
+        straddles = (a[:, 1] > p[:, 1]) != (b[:, 1] > p[:, 1])
+        dy = np.where(straddles, b[:, 1] - a[:, 1], 1.0)
+        x_at = a[:, 0] + (p[:, 1] - a[:, 1]) * (b[:, 0] - a[:, 0]) / dy
+        hits = np.bincount(pair, weights=straddles & (p[:, 0] < x_at), minlength=len(k))
+        inside = hits % 2 == 1
+        return k[inside], z[inside]
+
+    def update_membership(self, track_ids: np.ndarray, points: np.ndarray, now: float) -> list:
+        """Recompute zone occupancy from the tracks' positions; returns zone_enter/zone_exit/dwell events."""
+        nz = max(len(self.zone_names), 1)
+        k, z = self.contains(points)
+        keys = track_ids[k] * nz + z
+        order = np.argsort(keys)
+        keys = keys[order]
+        self.occupancy = np.bincount(z, minlength=len(self.zone_names))
+
+        # Visits that continue keep their start time and dwell flag
+        if len(self._keys):
+            pos = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+            known = self._keys[pos] == keys
+            since = np.where(known, self._since[pos], now)
+            dwelled = known & self._dwelled[pos]
+        else:
+            known = np.zeros(len(keys), dtype=bool)
+            since = np.full(len(keys), now)
+            dwelled = known.copy()
+
+        events = []
+        for key in keys[~known]:
+            events.append(ZoneEvent(ZONE_ENTER, int(key // nz), self.zone_names[key % nz], now))
+        for key in np.setdiff1d(self._keys, keys, assume_unique=True):
+            events.append(ZoneEvent(ZONE_EXIT, int(key // nz), self.zone_names[key % nz], now))
+        due = ~dwelled & (now - since >= self.dwell[keys % nz])
+        for key in keys[due]:
+            events.append(ZoneEvent(DWELL, int(key // nz), self.zone_names[key % nz], now))
+        dwelled |= due
+
+        self._keys, self._since, self._dwelled = keys, since, dwelled
+        return events
+
+    def views(self) -> list:
+        """Snapshot for the overlay: ("line", name, role, a, b) and ("zone", name, polygon, occupancy, capacity)."""
+        items = [("line", name, role, tuple(map(int, a)), tuple(map(int, b)))
+                 for name, role, a, b in zip(self.line_names, self.line_roles, self.line_a, self.line_b)]
+        items += [("zone", name, poly.astype(np.int32), int(occ), int(cap))
+                  for name, poly, occ, cap in zip(self.zone_names, self.polygons, self.occupancy, self.capacity)]
+        return items